@@ -1,9 +1,21 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+
 import discord
 from discord.ext import commands
+from discord import app_commands
 import os
 from dotenv import load_dotenv
 import asyncio
 import sys
+import hashlib
+import json
+import signal
+from config import config as bot_config
+from utils import firebase_manager, metrics, db_tracer
+from utils.snapshot import write_snapshot, read_snapshot
+from utils.loop_watchdog import LoopWatchdog
+from utils.memory import start_tracing, get_rss_bytes, format_bytes
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv()
@@ -13,38 +25,326 @@ intents.message_content = True
 intents.members = True
 intents.guilds = True
 
-class LevelingBot(commands.Bot):
+COMMAND_HASH_FILE = '.command_tree_hash.json'
+
+# Set by cluster.py for each shard process, unset when the bot runs on its own
+CLUSTER_ID = int(os.getenv('LEVELBOT_CLUSTER_ID', '0'))
+SHARD_IDS = os.getenv('LEVELBOT_SHARD_IDS')
+SHARD_COUNT = os.getenv('LEVELBOT_SHARD_COUNT')
+
+EXTENSIONS = [
+    'cogs.leveling',
+    'cogs.shop',
+    'cogs.commands',
+    'cogs.custom_role',
+    'cogs.auction',
+    'cogs.help',
+    'cogs.gambling',
+    'cogs.role_sync',
+    'cogs.guild_settings',
+    'cogs.economy',
+    'cogs.admin',
+]
+
+class LevelingCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        # Runs in the same task as the command callback, so every database call it makes is attributed to it
+        name = f"/{interaction.command.qualified_name}" if interaction.command else "interaction"
+        db_tracer.start_operation(name)
+        return True
+
+def get_gateway_options():
+    """
+    Lean mode keeps the members intent (role sync needs fetch_members) but caches nothing the
+    bot doesn't read: interaction and message payloads already carry the full member.
+    """
+    options = {}
+    
+    if SHARD_IDS:
+        options['shard_ids'] = [int(shard_id) for shard_id in SHARD_IDS.split(',')]
+        options['shard_count'] = int(SHARD_COUNT)
+    
+    if bot_config.LEAN_GATEWAY_MODE:
+        options.update({
+            'member_cache_flags': discord.MemberCacheFlags.none(),
+            'chunk_guilds_at_startup': False,
+            'max_messages': None
+        })
+    
+    return options
+
+def get_snapshot_path():
+    # Every shard process keeps its own cooldowns and message handles
+    return f"{bot_config.SNAPSHOT_PATH}.{CLUSTER_ID}" if SHARD_IDS else bot_config.SNAPSHOT_PATH
+
+class LevelingBot(commands.AutoShardedBot):
     def __init__(self):
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None
+            help_command=None,
+            tree_cls=LevelingCommandTree,
+            **get_gateway_options()
         )
+        self.before_invoke(self.trace_prefix_command)
+        db_tracer.enabled = bot_config.DB_TRACE_ENABLED
+        db_tracer.budgets = bot_config.DB_ROUND_TRIP_BUDGETS
+        self.startup_phases = []
+        self.setup_finished = None
+        self.warmup_task = None
+        self.warmup_finished = asyncio.Event()
+        self.caches_warmed = False
+        self.metrics_runner = None
+        self.loop_watchdog = None
+        self.shutting_down = False
     
     async def setup_hook(self):
-        await self.load_extension('cogs.leveling')
-        await self.load_extension('cogs.shop')
-        await self.load_extension('cogs.commands')
-        await self.load_extension('cogs.custom_role')
-        await self.load_extension('cogs.auction')
-        await self.load_extension('cogs.help')
-        await self.load_extension('cogs.gambling')
-        print("Syncing commands...")
-        await self.tree.sync()
+        self.record_phase("imports", STARTUP_STARTED)
+        
+        if bot_config.METRICS_ENABLED:
+            metrics.install_rate_limit_counter()
+            port = bot_config.METRICS_PORT + CLUSTER_ID
+            self.metrics_runner = await metrics.start_metrics_server(bot_config.METRICS_HOST, port)
+        
+        if bot_config.LOOP_WATCHDOG_ENABLED:
+            self.loop_watchdog = LoopWatchdog(bot_config.LOOP_WATCHDOG_INTERVAL, bot_config.LOOP_STALL_THRESHOLD)
+            self.loop_watchdog.start()
+        
+        # Started before the cogs load so their caches are attributed from the first allocation
+        if bot_config.MEMORY_TRACE_ENABLED:
+            start_tracing(bot_config.MEMORY_TRACE_FRAMES)
+        
+        # Cogs don't depend on each other at load time, so load them together
+        started = time.perf_counter()
+        await asyncio.gather(*(self.load_extension(extension) for extension in EXTENSIONS))
+        self.record_phase("extensions", started)
+        
+        started = time.perf_counter()
+        self.restore_snapshot()
+        self.record_phase("snapshot restore", started)
+        
+        # Commands are global, one process syncing them is enough
+        if CLUSTER_ID == 0:
+            started = time.perf_counter()
+            await self.sync_commands_if_changed()
+            self.record_phase("command sync", started)
+        
+        self.setup_finished = time.perf_counter()
+    
+    #============================#
+    #    Command Tree Syncing    #
+    #============================#
+
+    def get_command_tree_hash(self):
+        payload = [command.to_dict(self.tree) for command in self.tree.get_commands()]
+        payload.sort(key=lambda command: command['name'])
+        serialized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(serialized.encode()).hexdigest()
+    
+    def load_command_hashes(self):
+        try:
+            with open(COMMAND_HASH_FILE, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def save_command_hashes(self, hashes):
+        with open(COMMAND_HASH_FILE, 'w') as f:
+            json.dump(hashes, f)
+    
+    async def sync_commands_if_changed(self):
+        """
+        Only hit the rate limited sync endpoint when the command tree actually changed.
+        Set DEV_GUILD_ID to sync to a single guild instantly while developing,
+        or FORCE_COMMAND_SYNC=1 to sync regardless of the stored hash.
+        """
+        dev_guild_id = os.getenv('DEV_GUILD_ID')
+        target = dev_guild_id or 'global'
+        
+        tree_hash = self.get_command_tree_hash()
+        hashes = self.load_command_hashes()
+        
+        if hashes.get(target) == tree_hash and os.getenv('FORCE_COMMAND_SYNC') != '1':
+            print(f"Command tree unchanged, skipping sync ({target})")
+            return
+        
+        print(f"Syncing commands ({target})...")
+        if dev_guild_id:
+            guild = discord.Object(id=int(dev_guild_id))
+            self.tree.copy_global_to(guild=guild)
+            await self.tree.sync(guild=guild)
+        else:
+            await self.tree.sync()
+        
+        hashes[target] = tree_hash
+        self.save_command_hashes(hashes)
         print("Commands synced!")
     
+    #============================#
+    #    Warm Restart Snapshot   #
+    #============================#
+
+    def export_snapshot_state(self):
+        cog_states = {}
+        for name, cog in self.cogs.items():
+            if hasattr(cog, 'export_state'):
+                cog_states[name] = cog.export_state()
+        
+        return {
+            'cogs': cog_states,
+            'firebase': firebase_manager.export_cache_state()
+        }
+    
+    def restore_snapshot(self):
+        state = read_snapshot(get_snapshot_path(), max_age=bot_config.SNAPSHOT_MAX_AGE)
+        if not state:
+            return
+        
+        for name, cog_state in state.get('cogs', {}).items():
+            cog = self.get_cog(name)
+            if cog and hasattr(cog, 'import_state'):
+                cog.import_state(cog_state)
+        
+        firebase_manager.import_cache_state(state.get('firebase', {}))
+        print(f"Restored warm state from {get_snapshot_path()}")
+    
+    async def close(self):
+        # SIGTERM and the shutdown in main can both land here, the snapshot is written once
+        if self.shutting_down:
+            return await super().close()
+        self.shutting_down = True
+        
+        try:
+            size = write_snapshot(get_snapshot_path(), self.export_snapshot_state())
+            print(f"Wrote warm restart snapshot ({size:,} bytes)")
+        except Exception as e:
+            print(f"Error writing snapshot: {e}")
+        
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        
+        if self.loop_watchdog:
+            self.loop_watchdog.stop()
+        
+        await super().close()
+    
+    #============================#
+    #      Command Metrics       #
+    #============================#
+
+    async def trace_prefix_command(self, ctx):
+        # Slash invocations of hybrid commands were already picked up by the command tree
+        if ctx.interaction is None:
+            db_tracer.start_operation(f"!{ctx.command.qualified_name}")
+    
+
+    async def on_app_command_completion(self, interaction, command):
+        latency = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        metrics.command_latency.observe(command.qualified_name, value=latency)
+    
+    async def on_command_completion(self, ctx):
+        # Hybrid commands invoked as slash commands land here too
+        started_at = ctx.interaction.created_at if ctx.interaction else ctx.message.created_at
+        latency = (discord.utils.utcnow() - started_at).total_seconds()
+        metrics.command_latency.observe(ctx.command.qualified_name, value=latency)
+    
+    #============================#
+    #      Startup Profiling     #
+    #============================#
+
+    def record_phase(self, name, started):
+        self.startup_phases.append((name, time.perf_counter() - started))
+    
+    @property
+    def runs_background_tasks(self):
+        """Expiry loops touch every user, so in a cluster only one shard process runs them"""
+        if self.shard_ids is None:
+            return True
+        
+        home_shard = 0
+        if bot_config.HOME_GUILD_ID:
+            home_shard = (bot_config.HOME_GUILD_ID >> 22) % self.shard_count
+        return home_shard in self.shard_ids
+    
+    async def get_or_fetch_member(self, guild, user_id):
+        """Cached member if there is one, otherwise a single REST lookup, None if they left"""
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        
+        try:
+            return await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+    
+    def print_startup_report(self, time_to_ready):
+        mode = "lean" if bot_config.LEAN_GATEWAY_MODE else "full"
+        print(f"Startup profile ({mode} gateway mode):")
+        for name, duration in self.startup_phases:
+            print(f"  {name:<16} {duration * 1000:>8.0f}ms")
+        print(f"  {'time to ready':<16} {time_to_ready * 1000:>8.0f}ms (budget {bot_config.STARTUP_BUDGET_SECONDS}s)")
+        
+        rss = get_rss_bytes()
+        if rss:
+            print(f"  {'rss':<16} {format_bytes(rss):>10}")
+        
+        if time_to_ready > bot_config.STARTUP_BUDGET_SECONDS:
+            print(f"⚠️ Startup took {time_to_ready:.1f}s, over the {bot_config.STARTUP_BUDGET_SECONDS}s budget")
+    
+    async def warm_caches(self):
+        """Initialize Firebase and prime the leaderboard, booster and auction caches off the event loop"""
+        # Behind the storage aggregator the caches are shared and it warmed them before starting the shards
+        if os.getenv('LEVELBOT_STORAGE_SOCKET'):
+            self.caches_warmed = True
+            self.warmup_finished.set()
+            return
+        
+        # Otherwise only the shard running the background loops warms up, the rest fill their caches on demand
+        if not self.runs_background_tasks:
+            self.warmup_finished.set()
+            return
+        
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(firebase_manager.warm_caches)
+            self.caches_warmed = True
+        except Exception as e:
+            print(f"Error warming caches: {e}")
+        finally:
+            self.warmup_finished.set()
+        self.record_phase("cache warm-up", started)
+    
+    async def wait_until_warm(self):
+        await self.wait_until_ready()
+        await self.warmup_finished.wait()
+    
     async def on_ready(self):
         print(f'✅ Logged in as {self.user.name} ({self.user.id})')
         print(f'Connected to {len(self.guilds)} guild(s)')
         print('------')
+        
+        # on_ready fires again after reconnects, only profile and warm up once
+        if self.warmup_task is None:
+            self.record_phase("gateway connect", self.setup_finished)
+            time_to_ready = time.perf_counter() - STARTUP_STARTED
+            
+            self.warmup_task = asyncio.create_task(self.warm_caches())
+            self.warmup_task.add_done_callback(lambda task: self.print_startup_report(time_to_ready))
 
 
 async def main():
     bot = LevelingBot()
+    
+    # Deploys stop the process with SIGTERM, close cleanly so the snapshot gets written
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:
+        pass
+    
     try:
         await bot.start(os.getenv('DISCORD_TOKEN'))
     except KeyboardInterrupt:
         await bot.close()
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
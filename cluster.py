@@ -0,0 +1,73 @@
+import asyncio
+import os
+import signal
+import sys
+from dotenv import load_dotenv
+from config import config as bot_config
+from utils.firebase_manager import FirebaseManager
+from utils.storage_ipc import StorageAggregator
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+
+def get_shard_ids(cluster_id):
+    return list(range(cluster_id, bot_config.CLUSTER_SHARD_COUNT, bot_config.CLUSTER_PROCESSES))
+
+async def run_shard_process(cluster_id, stopping):
+    """Run one bot.py process for this cluster's shards, restarting it if it dies"""
+    shard_ids = get_shard_ids(cluster_id)
+    env = {
+        **os.environ,
+        'LEVELBOT_CLUSTER_ID': str(cluster_id),
+        'LEVELBOT_SHARD_IDS': ','.join(str(shard_id) for shard_id in shard_ids),
+        'LEVELBOT_SHARD_COUNT': str(bot_config.CLUSTER_SHARD_COUNT),
+        'LEVELBOT_STORAGE_SOCKET': os.path.abspath(bot_config.STORAGE_SOCKET_PATH)
+    }
+
+    while not stopping.is_set():
+        process = await asyncio.create_subprocess_exec(sys.executable, 'bot.py', env=env)
+        print(f"Started cluster {cluster_id} (shards {shard_ids}, pid {process.pid})")
+
+        wait_task = asyncio.create_task(process.wait())
+        stop_task = asyncio.create_task(stopping.wait())
+        await asyncio.wait({wait_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+
+        if stopping.is_set():
+            # SIGTERM lets the bot close cleanly and write its snapshot
+            if process.returncode is None:
+                process.terminate()
+            await wait_task
+            return
+
+        stop_task.cancel()
+        print(f"Cluster {cluster_id} exited with code {process.returncode}, restarting in {bot_config.CLUSTER_RESTART_DELAY}s")
+        await asyncio.sleep(bot_config.CLUSTER_RESTART_DELAY)
+
+async def main():
+    if bot_config.CLUSTER_SHARD_COUNT < bot_config.CLUSTER_PROCESSES:
+        raise ValueError("CLUSTER_SHARD_COUNT must be at least CLUSTER_PROCESSES")
+
+    aggregator = StorageAggregator(FirebaseManager(), bot_config.STORAGE_SOCKET_PATH)
+    await aggregator.start()
+    print(f"Storage aggregator listening on {bot_config.STORAGE_SOCKET_PATH}")
+
+    # Shards start against warm leaderboard and auction caches
+    await aggregator.dispatch({'method': 'warm_caches'})
+
+    stopping = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await asyncio.gather(*(run_shard_process(cluster_id, stopping) for cluster_id in range(bot_config.CLUSTER_PROCESSES)))
+    finally:
+        # Shards are gone by now, so nothing new can be queued behind the final writes
+        await aggregator.close()
+        print(f"Storage aggregator stopped: {aggregator.stats}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
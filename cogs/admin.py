@@ -0,0 +1,322 @@
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from utils import firebase_manager, lock_manager, db_tracer, guild_configs
+from utils import memory
+from utils.profiler import SamplingProfiler, format_collapsed, format_top_functions
+from config import config as bot_config
+from typing import Literal
+import io
+import asyncio
+import tracemalloc
+
+# The projections the commands read with get_user_fields(), /benchreads times each one against a full read
+READ_PROJECTIONS = {
+    '/coinflip': ['coins', 'lastGambleTime'],
+    '/bid': ['coins'],
+    '/rank': ['level', 'totalXP', 'coins', 'messageCount'],
+    '/buy role': ['coins', 'roles'],
+    '/equip': ['roles'],
+    '/inventory': ['items'],
+    '/customrole': ['items/custom_role_pass'],
+}
+
+class Admin(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.profiler = SamplingProfiler(bot_config.PROFILE_SAMPLE_INTERVAL)
+        self.last_memory_snapshot = None
+        self.memory_growth = []
+
+        if bot_config.MEMORY_TRACE_ENABLED:
+            self.take_memory_snapshot.start()
+
+    def cog_unload(self):
+        self.take_memory_snapshot.cancel()
+
+    #============================#
+    #      Helper Functions      #
+    #============================#
+
+    def has_admin_role(self, member):
+        return guild_configs.get(member.guild).has_admin_role(member)
+
+    async def reload_with_state(self, extension):
+        """
+        Reload an extension and hand each cog's in-memory state from the old instance to the new one.
+        If the reload fails discord.py keeps the old module loaded, so the state is never lost.
+        """
+        old_cogs = [cog for cog in self.bot.cogs.values() if cog.__module__ == extension]
+
+        states = {}
+        for cog in old_cogs:
+            if hasattr(cog, 'export_state'):
+                states[cog.qualified_name] = cog.export_state()
+
+        await self.bot.reload_extension(extension)
+
+        for cog_name, state in states.items():
+            new_cog = self.bot.get_cog(cog_name)
+            if new_cog and hasattr(new_cog, 'import_state'):
+                new_cog.import_state(state)
+
+        return list(states)
+
+    def collect_cache_sizes(self):
+        sizes = {
+            'discord message cache': (len(self.bot.cached_messages), None),
+            'discord member cache': (sum(len(guild.members) for guild in self.bot.guilds), None),
+            'keyed locks': (len(lock_manager._locks), None),
+        }
+
+        for cog in self.bot.cogs.values():
+            if hasattr(cog, 'cache_sizes'):
+                for name, size in cog.cache_sizes().items():
+                    sizes[f"{cog.qualified_name} {name}"] = size
+
+        sizes.update(firebase_manager.get_cache_sizes())
+        return sizes
+
+    def build_memory_report(self, snapshot):
+        rss = memory.get_rss_bytes()
+        lines = [f"RSS: {memory.format_bytes(rss) if rss else 'unknown'}"]
+
+        if snapshot:
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"Traced: {memory.format_bytes(current)} (peak {memory.format_bytes(peak)})")
+
+            lines.append("\nBy subsystem:")
+            for subsystem, size in memory.group_by_subsystem(snapshot):
+                lines.append(f"{memory.format_bytes(size):>10}  {subsystem}")
+
+            lines.append("\nTop allocators:")
+            lines.extend(memory.top_allocators(snapshot))
+
+            if self.memory_growth:
+                lines.append("\nGrowth since the previous periodic snapshot:")
+                lines.extend(self.memory_growth)
+        else:
+            lines.append("tracemalloc is off, set MEMORY_TRACE_ENABLED = True for allocation breakdowns")
+
+        lines.append("\nCaches:")
+        for name, (entries, size) in self.collect_cache_sizes().items():
+            size_text = f", ~{memory.format_bytes(size)}" if size is not None else ""
+            lines.append(f"{entries:>10,} entries{size_text}  {name}")
+
+        return '\n'.join(lines)
+
+    def format_migration_preview(self, preview, curve_text):
+        lines = [
+            f"Curve: {curve_text}",
+            f"Users: {preview['users']:,}, changing: {preview['changed']:,} "
+            f"({preview['raised']:,} up, {preview['lowered']:,} down), computed in {preview['seconds'] * 1000:.0f}ms",
+            "",
+            "Level distribution (before -> after):"
+        ]
+
+        bucket_size = preview['bucket_size']
+        for bucket, (before, after) in enumerate(zip(preview['old_distribution'], preview['new_distribution'])):
+            if before or after:
+                low = bucket * bucket_size
+                lines.append(f"{low:>4}-{low + bucket_size - 1:<4} {before:>8,} -> {after:,}")
+
+        if preview['threshold_changes']:
+            lines.append("")
+            lines.append("Level roles in this server (gained / lost):")
+            for threshold, (gained, lost) in preview['threshold_changes'].items():
+                lines.append(f"Level {threshold:>4}: +{gained:,} / -{lost:,}")
+
+        return '\n'.join(lines)
+
+    def format_read_benchmark(self, results, rounds):
+        lines = [f"Full user read vs projection, median of {rounds} round(s):", ""]
+        for result in results:
+            saved = 1 - result['projected_bytes'] / result['full_bytes'] if result['full_bytes'] else 0
+            lines.append(
+                f"{result['name']:<12} {result['full_bytes']:>6,}B -> {result['projected_bytes']:>6,}B ({saved:.0%} smaller), "
+                f"{result['full_ms']:.0f}ms -> {result['projected_ms']:.0f}ms  [{', '.join(result['fields'])}]"
+            )
+        return '\n'.join(lines)
+
+    #============================#
+    #      Memory Snapshots      #
+    #============================#
+
+    @tasks.loop(minutes=bot_config.MEMORY_SNAPSHOT_INTERVAL)
+    async def take_memory_snapshot(self):
+        # Snapshotting and diffing walk every traced block, keep that off the event loop
+        snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+
+        if self.last_memory_snapshot:
+            self.memory_growth = await asyncio.to_thread(memory.top_growth, self.last_memory_snapshot, snapshot)
+            if self.memory_growth:
+                print("Memory growth since last snapshot:\n" + "\n".join(self.memory_growth))
+
+        self.last_memory_snapshot = snapshot
+
+    #============================#
+    #        Admin Commands      #
+    #============================#
+
+    @app_commands.command(name="reload", description="Reload a cog without restarting the bot (Admin only)")
+    @app_commands.describe(cog="The cog to reload")
+    async def reload(
+        self, interaction: discord.Interaction,
+        cog: Literal["leveling", "shop", "commands", "custom_role", "auction", "help", "gambling", "role_sync", "guild_settings", "economy"]
+        ):
+
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        extension = f"cogs.{cog}"
+        try:
+            handed_off = await self.reload_with_state(extension)
+        except commands.ExtensionError as e:
+            print(f"Error reloading {extension}: {e}")
+            await interaction.followup.send(f"Failed to reload `{extension}`, the old version is still running:\n```{e}```", ephemeral=True)
+            return
+
+        # Only hits the API if a command signature actually changed
+        await self.bot.sync_commands_if_changed()
+
+        state_text = f" State handed off for: {', '.join(handed_off)}." if handed_off else ""
+        await interaction.followup.send(f"Reloaded `{extension}`.{state_text}", ephemeral=True)
+
+    @app_commands.command(name="dbtrace", description="Show database round trips per command (Admin only)")
+    @app_commands.describe(reset="Clear the collected stats after showing them")
+    async def dbtrace(self, interaction: discord.Interaction, reset: bool = False):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        if not db_tracer.enabled:
+            await interaction.response.send_message("Database tracing is off. Set `DB_TRACE_ENABLED = True` in the config.", ephemeral=True)
+            return
+
+        report = db_tracer.report() or "No database calls recorded yet."
+
+        single_flight = await asyncio.to_thread(firebase_manager.get_single_flight_stats)
+        if single_flight:
+            report += "\n\nSingle-flight reads (collapsed / calls):\n" + '\n'.join(
+                f"{read}: {stats['collapsed']:,} / {stats['calls']:,}" for read, stats in sorted(single_flight.items())
+            )
+        file = discord.File(io.BytesIO(report.encode()), filename='dbtrace.txt')
+        await interaction.response.send_message("Database round trips per command:", file=file, ephemeral=True)
+
+        if reset:
+            db_tracer.reset()
+
+    @app_commands.command(name="profile", description="Sample every thread and attach flame graph data (Admin only)")
+    @app_commands.describe(seconds="How long to sample for")
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, bot_config.PROFILE_MAX_SECONDS]):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        if self.profiler.running.locked():
+            await interaction.response.send_message("A profile is already running!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        # The sampler runs on its own thread so the event loop shows up in the samples instead of being blocked
+        try:
+            stacks, samples = await asyncio.to_thread(self.profiler.run, seconds)
+        except RuntimeError as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+            return
+
+        files = [
+            discord.File(io.BytesIO(format_collapsed(stacks).encode()), filename='profile.collapsed'),
+            discord.File(io.BytesIO(format_top_functions(stacks).encode()), filename='profile_top.txt'),
+        ]
+        await interaction.followup.send(
+            f"Profiled for {seconds}s ({samples:,} samples). `profile.collapsed` loads straight into speedscope or flamegraph.pl.",
+            files=files,
+            ephemeral=True
+        )
+
+    @app_commands.command(name="memory", description="Show memory use by subsystem and cache (Admin only)")
+    async def memory_report(self, interaction: discord.Interaction):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        # Grouping a snapshot and sizing the user cache both walk a lot of objects, do it off the event loop
+        def collect():
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            return self.build_memory_report(snapshot)
+
+        report = await asyncio.to_thread(collect)
+        file = discord.File(io.BytesIO(report.encode()), filename='memory.txt')
+        await interaction.followup.send("Memory report:", file=file, ephemeral=True)
+
+    @app_commands.command(name="migratexpcurve", description="Recompute every level under a new XP curve (Admin only)")
+    @app_commands.describe(
+        coefficient="XP for a level is coefficient * level ^ exponent (default 12.25)",
+        exponent="The power levels are raised to (default 2)",
+        apply="Write the new levels, leave off to only preview the change"
+    )
+    async def migratexpcurve(self, interaction: discord.Interaction, coefficient: float, exponent: float, apply: bool = False):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        if coefficient <= 0 or exponent <= 0:
+            await interaction.response.send_message("Coefficient and exponent must both be positive!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        curve_text = f"{coefficient:g} * level^{exponent:g}"
+        thresholds = guild_configs.get(interaction.guild).level_thresholds
+        preview = await asyncio.to_thread(firebase_manager.preview_level_migration, coefficient, exponent, thresholds)
+        report = self.format_migration_preview(preview, curve_text)
+        file = discord.File(io.BytesIO(report.encode()), filename='xp_curve_migration.txt')
+
+        if not apply:
+            await interaction.followup.send(
+                f"Preview only, {preview['changed']:,} user(s) would change level. Run again with `apply: True` to write it.",
+                file=file,
+                ephemeral=True
+            )
+            return
+
+        written = await asyncio.to_thread(firebase_manager.migrate_levels, coefficient, exponent)
+        await interaction.followup.send(
+            f"Switched to {curve_text} and updated {written:,} level(s). Run `/resyncroles` to bring level roles in line.",
+            file=file,
+            ephemeral=True
+        )
+
+    @app_commands.command(name="sparseusers", description="Delete stored user fields that only hold their default (Admin only)")
+    async def sparseusers(self, interaction: discord.Interaction):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        users, removed = await asyncio.to_thread(firebase_manager.strip_user_defaults)
+        await interaction.followup.send(f"Removed {removed:,} default field(s) from {users:,} user document(s).", ephemeral=True)
+
+    @app_commands.command(name="benchreads", description="Compare full user reads with projected reads (Admin only)")
+    @app_commands.describe(user="Whose data to read, defaults to you", rounds="Reads per projection")
+    async def benchreads(self, interaction: discord.Interaction, user: discord.User = None, rounds: app_commands.Range[int, 1, 20] = 5):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        user = user or interaction.user
+        results = await asyncio.to_thread(firebase_manager.benchmark_user_reads, user.id, READ_PROJECTIONS, rounds)
+        await interaction.followup.send(f"```{self.format_read_benchmark(results, rounds)}```", ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-from utils import firebase_manager
+from utils import firebase_manager, lock_manager, user_key, auction_key, metrics, db_tracer, guild_configs
+from utils.timestamps import from_epoch_ms
 from config import config as bot_config
 from datetime import datetime, timedelta
 from typing import Literal
@@ -10,7 +11,13 @@ import asyncio
 class Auctions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_auction_expiry.start()
+        self.auction_messages = {}
+        self.pending_auction_embeds = {}
+        self.auction_embed_tasks = {}
+        # Snapshot message ids whose edit task is still waiting for the channel cache
+        self.restored_auction_messages = {}
+        if bot.runs_background_tasks:
+            self.check_auction_expiry.start()
     
     #=============================#
     #   Auction Helper Functions  #
@@ -18,9 +25,44 @@ class Auctions(commands.Cog):
 
     def cog_unload(self):
         self.check_auction_expiry.cancel()
+        for task in self.auction_embed_tasks.values():
+            task.cancel()
+    
+    def export_state(self):
+        auction_messages = dict(self.restored_auction_messages)
+        auction_messages.update({
+            auction_id: [message.channel.id, message.id] for auction_id, message in self.auction_messages.items()
+        })
+        return {
+            'auction_messages': auction_messages,
+            'pending_auction_embeds': {
+                auction_id: embed.to_dict() for auction_id, embed in self.pending_auction_embeds.items()
+            }
+        }
+    
+    def cache_sizes(self):
+        return {
+            'auction_messages': (len(self.auction_messages), None),
+            'pending_auction_embeds': (len(self.pending_auction_embeds), None)
+        }
+    
+    def import_state(self, state):
+        auction_messages = state.get('auction_messages', {})
+        
+        # Handles for auctions without a pending edit are rebuilt from the auction record on the next bid,
+        # only the unsent edits need their message ids carried over
+        for auction_id, embed_data in state.get('pending_auction_embeds', {}).items():
+            message_ids = auction_messages.get(auction_id)
+            if message_ids is None:
+                continue
+            
+            # Older snapshots only kept the message id, those auctions were all in the default channel
+            channel_id, message_id = message_ids if isinstance(message_ids, list) else (None, message_ids)
+            self.restored_auction_messages[auction_id] = [channel_id, message_id]
+            self.queue_auction_embed_update(auction_id, channel_id, message_id, discord.Embed.from_dict(embed_data))
     
     def has_auctioneer_role(self, member):
-        return any(role.id in bot_config.AUCTIONEER_ROLE_IDS for role in member.roles)
+        return guild_configs.get(member.guild).has_auctioneer_role(member)
     
     def get_auction_item_info(self, item_type):
         items = {
@@ -47,81 +89,180 @@ class Auctions(commands.Cog):
         }
         return items.get(item_type)
     
-    async def complete_auction(self, auction_id, auction_data):
+    def build_auction_embed(self, auction_id, item_info, starting_bid, current_bid, bidder_text, end_time):
+        embed = discord.Embed(
+            title=f"Auction Started - {item_info['name']}",
+            description=item_info['description'],
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Starting Bid", value=f"{starting_bid:,} Coins", inline=True)
+        embed.add_field(name="Current Bid", value=f"{current_bid:,} Coins", inline=True)
+        embed.add_field(name="Highest Bidder", value=bidder_text, inline=True)
+        embed.add_field(name="Ends At", value=f"<t:{int(end_time.timestamp())}:R>", inline=False)
+        embed.set_footer(text=f"Use /bid {auction_id} <amount> to place a bid!")
+        return embed
+    
+    #=============================#
+    #    Auction Embed Updates    #
+    #=============================#
+
+    def get_auction_channel(self, channel_id):
+        # Auctions started before the channel was stored were all posted in the default one
+        channel_id = channel_id or guild_configs.get(None).auction_channel_id
+        return self.bot.get_channel(int(channel_id)) if channel_id else None
+    
+    def get_auction_message(self, auction_id, channel_id, message_id):
+        """Return a cached PartialMessage for the auction embed so edits skip the fetch_message round trip"""
+        message = self.auction_messages.get(auction_id)
+        
+        if message is None and message_id:
+            auction_channel = self.get_auction_channel(channel_id)
+            if auction_channel:
+                message = auction_channel.get_partial_message(int(message_id))
+                self.auction_messages[auction_id] = message
+        
+        return message
+    
+    def queue_auction_embed_update(self, auction_id, channel_id, message_id, embed):
+        """Keep only the latest embed per auction and let a single task push it out"""
+        self.pending_auction_embeds[auction_id] = embed
+        
+        if auction_id not in self.auction_embed_tasks:
+            self.auction_embed_tasks[auction_id] = asyncio.create_task(
+                self.flush_auction_embed(auction_id, channel_id, message_id)
+            )
+    
+    async def flush_auction_embed(self, auction_id, channel_id, message_id):
         try:
-            winner_id = auction_data.get('highestBidder')
-            winning_bid = auction_data.get('highestBid', 0)
-            item_type = auction_data.get('itemType')
-            
-            auction_channel = self.bot.get_channel(bot_config.AUCTION_CHANNEL_ID)
+            # Edits restored from a snapshot are queued before the gateway has filled the channel cache
+            await self.bot.wait_until_ready()
             
-            if not winner_id or winning_bid == 0:
-                embed = discord.Embed(
-                    title="Auction Ended - No Bids",
-                    description=f"The auction for **{self.get_auction_item_info(item_type)['name']}** has ended with no bids.",
-                    color=discord.Color.orange()
-                )
-                if auction_channel:
-                    await auction_channel.send(embed=embed)
-                
-                firebase_manager.delete_auction(auction_id)
+            message = self.get_auction_message(auction_id, channel_id, message_id)
+            self.restored_auction_messages.pop(auction_id, None)
+            if message is None:
+                self.pending_auction_embeds.pop(auction_id, None)
                 return
             
-            winner = await self.bot.fetch_user(int(winner_id))
-            
-            if item_type == 'XP Boost 5%':
-                firebase_manager.set_user_role(winner_id, 'XP Boost 5%', True)
-                item_name = 'XP Boost 5%'
-            elif item_type == 'XP Boost 10%':
-                firebase_manager.set_user_role(winner_id, 'XP Boost 10%', True)
-                item_name = 'XP Boost 10%'
-            elif item_type == 'custom_role_pass':
-                firebase_manager.add_item(winner_id, 'custom_role_pass', 1)
-                item_name = 'Custom Role Pass'
-            elif item_type == 'large_booster':
-                firebase_manager.add_item(winner_id, 'large_booster', 1)
-                item_name = 'Large Booster'
-            
+            while auction_id in self.pending_auction_embeds:
+                embed = self.pending_auction_embeds.pop(auction_id)
+                
+                try:
+                    await message.edit(embed=embed)
+                except discord.NotFound:
+                    self.pending_auction_embeds.pop(auction_id, None)
+                    self.auction_messages.pop(auction_id, None)
+                    break
+                except Exception as e:
+                    print(f"Error updating auction message: {e}")
+                
+                # Bids arriving during this window are coalesced into the next edit
+                await asyncio.sleep(bot_config.AUCTION_EMBED_EDIT_INTERVAL)
+        finally:
+            self.auction_embed_tasks.pop(auction_id, None)
+    
+    def forget_auction_message(self, auction_id):
+        self.auction_messages.pop(auction_id, None)
+        self.restored_auction_messages.pop(auction_id, None)
+        self.pending_auction_embeds.pop(auction_id, None)
+        
+        task = self.auction_embed_tasks.pop(auction_id, None)
+        if task:
+            task.cancel()
+    
+    async def settle_auction(self, auction_id, auction_data):
+        """
+        Grant the item to the winner and delete the auction. Caller holds the auction lock.
+        Only database work happens here, returns the won item's name or None without a winner.
+        """
+        self.forget_auction_message(auction_id)
+        
+        winner_id = auction_data.get('highestBidder')
+        winning_bid = auction_data.get('highestBid', 0)
+        item_type = auction_data.get('itemType')
+        item_name = None
+        
+        if winner_id and winning_bid != 0:
+            async with lock_manager.acquire(user_key(winner_id)):
+                item_name = await asyncio.to_thread(self.grant_auction_item, winner_id, item_type)
+        
+        await asyncio.to_thread(firebase_manager.delete_auction, auction_id)
+        return item_name
+    
+    def grant_auction_item(self, winner_id, item_type):
+        """Give the winner the auctioned item. Returns its display name."""
+        if item_type == 'XP Boost 5%':
+            firebase_manager.set_user_role(winner_id, 'XP Boost 5%', True)
+            return 'XP Boost 5%'
+        elif item_type == 'XP Boost 10%':
+            firebase_manager.set_user_role(winner_id, 'XP Boost 10%', True)
+            return 'XP Boost 10%'
+        elif item_type == 'custom_role_pass':
+            firebase_manager.add_item(winner_id, 'custom_role_pass', 1)
+            return 'Custom Role Pass'
+        elif item_type == 'large_booster':
+            firebase_manager.add_item(winner_id, 'large_booster', 1)
+            return 'Large Booster'
+        return None
+    
+    async def announce_auction_result(self, auction_data, item_name):
+        winner_id = auction_data.get('highestBidder')
+        winning_bid = auction_data.get('highestBid', 0)
+        item_type = auction_data.get('itemType')
+        
+        auction_channel = self.get_auction_channel(auction_data.get('channelId'))
+        
+        if item_name is None:
             embed = discord.Embed(
-                title="Auction Won!",
-                description=f"{winner.mention} has won the auction for **{item_name}**!",
-                color=discord.Color.gold()
+                title="Auction Ended - No Bids",
+                description=f"The auction for **{self.get_auction_item_info(item_type)['name']}** has ended with no bids.",
+                color=discord.Color.orange()
             )
-            embed.add_field(name="Winning Bid", value=f"{winning_bid:,} Coins", inline=True)
-            embed.add_field(name="Winner", value=winner.mention, inline=True)
-            
             if auction_channel:
                 await auction_channel.send(embed=embed)
+            return
+        
+        winner = await self.bot.fetch_user(int(winner_id))
+        
+        embed = discord.Embed(
+            title="Auction Won!",
+            description=f"{winner.mention} has won the auction for **{item_name}**!",
+            color=discord.Color.gold()
+        )
+        embed.add_field(name="Winning Bid", value=f"{winning_bid:,} Coins", inline=True)
+        embed.add_field(name="Winner", value=winner.mention, inline=True)
+        
+        if auction_channel:
+            await auction_channel.send(embed=embed)
+        
+        try:
+            dm_embed = discord.Embed(
+                title="Congratulations!",
+                description=f"You won the auction for **{item_name}**!",
+                color=discord.Color.gold()
+            )
+            dm_embed.add_field(name="Your Winning Bid", value=f"{winning_bid:,} Coins", inline=False)
             
-            try:
-                dm_embed = discord.Embed(
-                    title="Congratulations!",
-                    description=f"You won the auction for **{item_name}**!",
-                    color=discord.Color.gold()
-                )
-                dm_embed.add_field(name="Your Winning Bid", value=f"{winning_bid:,} Coins", inline=False)
-                
-                if item_type in ['XP Boost 5%', 'XP Boost 10%']:
-                    dm_embed.add_field(name="Next Steps", value="Use `/use` to activate your XP boost!", inline=False)
-                elif item_type == 'custom_role_pass':
-                    dm_embed.add_field(name="Next Steps", value="Use `/use customrole` to activate it, then `/customrole` to create your role!", inline=False)
-                elif item_type == 'large_booster':
-                    dm_embed.add_field(name="Next Steps", value="Use `/use large` to activate your booster!", inline=False)
-                
-                await winner.send(embed=dm_embed)
-            except discord.Forbidden:
-                pass
+            if item_type in ['XP Boost 5%', 'XP Boost 10%']:
+                dm_embed.add_field(name="Next Steps", value="Use `/use` to activate your XP boost!", inline=False)
+            elif item_type == 'custom_role_pass':
+                dm_embed.add_field(name="Next Steps", value="Use `/use customrole` to activate it, then `/customrole` to create your role!", inline=False)
+            elif item_type == 'large_booster':
+                dm_embed.add_field(name="Next Steps", value="Use `/use large` to activate your booster!", inline=False)
             
-            firebase_manager.delete_auction(auction_id)
-        
-        except Exception as e:
-            print(f"Error completing auction {auction_id}: {e}")
+            await winner.send(embed=dm_embed)
+        except discord.Forbidden:
+            pass
+    
+    async def notify_refund(self, user_id, title, description):
+        try:
+            user = await self.bot.fetch_user(int(user_id))
+            refund_embed = discord.Embed(title=title, description=description, color=discord.Color.orange())
+            await user.send(embed=refund_embed)
+        except:
+            pass
     
     def has_admin_role(self, member):
-        for role in member.roles:
-            if role.id in bot_config.ADMIN_ROLE_IDS:
-                return True
-        return False
+        return guild_configs.get(member.guild).has_admin_role(member)
     
     #=============================#
     #     Auction Management      #
@@ -129,25 +270,28 @@ class Auctions(commands.Cog):
 
     @tasks.loop(minutes=1)
     async def check_auction_expiry(self):
-        try:
-            active_auctions = firebase_manager.get_active_auctions()
+        db_tracer.start_operation('task:auction_expiry')
+        with metrics.task_duration.time('auction_expiry'):
+            try:
+                # Range query on expiresAt, only auctions that have ended come back
+                due_auctions = await asyncio.to_thread(firebase_manager.get_due_auctions)
             
-            for auction_id, auction_data in active_auctions.items():
-                end_time_str = auction_data.get('endTime')
-                if not end_time_str:
-                    continue
-                
-                try:
-                    end_time = datetime.fromisoformat(end_time_str)
-                    current_time = datetime.now()
-                    
-                    if current_time >= end_time:
-                        await self.complete_auction(auction_id, auction_data)
-                except Exception as e:
-                    print(f"Error checking auction {auction_id} expiry: {e}")
-        
-        except Exception as e:
-            print(f"Error in auction expiry check: {e}")
+                for auction_id in due_auctions:
+                    try:
+                        async with lock_manager.acquire(auction_key(auction_id)):
+                            # Re-read under the lock so a bid that landed since the query isn't lost
+                            auction_data = await asyncio.to_thread(firebase_manager.get_auction, auction_id)
+                            if not (auction_data and auction_data.get('active', False)):
+                                continue
+                            item_name = await self.settle_auction(auction_id, auction_data)
+                        
+                        # Announced after the lock is released, a slow DM shouldn't hold up bids
+                        await self.announce_auction_result(auction_data, item_name)
+                    except Exception as e:
+                        print(f"Error checking auction {auction_id} expiry: {e}")
+        
+            except Exception as e:
+                print(f"Error in auction expiry check: {e}")
     
     @check_auction_expiry.before_loop
     async def before_check_auction_expiry(self):
@@ -189,6 +333,12 @@ class Auctions(commands.Cog):
             await interaction.response.send_message("Duration must be between 1 and 72 hours!", ephemeral=True)
             return
         
+        channel_id = guild_configs.get(interaction.guild).auction_channel_id
+        auction_channel = self.bot.get_channel(channel_id) if channel_id else None
+        if not auction_channel:
+            await interaction.response.send_message("This server has no auction channel, set `auction_channel_id` with `/setguildconfig` first.", ephemeral=True)
+            return
+        
         item_info = self.get_auction_item_info(item_type)
         if starting_bid is None:
             starting_bid = item_info['starting_bid']
@@ -199,28 +349,19 @@ class Auctions(commands.Cog):
         
         end_time = datetime.now() + timedelta(hours=duration)
         
-        auction_id = firebase_manager.create_auction(
+        auction_id = await asyncio.to_thread(
+            firebase_manager.create_auction,
             item_type=item_type,
             starting_bid=starting_bid,
             duration_hours=duration,
             started_by=interaction.user.id
         )
         
-        embed = discord.Embed(
-            title=f"Auction Started - {item_info['name']}",
-            description=item_info['description'],
-            color=discord.Color.blue()
-        )
-        embed.add_field(name="Starting Bid", value=f"{starting_bid:,} Coins", inline=True)
-        embed.add_field(name="Current Bid", value=f"{starting_bid:,} Coins", inline=True)
-        embed.add_field(name="Highest Bidder", value="No bids yet", inline=True)
-        embed.add_field(name="Ends At", value=f"<t:{int(end_time.timestamp())}:R>", inline=False)
-        embed.set_footer(text=f"Use /bid {auction_id} <amount> to place a bid!")
+        embed = self.build_auction_embed(auction_id, item_info, starting_bid, starting_bid, "No bids yet", end_time)
         
-        auction_channel = self.bot.get_channel(bot_config.AUCTION_CHANNEL_ID)
-        if auction_channel:
-            message = await auction_channel.send(embed=embed)
-            firebase_manager.set_auction_message_id(auction_id, message.id)
+        message = await auction_channel.send(embed=embed)
+        await asyncio.to_thread(firebase_manager.set_auction_message_id, auction_id, message.id, auction_channel.id)
+        self.auction_messages[auction_id] = auction_channel.get_partial_message(message.id)
         
         await interaction.response.send_message(f"Auction started! ID: `{auction_id}`", ephemeral=True)
 
@@ -231,29 +372,31 @@ class Auctions(commands.Cog):
             await interaction.response.send_message("You don't have permission to cancel auctions!", ephemeral=True)
             return
         
-        auction = firebase_manager.get_auction(auction_id)
+        async with lock_manager.acquire(auction_key(auction_id)):
+            auction = await asyncio.to_thread(firebase_manager.get_auction, auction_id)
+            if auction:
+                bidder_id = auction.get('highestBidder')
+                bid_amount = auction.get('highestBid', 0)
+                refunded = bidder_id and bid_amount > 0
+                
+                if refunded:
+                    async with lock_manager.acquire(user_key(bidder_id)):
+                        await asyncio.to_thread(firebase_manager.record_transaction, bidder_id, 'refund', bid_amount, reference=auction_id)
+                
+                await asyncio.to_thread(firebase_manager.delete_auction, auction_id)
+                self.forget_auction_message(auction_id)
+        
         if not auction:
             await interaction.response.send_message("Auction not found!", ephemeral=True)
             return
         
-        bidder_id = auction.get('highestBidder')
-        bid_amount = auction.get('highestBid', 0)
+        await interaction.response.send_message("Auction cancelled successfully!", ephemeral=True)
         
-        if bidder_id and bid_amount > 0:
-            firebase_manager.add_xp(int(bidder_id), "Auction Cancelled", bid_amount)
-            
-            try:
-                bidder = await self.bot.fetch_user(int(bidder_id))
-                refund_embed = discord.Embed(
-                    title="Auction Cancelled",
-                    description=f"The auction you bid on has been cancelled. Your bid of **{bid_amount:,} Coins** has been refunded.",
-                    color=discord.Color.orange()
-                )
-                await bidder.send(embed=refund_embed)
-            except:
-                pass
-        
-        firebase_manager.delete_auction(auction_id)
+        if refunded:
+            await self.notify_refund(
+                bidder_id, "Auction Cancelled",
+                f"The auction you bid on has been cancelled. Your bid of **{bid_amount:,} Coins** has been refunded."
+            )
         
         item_info = self.get_auction_item_info(auction.get('itemType'))
         
@@ -263,11 +406,9 @@ class Auctions(commands.Cog):
             color=discord.Color.red()
         )
         
-        auction_channel = self.bot.get_channel(bot_config.AUCTION_CHANNEL_ID)
+        auction_channel = self.get_auction_channel(auction.get('channelId'))
         if auction_channel:
             await auction_channel.send(embed=embed)
-        
-        await interaction.response.send_message("Auction cancelled successfully!", ephemeral=True)
 
     #=============================#
     #       Auction Commands      #
@@ -275,117 +416,111 @@ class Auctions(commands.Cog):
     @app_commands.command(name="bid", description="Place a bid on an active auction")
     @app_commands.describe(auction_id="The auction ID", amount="Your bid amount")
     async def bid(self, interaction: discord.Interaction, auction_id: str, amount: int):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID or interaction.channel.id == bot_config.AUCTIONEER_ROLE_IDS:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
         
         if self.has_admin_role(interaction.user):
             return
         
-        auction = firebase_manager.get_auction(auction_id)
+        async with lock_manager.acquire(auction_key(auction_id)):
+            auction = await asyncio.to_thread(firebase_manager.get_auction, auction_id)
+            
+            if auction:
+                bidder_keys = [user_key(interaction.user.id)]
+                if auction.get('highestBidder'):
+                    bidder_keys.append(user_key(auction['highestBidder']))
+                
+                async with lock_manager.acquire(*bidder_keys):
+                    reply, outbid, placed = await asyncio.to_thread(self.place_bid, interaction.user, auction_id, auction, amount)
+                
+                if placed:
+                    self.update_auction_embed(auction_id, auction, amount, interaction.user)
         
         if not auction:
             await interaction.response.send_message("Auction not found!", ephemeral=True)
             return
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        # Answered before the refund DM, the interaction has to be acknowledged within 3 seconds
+        await interaction.response.send_message(reply, ephemeral=True)
+        
+        if outbid:
+            previous_bidder, refunded = outbid
+            await self.notify_refund(
+                previous_bidder, "Bid Refunded",
+                f"Your bid of **{refunded:,} Coins** was outbid on auction `{auction_id}`."
+            )
+
+    def place_bid(self, bidder, auction_id, auction, amount):
+        """
+        Validate and record a bid. Caller holds the auction lock and the locks of both the bidder
+        and the previous bidder, so nothing here waits on Discord. Returns the reply for the
+        bidder, (previous bidder, refunded amount) when someone was outbid, else None, and
+        whether the bid was placed.
+        """
+        user_data = firebase_manager.get_user_fields(bidder.id, ['coins'])
         user_coins = user_data['coins']
         
         current_highest = auction.get('highestBid', auction.get('startingBid', 0))
         previous_bidder = auction.get('highestBidder')
+        outbid = None
 
         if amount < 100:
-            await interaction.response.send_message("Bid must be at least 100 Coins!", ephemeral=True)
-            return
+            return "Bid must be at least 100 Coins!", None, False
         
     
-        is_own_bid = previous_bidder == str(interaction.user.id)
+        is_own_bid = previous_bidder == str(bidder.id)
         
         if is_own_bid:
             coins_difference = amount - current_highest
             
             if coins_difference <= 99:
-                await interaction.response.send_message(f"Your new bid must be at least 100 Coins higher than your current bid of {current_highest:,} Coins!", ephemeral=True)
-                return
+                return f"Your new bid must be at least 100 Coins higher than your current bid of {current_highest:,} Coins!", None, False
             
             if user_coins < coins_difference:
-                await interaction.response.send_message(f"Not enough Coins! You need {coins_difference:,} more Coins to increase your bid to {amount:,} Coins.", ephemeral=True)
-                return
+                return f"Not enough Coins! You need {coins_difference:,} more Coins to increase your bid to {amount:,} Coins.", None, False
             
-            firebase_manager.add_xp(interaction.user.id, str(interaction.user), -coins_difference)
+            firebase_manager.record_transaction(bidder.id, 'bid_hold', -coins_difference, reference=auction_id)
         else:
             if previous_bidder is None:
                 starting_bid = auction.get('startingBid', 0)
                 if amount < starting_bid:
-                    await interaction.response.send_message(f"Your bid must be at least the starting bid of {starting_bid:,} Coins!", ephemeral=True)
-                    return
+                    return f"Your bid must be at least the starting bid of {starting_bid:,} Coins!", None, False
             else:
                 if amount <= current_highest:
-                    await interaction.response.send_message(f"Your bid must be higher than the current bid of {current_highest:,} Coins!", ephemeral=True)
-                    return
+                    return f"Your bid must be higher than the current bid of {current_highest:,} Coins!", None, False
             
             
             if user_coins < amount:
-                await interaction.response.send_message(f"Not enough Coins! You have {user_coins:,} Coins but bid {amount:,} Coins.", ephemeral=True)
-                return
+                return f"Not enough Coins! You have {user_coins:,} Coins but bid {amount:,} Coins.", None, False
             
             if previous_bidder:
-                firebase_manager.add_xp(int(previous_bidder), "Auction Refund", current_highest)
-                
-                try:
-                    prev_user = await self.bot.fetch_user(int(previous_bidder))
-                    refund_embed = discord.Embed(
-                        title="Bid Refunded",
-                        description=f"Your bid of **{current_highest:,} Coins** was outbid on auction `{auction_id}`.",
-                        color=discord.Color.orange()
-                    )
-                    await prev_user.send(embed=refund_embed)
-                except:
-                    pass
+                firebase_manager.record_transaction(previous_bidder, 'refund', current_highest, reference=auction_id)
+                outbid = (previous_bidder, current_highest)
             
-            firebase_manager.add_xp(interaction.user.id, str(interaction.user), -amount)
+            firebase_manager.record_transaction(bidder.id, 'bid_hold', -amount, reference=auction_id)
         
-        firebase_manager.update_auction_bid(auction_id, interaction.user.id, amount)
-        
-        auction_channel = self.bot.get_channel(bot_config.AUCTION_CHANNEL_ID)
-        if auction_channel:
-            message_id = auction.get('messageId')
-            
-            if message_id:
-                try:
-                    original_message = await auction_channel.fetch_message(int(message_id))
-                    
-                    item_info = self.get_auction_item_info(auction.get('itemType'))
-                    end_time = datetime.fromisoformat(auction.get('endTime'))
-                    starting_bid = auction.get('startingBid', 0)
-                    
-                    updated_embed = discord.Embed(
-                        title=f"Auction Started - {item_info['name']}",
-                        description=item_info['description'],
-                        color=discord.Color.blue()
-                    )
-                    updated_embed.add_field(name="Starting Bid", value=f"{starting_bid:,} Coins", inline=True)
-                    updated_embed.add_field(name="Current Bid", value=f"{amount:,} Coins", inline=True)
-                    updated_embed.add_field(name="Highest Bidder", value=interaction.user.mention, inline=True)
-                    updated_embed.add_field(name="Ends At", value=f"<t:{int(end_time.timestamp())}:R>", inline=False)
-                    updated_embed.set_footer(text=f"Use /bid {auction_id} <amount> to place a bid!")
-                    
-                    await original_message.edit(embed=updated_embed)
-                except discord.NotFound:
-                    pass
-                except Exception as e:
-                    print(f"Error updating auction message: {e}")
+        firebase_manager.update_auction_bid(auction_id, bidder.id, amount)
         
         if is_own_bid:
-            await interaction.response.send_message(f"Bid updated successfully! You increased your bid to {amount:,} Coins.", ephemeral=True)
-        else:
-            await interaction.response.send_message(f"Bid placed successfully!", ephemeral=True)
+            return f"Bid updated successfully! You increased your bid to {amount:,} Coins.", outbid, True
+        return "Bid placed successfully!", outbid, True
+    
+    def update_auction_embed(self, auction_id, auction, amount, bidder):
+        message_id = auction.get('messageId')
+        if message_id:
+            item_info = self.get_auction_item_info(auction.get('itemType'))
+            end_time = from_epoch_ms(auction.get('endTime'))
+            starting_bid = auction.get('startingBid', 0)
+            
+            updated_embed = self.build_auction_embed(auction_id, item_info, starting_bid, amount, bidder.mention, end_time)
+            self.queue_auction_embed_update(auction_id, auction.get('channelId'), message_id, updated_embed)
 
     @app_commands.command(name="auctions", description="View all active auctions")
     async def view_auctions(self, interaction: discord.Interaction):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
         
-        auctions = firebase_manager.get_active_auctions()
+        auctions = await asyncio.to_thread(firebase_manager.get_active_auctions)
         
         if not auctions:
             await interaction.response.send_message("No active auctions at the moment!", ephemeral=True)
@@ -400,7 +535,7 @@ class Auctions(commands.Cog):
         for auction_id, auction_data in auctions.items():
             item_info = self.get_auction_item_info(auction_data.get('itemType'))
             current_bid = auction_data.get('highestBid', auction_data.get('startingBid', 0))
-            end_time = datetime.fromisoformat(auction_data.get('endTime'))
+            end_time = from_epoch_ms(auction_data.get('endTime'))
             
             bidder_text = "No bids yet"
             if auction_data.get('highestBidder'):
@@ -1,10 +1,10 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils import firebase_manager
+from utils import firebase_manager, lock_manager, user_key, metrics, guild_configs
 from config import config as bot_config
-from PIL import Image, ImageDraw, ImageFont
 import io
+import asyncio
 import aiohttp
 from typing import Literal
 
@@ -17,13 +17,13 @@ class Commands(commands.Cog):
     #============================#
 
     def has_admin_role(self, member):
-        for role in member.roles:
-            if role.id in bot_config.ADMIN_ROLE_IDS:
-                return True
-        return False
+        return guild_configs.get(member.guild).has_admin_role(member)
     
     # ====== LB & Rank Image Gens ====== #
+    # Pillow is imported inside the renderers so loading this cog doesn't pay for it at startup
     async def get_avatar_image(self, user):
+        from PIL import Image
+        
         async with aiohttp.ClientSession() as session:
             async with session.get(str(user.display_avatar.url)) as resp:
                 avatar_bytes = await resp.read()
@@ -31,12 +31,16 @@ class Commands(commands.Cog):
                 return avatar
     
     def create_circle_mask(self, size):
+        from PIL import Image, ImageDraw
+        
         mask = Image.new('L', size, 0)
         draw = ImageDraw.Draw(mask)
         draw.ellipse((0, 0, size[0], size[1]), fill=255)
         return mask
     
     def create_rank_card(self, user, user_data, rank):
+        from PIL import Image, ImageDraw, ImageFont
+        
         width, height = 900, 300
         card = Image.new('RGBA', (width, height), (47, 49, 54, 255))
         draw = ImageDraw.Draw(card)
@@ -108,6 +112,8 @@ class Commands(commands.Cog):
         return card
     
     async def add_avatar_to_card(self, card, user):
+        from PIL import Image
+        
         try:
             avatar = await self.get_avatar_image(user)
             avatar = avatar.resize((140, 140), Image.Resampling.LANCZOS)
@@ -121,6 +127,8 @@ class Commands(commands.Cog):
         return card
     
     async def create_leaderboard_card(self, leaderboard_data):
+        from PIL import Image, ImageDraw, ImageFont
+        
         width, height = 800, 800
         card = Image.new('RGBA', (width, height), (35, 39, 42, 255))
         draw = ImageDraw.Draw(card)
@@ -182,6 +190,8 @@ class Commands(commands.Cog):
         return card
     
     async def create_weekly_leaderboard_card(self, weekly_data):
+        from PIL import Image, ImageDraw, ImageFont
+        
         width, height = 800, 800
         card = Image.new('RGBA', (width, height), (35, 39, 42, 255))
         draw = ImageDraw.Draw(card)
@@ -243,20 +253,22 @@ class Commands(commands.Cog):
     #============================#
     @commands.hybrid_command(name="rank", description="View your rank card")
     async def rank(self, ctx):
-        if ctx.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if ctx.channel.id != guild_configs.get(ctx.guild).commands_channel_id:
             return
         await ctx.defer()
         
         try:
-            user_data = firebase_manager.get_user_data(ctx.author.id)
-            rank = firebase_manager.get_user_rank(ctx.author.id)
+            # Off the event loop so overlapping requests can share one read through the single-flight layer
+            user_data, rank = await asyncio.to_thread(firebase_manager.get_rank_card, ctx.author.id)
             
-            card = self.create_rank_card(ctx.author, user_data, rank)
-            card = await self.add_avatar_to_card(card, ctx.author)
+            with metrics.render_time.time('rank'):
+                # The XP thresholds are storage calls as well, so the whole render runs off the loop
+                card = await asyncio.to_thread(self.create_rank_card, ctx.author, user_data, rank)
+                card = await self.add_avatar_to_card(card, ctx.author)
             
-            buffer = io.BytesIO()
-            card.save(buffer, format='PNG')
-            buffer.seek(0)
+                buffer = io.BytesIO()
+                card.save(buffer, format='PNG')
+                buffer.seek(0)
             
             file = discord.File(buffer, filename='rank.png')
             await ctx.send(file=file)
@@ -266,23 +278,24 @@ class Commands(commands.Cog):
     
     @commands.hybrid_command(name="leaderboard", aliases=["lb"], description="View the server leaderboard")
     async def leaderboard(self, ctx):
-        if ctx.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if ctx.channel.id != guild_configs.get(ctx.guild).commands_channel_id:
             return
         await ctx.defer()
         
         
         try:
-            leaderboard = firebase_manager.get_leaderboard(limit=10)
+            leaderboard = await asyncio.to_thread(firebase_manager.get_leaderboard, 10)
             
             if not leaderboard:
                 await ctx.send("No users on the leaderboard yet!")
                 return
             
-            card = await self.create_leaderboard_card(leaderboard)
+            with metrics.render_time.time('leaderboard'):
+                card = await self.create_leaderboard_card(leaderboard)
             
-            buffer = io.BytesIO()
-            card.save(buffer, format='PNG')
-            buffer.seek(0)
+                buffer = io.BytesIO()
+                card.save(buffer, format='PNG')
+                buffer.seek(0)
             
             file = discord.File(buffer, filename='leaderboard.png')
             await ctx.send(file=file)
@@ -292,22 +305,23 @@ class Commands(commands.Cog):
     
     @commands.hybrid_command(name="weeklylb", aliases=["wlb"], description="View weekly message leaderboard")
     async def weeklylb(self, ctx):
-        if ctx.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if ctx.channel.id != guild_configs.get(ctx.guild).commands_channel_id:
             return
         await ctx.defer()
         
         try:
-            weekly_data = firebase_manager.get_weekly_leaderboard(limit=10)
+            weekly_data = await asyncio.to_thread(firebase_manager.get_weekly_leaderboard, 10)
             
             if not weekly_data:
                 await ctx.send("No weekly data yet!")
                 return
             
-            card = await self.create_weekly_leaderboard_card(weekly_data)
+            with metrics.render_time.time('weekly_leaderboard'):
+                card = await self.create_weekly_leaderboard_card(weekly_data)
             
-            buffer = io.BytesIO()
-            card.save(buffer, format='PNG')
-            buffer.seek(0)
+                buffer = io.BytesIO()
+                card.save(buffer, format='PNG')
+                buffer.seek(0)
             
             file = discord.File(buffer, filename='weekly_leaderboard.png')
             await ctx.send(file=file)
@@ -327,7 +341,8 @@ class Commands(commands.Cog):
         if not self.has_admin_role(interaction.user):
             return
 
-        result = firebase_manager.add_xp(user.id, str(user), amount)
+        async with lock_manager.acquire(user_key(user.id)):
+            result = await asyncio.to_thread(firebase_manager.add_xp, user.id, str(user), amount)
         
         # Update level roles
         leveling_cog = self.bot.get_cog('Leveling')
@@ -350,7 +365,8 @@ class Commands(commands.Cog):
         if not self.has_admin_role(interaction.user):
             return
         
-        result = firebase_manager.add_xp(user.id, str(user), -amount)
+        async with lock_manager.acquire(user_key(user.id)):
+            result = await asyncio.to_thread(firebase_manager.add_xp, user.id, str(user), -amount)
         
         leveling_cog = self.bot.get_cog('Leveling')
         if leveling_cog:
@@ -373,9 +389,30 @@ class Commands(commands.Cog):
                 await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
                 return
             
-            firebase_manager.reset_user(user.id)
+            await asyncio.to_thread(firebase_manager.reset_user, user.id)
             
             await interaction.response.send_message(f"Reset {user.mention}'s XP and progress!")
 
+    @app_commands.command(name="lockstats", description="Show lock contention and the hottest keys")
+    async def lockstats(self, interaction: discord.Interaction):
+        if not self.has_admin_role(interaction.user):
+            return
+        
+        embed = discord.Embed(
+            title="Lock Stats",
+            description=f"Acquisitions: **{lock_manager.acquisitions:,}**\nContended: **{lock_manager.contended:,}**",
+            color=discord.Color.blue()
+        )
+        
+        hot_keys = lock_manager.get_hot_keys(limit=10)
+        if hot_keys:
+            lines = []
+            for key, stats in hot_keys:
+                avg_ms = stats['total'] / stats['count'] * 1000
+                lines.append(f"`{key}` - {stats['count']}x waited, avg {avg_ms:.1f}ms, max {stats['max'] * 1000:.1f}ms")
+            embed.add_field(name="Hot Keys", value="\n".join(lines), inline=False)
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(Commands(bot))
\ No newline at end of file
@@ -1,10 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils import firebase_manager
-from datetime import datetime
+from utils import firebase_manager, guild_configs
+from utils.timestamps import now_ms
 from config import config as bot_config
 import aiohttp
+import asyncio
 
 class CustomRoles(commands.Cog):
     def __init__(self, bot):
@@ -12,10 +13,10 @@ class CustomRoles(commands.Cog):
     
     @commands.command(name="customrole", description="Create your custom role (requires active Custom Role Pass)")
     async def customrole(self, ctx, name: str, color: str, icon: str = None):
-        if ctx.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if ctx.channel.id != guild_configs.get(ctx.guild).commands_channel_id:
             return
         
-        user_data = firebase_manager.get_user_data(ctx.author.id)
+        user_data = await asyncio.to_thread(firebase_manager.get_user_fields, ctx.author.id, ['items/custom_role_pass'])
         user_items = user_data.get('items', {})
         
         crp_data = user_items.get('custom_role_pass', {})
@@ -25,20 +26,15 @@ class CustomRoles(commands.Cog):
             await ctx.send("You don't have an active **Custom Role Pass**!\nUse `!use customrole` to activate one.")
             return
         
-        try:
-            activated_time = datetime.fromisoformat(crp_time)
-            current_time = datetime.now()
-            time_diff = current_time - activated_time
-            hours_passed = time_diff.total_seconds() / 3600
-            duration_hours = 30 * 24
-            
-            if hours_passed >= duration_hours:
-                await ctx.send("Your **Custom Role Pass** has expired!\nUse `!use customrole` to activate a new one.")
-                return
-        except:
+        expires_at = crp_data.get('expiresAt')
+        if expires_at is None:
             await ctx.send("Error checking your Custom Role Pass status. Message <@278365147167326208>")
             return
         
+        if now_ms() >= expires_at:
+            await ctx.send("Your **Custom Role Pass** has expired!\nUse `!use customrole` to activate a new one.")
+            return
+        
         color = color.strip().replace('#', '')
         
         if len(color) != 6:
@@ -128,7 +124,7 @@ class CustomRoles(commands.Cog):
                 action = "created"
                 role_id = new_role.id
             
-            firebase_manager.set_custom_role_id(ctx.author.id, role_id)
+            await asyncio.to_thread(firebase_manager.set_custom_role_id, ctx.author.id, role_id)
             
             embed = discord.Embed(
                 title=f"Custom Role {action.capitalize()}!",
@@ -0,0 +1,121 @@
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from utils import firebase_manager, guild_configs, db_tracer
+from config import config as bot_config
+from datetime import datetime
+import asyncio
+
+class Economy(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        if bot.runs_background_tasks:
+            self.reconcile_economy.start()
+            self.compact_ledger.start()
+
+    def cog_unload(self):
+        self.reconcile_economy.cancel()
+        self.compact_ledger.cancel()
+
+    #============================#
+    #      Helper Functions      #
+    #============================#
+
+    def has_admin_role(self, member):
+        return guild_configs.get(member.guild).has_admin_role(member)
+
+    def format_level_buckets(self, level_counts, guild_config):
+        # Bucket by this server's level role thresholds so the split matches what members see
+        thresholds = [0] + [level for level in guild_config.level_thresholds if level > 0]
+        lines = []
+        for idx, low in enumerate(thresholds):
+            high = thresholds[idx + 1] if idx + 1 < len(thresholds) else None
+            count = sum(
+                users for level, users in level_counts.items()
+                if level >= low and (high is None or level < high)
+            )
+            label = f"{low}-{high - 1}" if high is not None else f"{low}+"
+            lines.append(f"Level {label}: **{count:,}**")
+        return '\n'.join(lines)
+
+    #============================#
+    #       Reconcile Loop       #
+    #============================#
+
+    @tasks.loop(minutes=bot_config.ECONOMY_RECONCILE_INTERVAL)
+    async def reconcile_economy(self):
+        # Warm-up reconciled moments ago, the first pass would just repeat that full scan
+        if self.reconcile_economy.current_loop == 0 and self.bot.caches_warmed:
+            return
+
+        db_tracer.start_operation('task:economy_reconcile')
+        try:
+            drift = await asyncio.to_thread(firebase_manager.reconcile_economy)
+            if drift:
+                print(f"Economy aggregates drifted, corrected by full scan: {drift}")
+        except Exception as e:
+            print(f"Error reconciling economy aggregates: {e}")
+
+    @reconcile_economy.before_loop
+    async def before_reconcile_economy(self):
+        await self.bot.wait_until_warm()
+
+    #============================#
+    #     Ledger Compaction      #
+    #============================#
+
+    @tasks.loop(minutes=bot_config.LEDGER_COMPACTION_INTERVAL)
+    async def compact_ledger(self):
+        db_tracer.start_operation('task:ledger_compaction')
+        try:
+            users, folded = await asyncio.to_thread(firebase_manager.compact_ledger)
+            if folded:
+                print(f"Compacted {folded} ledger transactions for {users} users")
+        except Exception as e:
+            print(f"Error compacting coin ledger: {e}")
+
+    @compact_ledger.before_loop
+    async def before_compact_ledger(self):
+        await self.bot.wait_until_ready()
+
+    #============================#
+    #       Admin Commands       #
+    #============================#
+
+    @app_commands.command(name="economy", description="Show coin supply, XP and level totals across all users (Admin only)")
+    async def economy(self, interaction: discord.Interaction):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        stats = await asyncio.to_thread(firebase_manager.get_economy_stats)
+        if not stats['ready']:
+            await interaction.response.send_message("Economy totals are still being computed, try again in a moment.", ephemeral=True)
+            return
+
+        level_counts = {int(level): count for level, count in stats['level_counts'].items()}
+        users = stats['users'] or 1
+
+        embed = discord.Embed(title="Economy", color=discord.Color.gold())
+        embed.add_field(name="Users", value=f"{stats['users']:,}", inline=True)
+        embed.add_field(name="Coin Supply", value=f"{stats['coin_supply']:,.0f} (avg {stats['coin_supply'] / users:,.1f})", inline=True)
+        embed.add_field(name="Total XP", value=f"{stats['total_xp']:,.0f} (avg {stats['total_xp'] / users:,.1f})", inline=True)
+        embed.add_field(
+            name="Levels",
+            value=self.format_level_buckets(level_counts, guild_configs.get(interaction.guild)) or "None",
+            inline=False
+        )
+
+        boosters = '\n'.join(f"{name.replace('_', ' ').title()}: **{count:,}**" for name, count in sorted(stats['active_boosters'].items()))
+        embed.add_field(name="Active Boosters", value=boosters or "None", inline=True)
+
+        owners = '\n'.join(f"{role}: **{count:,}**" for role, count in sorted(stats['role_owners'].items(), key=lambda item: item[1], reverse=True))
+        embed.add_field(name="Role Owners", value=owners[:1024] or "None", inline=True)
+
+        reconciled = datetime.fromtimestamp(stats['reconciled_at']).strftime('%Y-%m-%d %H:%M')
+        embed.set_footer(text=f"Last full scan {reconciled}")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(Economy(bot))
@@ -1,9 +1,10 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils import firebase_manager
-from datetime import datetime, timezone
+from utils import firebase_manager, lock_manager, user_key
+from utils.timestamps import now_ms
 import random
+import asyncio
 from config import config as bot_config
 from typing import Literal
 
@@ -11,57 +12,54 @@ class Gambling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    def flip(self, user, amount, face):
+        # Caller holds the user's lock, this only does the database work and returns the reply
+        user_data = firebase_manager.get_user_fields(user.id, ['coins', 'lastGambleTime'])
+
+        if amount <= 0 or amount > 1000:
+            return {'content': "Please enter a valid amount to perform a coinflip (max 1000).", 'ephemeral': True}
+    
+        if user_data['coins'] < amount:
+            return {'content': "You don't have enough coins.", 'ephemeral': True}
+    
+        # Check cooldown
+        last_gamble_time = user_data.get('lastGambleTime')
+        if last_gamble_time:
+            # Stored as epoch milliseconds
+            elapsed_time = (now_ms() - last_gamble_time) / 1000
+
+            if elapsed_time < bot_config.GAMBLE_COOLDOWN:
+                unlock_time = last_gamble_time // 1000 + bot_config.GAMBLE_COOLDOWN
+                return {'content': f"You are on cooldown! You can gamble again <t:{unlock_time}:R>.", 'ephemeral': True}
+    
+        opposite_face = "tails" if face == "heads" else "heads"
+        roll = random.random()
+        if roll < 0.49995:
+            winnings = int(amount * 0.5)
+            firebase_manager.add_coins(user.id, str(user), winnings, 'flip_win')
+            embed = discord.Embed(title="You won the flip!", description=f"The coin landed on **{face}**!", color=0x57F287)
+            embed.add_field(name="Bet", value=f"{amount:,}", inline=True)
+            embed.add_field(name="Result", value=f"+{winnings:,} coins", inline=True)
+            embed.add_field(name="Balance", value=f"{user_data['coins'] + winnings:,}", inline=True)
+        elif roll >= 0.49995 and roll <= 0.500 :
+            embed = discord.Embed(title="JACKPOT!", description="I felt like it so yeah (So like dm <@278365147167326208> for smth idk)", color=0xFAA81A)
+        else:
+            firebase_manager.add_coins(user.id, str(user), -amount, 'flip_loss')
+            embed = discord.Embed(title="You lost the flip!", description=f"The coin landed on **{opposite_face}**. Better luck next time!", color=0xED4245)
+            embed.add_field(name="Bet", value=f"{amount:,}", inline=True)
+            embed.add_field(name="Result", value=f"-{amount:,} coins", inline=True)
+            embed.add_field(name="Balance", value=f"{user_data['coins'] - amount:,}", inline=True)
+        embed.set_author(name="Coinflip", icon_url=self.bot.user.display_avatar.url)
+        return {'embed': embed}
+
     @app_commands.command(name="coinflip", description="Risk your coins for a chance to win more!")
     async def coinflip(self, interaction: discord.Interaction, amount: int, face: Literal["heads", "tails"]):
         try:
-            user_id = str(interaction.user.id)
-            user_data = firebase_manager.get_user_data(user_id)
-
-            if amount <= 0 or amount > 1000:
-                await interaction.response.send_message("Please enter a valid amount to perform a coinflip (max 1000).", ephemeral=True)
-                return
-            
-            if user_data['coins'] < amount:
-                await interaction.response.send_message("You don't have enough coins.", ephemeral=True)
-                return
-            
-            # Check cooldown
-            now = datetime.now(timezone.utc)
-            last_gamble_time = user_data.get('lastGambleTime')
-            if last_gamble_time:
-                # Parse the string from Firebase back into a datetime
-                last_gamble_dt = datetime.fromisoformat(last_gamble_time)
-                
-                # Make it timezone-aware if it isn't already
-                if last_gamble_dt.tzinfo is None:
-                    last_gamble_dt = last_gamble_dt.replace(tzinfo=timezone.utc)
-                
-                elapsed_time = (now - last_gamble_dt).total_seconds()
-
-                if elapsed_time < bot_config.GAMBLE_COOLDOWN:
-                    unlock_time = int(now.timestamp()) + bot_config.GAMBLE_COOLDOWN - int(elapsed_time)
-                    await interaction.response.send_message(f"You are on cooldown! You can gamble again <t:{unlock_time}:R>.", ephemeral=True)
-                    return
+            # The lock only covers the flip itself, the reply goes out once it's released
+            async with lock_manager.acquire(user_key(interaction.user.id)):
+                reply = await asyncio.to_thread(self.flip, interaction.user, amount, face)
             
-            opposite_face = "tails" if face == "heads" else "heads"
-            roll = random.random()
-            if roll < 0.49995:
-                winnings = int(amount * 0.5)
-                firebase_manager.add_coins(interaction.user.id, str(interaction.user), winnings)
-                embed = discord.Embed(title="You won the flip!", description=f"The coin landed on **{face}**!", color=0x57F287)
-                embed.add_field(name="Bet", value=f"{amount:,}", inline=True)
-                embed.add_field(name="Result", value=f"+{winnings:,} coins", inline=True)
-                embed.add_field(name="Balance", value=f"{user_data['coins'] + winnings:,}", inline=True)
-            elif roll >= 0.49995 and roll <= 0.500 :
-                embed = discord.Embed(title="JACKPOT!", description="I felt like it so yeah (So like dm <@278365147167326208> for smth idk)", color=0xFAA81A)
-            else:
-                firebase_manager.add_coins(interaction.user.id, str(interaction.user), -amount)
-                embed = discord.Embed(title="You lost the flip!", description=f"The coin landed on **{opposite_face}**. Better luck next time!", color=0xED4245)
-                embed.add_field(name="Bet", value=f"{amount:,}", inline=True)
-                embed.add_field(name="Result", value=f"-{amount:,} coins", inline=True)
-                embed.add_field(name="Balance", value=f"{user_data['coins'] - amount:,}", inline=True)
-            embed.set_author(name="Coinflip", icon_url=self.bot.user.display_avatar.url)
-            await interaction.response.send_message(embed=embed)
+            await interaction.response.send_message(**reply)
 
         except Exception as e:
             print(f"Coinflip error: {e}")
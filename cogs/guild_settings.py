@@ -0,0 +1,123 @@
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from utils import firebase_manager, guild_configs
+from utils.guild_config import FIELDS, FIELD_FORMATS, NUMBER_RANGES, parse_field_value
+from config import config as bot_config
+from typing import Literal
+import asyncio
+
+GuildConfigField = Literal[
+    "admin_role_ids", "auctioneer_role_ids", "commands_channel_id", "level_up_channel_id", "auction_channel_id",
+    "level_roles", "xp_bonus_roles", "colour_roles", "special_roles", "xp_base", "xp_cooldown"
+]
+
+class GuildSettings(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.refresh_guild_configs.start()
+
+    def cog_unload(self):
+        self.refresh_guild_configs.cancel()
+
+    #============================#
+    #      Helper Functions      #
+    #============================#
+
+    def can_edit_settings(self, member):
+        guild_config = guild_configs.get(member.guild)
+        if not guild_config.admin_role_ids:
+            # A guild that isn't set up yet has no admin roles, whoever manages the server bootstraps it
+            permissions = member.guild_permissions
+            return permissions.administrator or permissions.manage_guild
+        return guild_config.has_admin_role(member)
+
+    async def reload_guild_configs(self):
+        all_overrides = await asyncio.to_thread(firebase_manager.get_guild_configs)
+        changed = guild_configs.refresh(all_overrides)
+        if changed:
+            print(f"Reloaded settings for {len(changed)} guild(s)")
+
+    def format_value(self, value):
+        if isinstance(value, dict):
+            return ', '.join(f"{key}:{item}" for key, item in value.items()) or "(empty)"
+        if isinstance(value, list):
+            return ', '.join(value) or "(empty)"
+        return str(value)
+
+    #============================#
+    #       Refresh Loop         #
+    #============================#
+
+    @tasks.loop(seconds=bot_config.GUILD_CONFIG_REFRESH_INTERVAL)
+    async def refresh_guild_configs(self):
+        # Other shard processes write here too, an unchanged tree only costs an ETag check
+        try:
+            await self.reload_guild_configs()
+        except Exception as e:
+            print(f"Error refreshing guild settings: {e}")
+
+    #============================#
+    #       Admin Commands       #
+    #============================#
+
+    @app_commands.command(name="guildconfig", description="Show this server's bot settings (Admin only)")
+    async def guildconfig(self, interaction: discord.Interaction):
+        if not self.can_edit_settings(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        guild_config = guild_configs.get(interaction.guild)
+        overrides = guild_configs.raw.get(interaction.guild.id, {})
+
+        embed = discord.Embed(title=f"Settings for {interaction.guild.name}", color=discord.Color.blue())
+        for field in FIELDS:
+            source = "server" if field in overrides else "default"
+            embed.add_field(
+                name=f"{field} ({source})",
+                value=self.format_value(guild_config.settings[field])[:1024],
+                inline=False
+            )
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="setguildconfig", description="Change one of this server's bot settings (Admin only)")
+    @app_commands.describe(field="The setting to change", value="The new value, run /guildconfig to see the current ones")
+    async def setguildconfig(self, interaction: discord.Interaction, field: GuildConfigField, value: str):
+        if not self.can_edit_settings(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        try:
+            parsed = parse_field_value(field, value)
+        except ValueError:
+            expected = FIELD_FORMATS[FIELDS[field]]
+            if field in NUMBER_RANGES:
+                lowest, highest = NUMBER_RANGES[field]
+                expected += f" between {lowest:g} and {highest:g}"
+            await interaction.response.send_message(f"`{field}` expects {expected}.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        await asyncio.to_thread(firebase_manager.set_guild_config_field, interaction.guild.id, field, parsed)
+        await self.reload_guild_configs()
+
+        await interaction.followup.send(f"Set `{field}` to `{self.format_value(parsed)}`.", ephemeral=True)
+
+    @app_commands.command(name="resetguildconfig", description="Put one of this server's settings back to the default (Admin only)")
+    @app_commands.describe(field="The setting to reset")
+    async def resetguildconfig(self, interaction: discord.Interaction, field: GuildConfigField):
+        if not self.can_edit_settings(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        await asyncio.to_thread(firebase_manager.clear_guild_config_field, interaction.guild.id, field)
+        await self.reload_guild_configs()
+
+        await interaction.followup.send(f"Reset `{field}` to the default.", ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(GuildSettings(bot))
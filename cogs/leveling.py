@@ -1,80 +1,121 @@
 import discord
 from discord.ext import commands, tasks
-from utils import firebase_manager
+from utils import firebase_manager, lock_manager, user_key, metrics, db_tracer, guild_configs
+from utils.memory import deep_sizeof
 from config import config as bot_config
-from datetime import datetime
+import asyncio
 import time
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.xp_cooldowns = {}
-        self.cooldown_time = bot_config.XP_COOLDOWN
-        self.check_booster_expiry.start()
-        self.check_custom_role_expiry.start()
+        if bot.runs_background_tasks:
+            self.check_booster_expiry.start()
+            self.check_custom_role_expiry.start()
+            self.demote_inactive_users.start()
     
     def cog_unload(self):
         self.check_booster_expiry.cancel()
+        self.check_custom_role_expiry.cancel()
+        self.demote_inactive_users.cancel()
+    
+    def export_state(self):
+        # Only cooldowns that are still running are worth carrying over
+        cutoff = time.time() - guild_configs.get_longest_xp_cooldown()
+        return {
+            'xp_cooldowns': {
+                str(user_id): last_time for user_id, last_time in self.xp_cooldowns.items()
+                if last_time > cutoff
+            }
+        }
+    
+    def cache_sizes(self):
+        return {'xp_cooldowns': (len(self.xp_cooldowns), deep_sizeof(self.xp_cooldowns))}
+    
+    def import_state(self, state):
+        for user_id, last_time in state.get('xp_cooldowns', {}).items():
+            self.xp_cooldowns[int(user_id)] = last_time
     
+    #=============================#
+    #      Cold Storage Tiering   #
+    #=============================#
+
+    @tasks.loop(hours=bot_config.COLD_TIER_INTERVAL)
+    async def demote_inactive_users(self):
+        # Archived users come back on their next message, get_user_data promotes them
+        db_tracer.start_operation('task:cold_tiering')
+        with metrics.task_duration.time('cold_tiering'):
+            try:
+                moved = await asyncio.to_thread(
+                    firebase_manager.demote_inactive_users, bot_config.COLD_TIER_INACTIVE_DAYS, bot_config.COLD_TIER_BATCH
+                )
+                if moved:
+                    print(f"Moved {moved} inactive users to cold storage")
+            except Exception as e:
+                print(f"Error moving inactive users to cold storage: {e}")
+
+    @demote_inactive_users.before_loop
+    async def before_demote_inactive_users(self):
+        await self.bot.wait_until_ready()
+
     #=============================#
     #     Booster & Role Tasks    #
     #=============================#
 
     @tasks.loop(seconds=bot_config.BOOSTER_CHECK_INTERVAL)
     async def check_booster_expiry(self):
-        try:
-            active_boosters_map = firebase_manager.get_all_active_boosters_all_users()
+        db_tracer.start_operation('task:booster_expiry')
+        with metrics.task_duration.time('booster_expiry'):
+            try:
+                # Only boosters whose expiresAt has passed come back from the range query
+                expired_boosters_map = await asyncio.to_thread(firebase_manager.get_expired_boosters)
             
-            for user_id, booster_names in active_boosters_map.items():
-                for booster_name in booster_names:
-                    duration = bot_config.BOOSTER_DURATIONS.get(booster_name, 30)
+                for user_id, booster_names in expired_boosters_map.items():
+                    for booster_name in booster_names:
+                        async with lock_manager.acquire(user_key(user_id)):
+                            expired = await asyncio.to_thread(self.expire_booster, user_id, booster_name)
                     
-                    if firebase_manager.check_booster_expiry(user_id, booster_name, duration):
-                        firebase_manager.deactivate_item(user_id, booster_name)
-    
-                        user = await self.bot.fetch_user(int(user_id))
-                        if user:
-                            embed = discord.Embed(
-                                title="Booster Expired",
-                                description=f"Your **{booster_name.replace('_', ' ').title()}** has expired!",
-                                color=discord.Color.orange()
-                            )
-                            await user.send(embed=embed)
+                        if expired:
+                            user = await self.bot.fetch_user(int(user_id))
+                            if user:
+                                embed = discord.Embed(
+                                    title="Booster Expired",
+                                    description=f"Your **{booster_name.replace('_', ' ').title()}** has expired!",
+                                    color=discord.Color.orange()
+                                )
+                                await user.send(embed=embed)
 
-        except Exception as e:
-            print(f"Error in booster expiry check: {e}")
+            except Exception as e:
+                print(f"Error in booster expiry check: {e}")
 
     @tasks.loop(seconds=bot_config.CUSTOM_ROLE_CHECK_INTERVAL)
     async def check_custom_role_expiry(self):
-        all_users = firebase_manager.get_all_users_with_custom_roles()
+        db_tracer.start_operation('task:custom_role_expiry')
+        with metrics.task_duration.time('custom_role_expiry'):
+            expired_passes = await asyncio.to_thread(firebase_manager.get_expired_custom_role_passes)
         
-        for user_id, crp_data in all_users.items():
-            crp_time = crp_data.get('timeActivated')
-            role_id = crp_data.get('roleId')
+            for user_id, crp_data in expired_passes.items():
+                role_id = crp_data.get('roleId')
             
-            if not crp_time or not role_id:
-                continue
+                if not role_id:
+                    # Expired before a role was made, nothing to remove but it must leave the index
+                    await asyncio.to_thread(firebase_manager.clear_custom_role_pass, user_id)
+                    continue
 
-            activated_time = datetime.fromisoformat(crp_time)
-            current_time = datetime.now()
-            time_diff = current_time - activated_time
-            hours_passed = time_diff.total_seconds() / 3600
-            duration_hours = 30 * 24
-            
-            if hours_passed >= duration_hours:
                 role_deleted = False
                 member_notified = False
-                
+            
                 for guild in self.bot.guilds:
                     custom_role = guild.get_role(role_id)
-                    
+                
                     if custom_role:
-                        member = guild.get_member(int(user_id))
-                        
+                        member = await self.bot.get_or_fetch_member(guild, int(user_id))
+                    
                         if member:
                             await member.remove_roles(custom_role)
                             print(f"Removed role {custom_role.name} from {member.name}")
-                            
+                        
                             if not member_notified:
                                 try:
                                     embed = discord.Embed(
@@ -90,13 +131,13 @@ class Leveling(commands.Cog):
                                     member_notified = True
                                 except discord.Forbidden:
                                     pass
-                        
+                    
                         if not role_deleted:
                             await custom_role.delete(reason="Custom Role Pass expired")
                             role_deleted = True
                             print(f"Deleted custom role {custom_role.name}")
 
-                firebase_manager.clear_custom_role_pass(user_id)
+                await asyncio.to_thread(firebase_manager.clear_custom_role_pass, user_id)
 
     #============================#
     #    Registers coroutines    #
@@ -115,21 +156,26 @@ class Leveling(commands.Cog):
     #============================#
 
     def has_admin_role(self, member):
-        for role in member.roles:
-            if role.id in bot_config.ADMIN_ROLE_IDS or role.name in bot_config.ADMIN_ROLE_NAMES:
-                return True
-        return False
+        return guild_configs.get(member.guild).has_admin_role(member)
     
-    def check_cooldown(self, user_id):
+    def check_cooldown(self, user_id, cooldown_time):
         current_time = time.time()
         
         if user_id in self.xp_cooldowns:
-            if current_time - self.xp_cooldowns[user_id] < self.cooldown_time:
+            if current_time - self.xp_cooldowns[user_id] < cooldown_time:
                 return False
         
         self.xp_cooldowns[user_id] = current_time
         return True
     
+    def expire_booster(self, user_id, booster_name):
+        """Deactivate a booster the expiry query returned. Returns whether it was still expired."""
+        # Re-checked under the lock, the booster may have been renewed since the query
+        expired = firebase_manager.check_booster_expiry(user_id, booster_name)
+        if expired:
+            firebase_manager.deactivate_item(user_id, booster_name)
+        return expired
+    
     def calculate_booster_multiplier(self, user_id):
         """Calculate the total XP multiplier from active boosters"""
         active_boosters = firebase_manager.get_active_boosters(user_id)
@@ -149,41 +195,50 @@ class Leveling(commands.Cog):
         active_booster_name = active_boosters[0]['name']
         return booster_multipliers.get(active_booster_name, 1.0)
     
-    async def update_level_roles(self, member, user_level):
+    def award_xp(self, user, base_xp):
+        """Apply the user's booster to base_xp and add it. Returns add_xp's result."""
+        # Booster multiplier
+        booster_multiplier = self.calculate_booster_multiplier(user.id)
+        xp_gain = round(base_xp * booster_multiplier, 2)
+        
+        return firebase_manager.add_xp(user.id, str(user), xp_gain)
+    
+    def get_level_role_diff(self, guild, member_role_ids, user_level):
         """
-        Update level roles for a member based on their current level.
-        Adds all level roles they've earned (stacking).
+        Work out which level role IDs a member should gain and lose for a level.
+        Returns (role_ids_to_add, role_ids_to_remove) as sets.
         """
-        if not hasattr(bot_config, 'LEVEL_ROLES'):
-            return
-        
-        roles_to_add = []
-        roles_to_remove = []
+        guild_config = guild_configs.get(guild)
         
         # Get all level role IDs the user should have
-        earned_role_ids = set()
-        for level_requirement, role_id in bot_config.LEVEL_ROLES.items():
-            if user_level >= level_requirement:
-                earned_role_ids.add(role_id)
+        earned_role_ids = guild_config.get_earned_level_roles(user_level)
         
         # Check current level roles the user has
-        current_level_role_ids = set()
-        for role in member.roles:
-            if role.id in bot_config.LEVEL_ROLES.values():
-                current_level_role_ids.add(role.id)
+        current_level_role_ids = guild_config.level_role_ids.intersection(member_role_ids)
+        
+        return earned_role_ids - current_level_role_ids, current_level_role_ids - earned_role_ids
+    
+    async def update_level_roles(self, member, user_level):
+        """
+        Update level roles for a member based on their current level.
+        Adds all level roles they've earned (stacking).
+        """
+        role_ids_to_add, role_ids_to_remove = self.get_level_role_diff(
+            member.guild, [role.id for role in member.roles], user_level
+        )
         
         # Determine which roles to add and remove
-        for role_id in earned_role_ids:
-            if role_id not in current_level_role_ids:
-                role = member.guild.get_role(role_id)
-                if role:
-                    roles_to_add.append(role)
-        
-        for role_id in current_level_role_ids:
-            if role_id not in earned_role_ids:
-                role = member.guild.get_role(role_id)
-                if role:
-                    roles_to_remove.append(role)
+        roles_to_add = []
+        for role_id in role_ids_to_add:
+            role = member.guild.get_role(role_id)
+            if role:
+                roles_to_add.append(role)
+        
+        roles_to_remove = []
+        for role_id in role_ids_to_remove:
+            role = member.guild.get_role(role_id)
+            if role:
+                roles_to_remove.append(role)
         
         # Apply role changes
         try:
@@ -205,36 +260,30 @@ class Leveling(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message):
-        if message.author.bot or not message.guild:
+        if message.author.bot:
+            metrics.messages_total.inc('bot')
             return
         
-        if not self.check_cooldown(message.author.id):
+        if not message.guild:
+            metrics.messages_total.inc('dm')
             return
         
-        base_xp = float(bot_config.XP_BASE)
-        bonus_multiplier = 1.0
+        guild_config = guild_configs.get(message.guild)
         
-        # Role bonus multiplier - only take the HIGHEST bonus
-        role_bonuses = []
-        for role in message.author.roles:
-            if role.id in bot_config.XP_BONUS_ROLE:
-                role_bonuses.append(bot_config.XP_BONUS_ROLE[role.id])
+        if not self.check_cooldown(message.author.id, guild_config.xp_cooldown):
+            metrics.messages_total.inc('cooldown')
+            return
         
-        if role_bonuses:
-            highest_bonus = max(role_bonuses)
-            bonus_multiplier += (highest_bonus / 100.0)
+        metrics.messages_total.inc('processed')
+        db_tracer.start_operation('on_message')
         
-        # Booster multiplier
-        booster_multiplier = self.calculate_booster_multiplier(message.author.id)
+        base_xp = guild_config.xp_base
         
-        total_multiplier = bonus_multiplier * booster_multiplier
-        xp_gain = round(base_xp * total_multiplier, 2)
+        # Role bonus multiplier - only take the HIGHEST bonus
+        bonus_multiplier = 1.0 + guild_config.get_xp_bonus(message.author) / 100.0
         
-        result = firebase_manager.add_xp(
-            message.author.id,
-            str(message.author),
-            xp_gain
-        )
+        async with lock_manager.acquire(user_key(message.author.id)):
+            result = await asyncio.to_thread(self.award_xp, message.author, base_xp * bonus_multiplier)
         
         # Update level roles
         await self.update_level_roles(message.author, result['new_level'])
@@ -246,8 +295,8 @@ class Leveling(commands.Cog):
                 color=discord.Color.gold()
             )
             
-            if bot_config.LEVEL_UP_CHANNEL_ID:
-                level_up_channel = message.guild.get_channel(bot_config.LEVEL_UP_CHANNEL_ID)
+            if guild_config.level_up_channel_id:
+                level_up_channel = message.guild.get_channel(guild_config.level_up_channel_id)
                 if level_up_channel:
                     await level_up_channel.send(embed=embed)
 
@@ -0,0 +1,193 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils import firebase_manager, guild_configs
+from config import config as bot_config
+import asyncio
+import time
+
+class RoleSync(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.jobs = {}
+
+    def cog_unload(self):
+        for job in self.jobs.values():
+            job['task'].cancel()
+
+    #============================#
+    #      Helper Functions      #
+    #============================#
+
+    def has_admin_role(self, member):
+        return guild_configs.get(member.guild).has_admin_role(member)
+
+    def format_progress(self, job):
+        elapsed = int(time.monotonic() - job['startedAt'])
+        state = job['state']
+
+        return (
+            f"**Role resync {state}**\n"
+            f"Members scanned: **{job['processed']:,}**\n"
+            f"Members updated: **{job['changed']:,}**\n"
+            f"Failed edits: **{job['failed']:,}**\n"
+            f"Elapsed: {elapsed}s"
+        )
+
+    async def report_progress(self, job):
+        try:
+            await job['interaction'].edit_original_response(content=self.format_progress(job))
+        except discord.HTTPException:
+            # The interaction token only lives for 15 minutes, the job keeps going without it
+            pass
+
+    #============================#
+    #        Resync Worker       #
+    #============================#
+
+    async def apply_role_changes(self, job, queue):
+        """Drain queued member edits at a fixed rate so a large resync never floods the API"""
+        interval = 1 / bot_config.ROLE_SYNC_EDITS_PER_SECOND
+
+        while True:
+            member, role_ids_to_add, role_ids_to_remove = await queue.get()
+
+            try:
+                # The whole diff goes out as one edit. It's applied to the member's current roles,
+                # not the chunk's snapshot, so roles granted since the chunk was fetched survive.
+                member = await self.bot.get_or_fetch_member(member.guild, member.id)
+                if member is None:
+                    continue
+
+                new_roles = [role for role in member.roles if not role.is_default() and role.id not in role_ids_to_remove]
+                for role_id in role_ids_to_add:
+                    role = member.guild.get_role(role_id)
+                    if role and role not in new_roles:
+                        new_roles.append(role)
+
+                await member.edit(roles=new_roles, reason="Level role resync")
+                job['changed'] += 1
+            except discord.Forbidden:
+                job['failed'] += 1
+                print(f"Missing permissions to resync roles for {member.name}")
+            except Exception as e:
+                job['failed'] += 1
+                print(f"Error resyncing roles for {member.name}: {e}")
+            finally:
+                queue.task_done()
+
+            await asyncio.sleep(interval)
+
+    async def flush_chunk(self, guild, job, queue, chunk, user_levels):
+        leveling_cog = self.bot.get_cog('Leveling')
+
+        for member in chunk:
+            if member.bot:
+                continue
+
+            user_level = user_levels.get(str(member.id), 0)
+            role_ids_to_add, role_ids_to_remove = leveling_cog.get_level_role_diff(
+                guild, [role.id for role in member.roles], user_level
+            )
+
+            if role_ids_to_add or role_ids_to_remove:
+                queue.put_nowait((member, role_ids_to_add, role_ids_to_remove))
+
+        # Only checkpoint once every edit in the chunk has gone through, so a resumed job never skips anyone
+        await queue.join()
+
+        job['processed'] += len(chunk)
+        await asyncio.to_thread(
+            firebase_manager.set_role_sync_checkpoint, guild.id, chunk[-1].id, job['processed'], job['changed'], job['failed']
+        )
+        await self.report_progress(job)
+
+    async def run_resync(self, guild, job, after_id):
+        queue = asyncio.Queue()
+        worker = asyncio.create_task(self.apply_role_changes(job, queue))
+
+        try:
+            user_levels = await asyncio.to_thread(firebase_manager.get_all_user_levels)
+
+            after = discord.Object(id=after_id) if after_id else None
+            chunk = []
+
+            async for member in guild.fetch_members(limit=None, after=after):
+                chunk.append(member)
+
+                if len(chunk) >= bot_config.ROLE_SYNC_CHUNK_SIZE:
+                    await self.flush_chunk(guild, job, queue, chunk, user_levels)
+                    chunk = []
+
+            if chunk:
+                await self.flush_chunk(guild, job, queue, chunk, user_levels)
+
+            await asyncio.to_thread(firebase_manager.clear_role_sync_checkpoint, guild.id)
+            job['state'] = "complete"
+        except asyncio.CancelledError:
+            job['state'] = "cancelled"
+            raise
+        except Exception as e:
+            job['state'] = "failed"
+            print(f"Error in role resync for guild {guild.id}: {e}")
+        finally:
+            worker.cancel()
+            self.jobs.pop(guild.id, None)
+            await self.report_progress(job)
+
+    #============================#
+    #        Admin Commands      #
+    #============================#
+
+    @app_commands.command(name="resyncroles", description="Resync level roles for every member (Admin only)")
+    @app_commands.describe(restart="Ignore the saved checkpoint and start from the first member")
+    async def resyncroles(self, interaction: discord.Interaction, restart: bool = False):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        guild = interaction.guild
+
+        if guild.id in self.jobs:
+            await interaction.response.send_message(self.format_progress(self.jobs[guild.id]), ephemeral=True)
+            return
+
+        checkpoint = None if restart else await asyncio.to_thread(firebase_manager.get_role_sync_checkpoint, guild.id)
+
+        job = {
+            'interaction': interaction,
+            'state': "running",
+            'processed': 0,
+            'changed': 0,
+            'failed': 0,
+            'startedAt': time.monotonic(),
+        }
+
+        after_id = None
+        if checkpoint:
+            after_id = int(checkpoint['lastMemberId'])
+            job['processed'] = checkpoint.get('processed', 0)
+            job['changed'] = checkpoint.get('changed', 0)
+            job['failed'] = checkpoint.get('failed', 0)
+
+        await interaction.response.send_message(self.format_progress(job), ephemeral=True)
+
+        job['task'] = asyncio.create_task(self.run_resync(guild, job, after_id))
+        self.jobs[guild.id] = job
+
+    @app_commands.command(name="cancelresync", description="Stop a running level role resync (Admin only)")
+    async def cancelresync(self, interaction: discord.Interaction):
+        if not self.has_admin_role(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command!", ephemeral=True)
+            return
+
+        job = self.jobs.get(interaction.guild.id)
+        if not job:
+            await interaction.response.send_message("No role resync is running!", ephemeral=True)
+            return
+
+        job['task'].cancel()
+        await interaction.response.send_message("Role resync cancelled. Run `/resyncroles` to resume from the last checkpoint.", ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(RoleSync(bot))
@@ -1,10 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils import firebase_manager
+from utils import firebase_manager, lock_manager, user_key, guild_configs
+from utils.timestamps import now_ms
 from config import config as bot_config
-from datetime import datetime, timedelta
 from typing import Literal
+import asyncio
 
 class Shop(commands.Cog):
     def __init__(self, bot):
@@ -97,29 +98,27 @@ class Shop(commands.Cog):
     #       Buy Role/Booster     #
     #============================#
 
-    async def _buy_role(self, interaction, role):
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+    def _buy_role(self, user, role):
+        # Caller holds the user's lock, this only does the database work and returns the reply
+        user_data = firebase_manager.get_user_fields(user.id, ['coins', 'roles'])
         user_roles = user_data.get('roles', {})
         user_coins = user_data['coins']
         
         db_key = self.get_db_role_key(role)
 
         if role == 'XP Boost 10%' or role == 'XP Boost 5%':
-            await interaction.response.send_message("This role is not available for purchase!", ephemeral=True)
-            return
+            return {'content': "This role is not available for purchase!", 'ephemeral': True}
         
         if user_roles.get(db_key, False):
-            await interaction.response.send_message(f"You already own the **{role}** role!", ephemeral=True)
-            return
+            return {'content': f"You already own the **{role}** role!", 'ephemeral': True}
         
         price = self.get_role_price(role)
         
         if user_coins < price:
-            await interaction.response.send_message(f"Not enough Coins! You need **{price:,} Coins** but only have **{user_coins:,} Coins**.", ephemeral=True)
-            return
+            return {'content': f"Not enough Coins! You need **{price:,} Coins** but only have **{user_coins:,} Coins**.", 'ephemeral': True}
         
-        firebase_manager.add_xp(interaction.user.id, str(interaction.user), -price)
-        firebase_manager.set_user_role(interaction.user.id, db_key, True)
+        firebase_manager.record_transaction(user.id, 'purchase', -price, reference=db_key)
+        firebase_manager.set_user_role(user.id, db_key, True)
         
         embed = discord.Embed(
             title="Purchase Successful!",
@@ -128,25 +127,23 @@ class Shop(commands.Cog):
         )
         embed.add_field(name="Remaining Coins", value=f"{user_coins - price:,}", inline=True)
         
-        await interaction.response.send_message(embed=embed)
+        return {'embed': embed}
     
-    async def _buy_booster(self, interaction, booster):
+    def _buy_booster(self, user, booster):
         if booster == 'large_booster':
-            await interaction.response.send_message("This booster is not available for purchase!", ephemeral=True)
-            return
+            return {'content': "This booster is not available for purchase!", 'ephemeral': True}
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        user_data = firebase_manager.get_user_fields(user.id, ['coins'])
         user_coins = user_data['coins']
         
         info = self.get_booster_info(booster)
         price = info['price']
         
         if user_coins < price:
-            await interaction.response.send_message(f"Not enough Coins! You need **{price:,} Coins** but only have **{user_coins:,} Coins**.", ephemeral=True)
-            return
+            return {'content': f"Not enough Coins! You need **{price:,} Coins** but only have **{user_coins:,} Coins**.", 'ephemeral': True}
         
-        firebase_manager.add_xp(interaction.user.id, str(interaction.user), -price)
-        firebase_manager.add_item(interaction.user.id, booster, 1)
+        firebase_manager.record_transaction(user.id, 'purchase', -price, reference=booster)
+        firebase_manager.add_item(user.id, booster, 1)
         
         embed = discord.Embed(
             title="Purchase Successful!",
@@ -156,28 +153,26 @@ class Shop(commands.Cog):
         embed.add_field(name="Remaining Coins", value=f"{user_coins - price:,}", inline=True)
         embed.add_field(name="Duration", value="3 days", inline=True)
         
-        await interaction.response.send_message(embed=embed)
+        return {'embed': embed}
     
     #============================#
     #         Use Items          #
     #============================#
 
-    async def _use_booster(self, interaction, booster):
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+    def _use_booster(self, user, booster):
+        user_data = firebase_manager.get_user_fields(user.id, [f"items/{booster}"])
         user_items = user_data.get('items', {})
         
-        active_boosters = firebase_manager.get_active_boosters(interaction.user.id)
+        active_boosters = firebase_manager.get_active_boosters(user.id)
         if active_boosters:
             active_names = [self.get_booster_info(b['name'])['name'] for b in active_boosters]
-            await interaction.response.send_message(f"You already have an active booster: **{', '.join(active_names)}**!\nWait for it to expire before using another.", ephemeral=True)
-            return
+            return {'content': f"You already have an active booster: **{', '.join(active_names)}**!\nWait for it to expire before using another.", 'ephemeral': True}
         
         booster_data = user_items.get(booster, {})
         if booster_data.get('amount', 0) <= 0:
-            await interaction.response.send_message(f"You don't have any **{self.get_booster_info(booster)['name']}**!\nBuy one from `/shop`.", ephemeral=True)
-            return
+            return {'content': f"You don't have any **{self.get_booster_info(booster)['name']}**!\nBuy one from `/shop`.", 'ephemeral': True}
         
-        success = firebase_manager.use_item(interaction.user.id, booster)
+        success = firebase_manager.use_item(user.id, booster)
         
         if success:
             info = self.get_booster_info(booster)
@@ -187,12 +182,12 @@ class Shop(commands.Cog):
                 color=discord.Color.gold()
             )
             embed.set_footer(text="You'll receive a DM when it expires!")
-            await interaction.response.send_message(embed=embed)
+            return {'embed': embed}
         else:
-            await interaction.response.send_message("Failed to use booster. Please try again.", ephemeral=True)
+            return {'content': "Failed to use booster. Please try again.", 'ephemeral': True}
 
-    async def _use_custom_role_pass(self, interaction):
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+    def _use_custom_role_pass(self, user):
+        user_data = firebase_manager.get_user_fields(user.id, ['items/custom_role_pass'])
         user_items = user_data.get('items', {})
         
         crp_data = user_items.get('custom_role_pass', {})
@@ -200,36 +195,21 @@ class Shop(commands.Cog):
         crp_time = crp_data.get('timeActivated')
         
         if crp_amount <= 0:
-            await interaction.response.send_message("You don't have any **Custom Role Passes**!", ephemeral=True)
-            return
+            return {'content': "You don't have any **Custom Role Passes**!", 'ephemeral': True}
         
-        if crp_time:
-            try:
-                activated_time = datetime.fromisoformat(crp_time)
-                current_time = datetime.now()
-                time_diff = current_time - activated_time
-                hours_passed = time_diff.total_seconds() / 3600
-                duration_hours = 30 * 24
-                
-                if hours_passed < duration_hours:
-                    hours_remaining = duration_hours - hours_passed
-                    days_remaining = int(hours_remaining // 24)
-                    hours_only = int(hours_remaining % 24)
-                    
-                    await interaction.response.send_message(
-                        f"You already have an active **Custom Role Pass**!\n"
-                        f"Time remaining: {days_remaining}d {hours_only}h",
-                        ephemeral=True
-                    )
-                    return
-            except:
-                pass
-        
-        user_ref = firebase_manager.db_ref.child('users').child(str(interaction.user.id)).child('items').child('custom_role_pass')
-        user_ref.update({
-            'amount': crp_amount - 1,
-            'timeActivated': datetime.now().isoformat()
-        })
+        expires_at = crp_data.get('expiresAt')
+        if crp_time and expires_at and expires_at > now_ms():
+            hours_remaining = (expires_at - now_ms()) / 3600000
+            days_remaining = int(hours_remaining // 24)
+            hours_only = int(hours_remaining % 24)
+            
+            return {
+                'content': f"You already have an active **Custom Role Pass**!\n"
+                           f"Time remaining: {days_remaining}d {hours_only}h",
+                'ephemeral': True
+            }
+        
+        firebase_manager.activate_custom_role_pass(user.id, crp_amount)
         
         embed = discord.Embed(
             title="Custom Role Pass Activated!",
@@ -237,7 +217,7 @@ class Shop(commands.Cog):
             color=discord.Color.gold()
         )
         
-        await interaction.response.send_message(embed=embed)
+        return {'embed': embed}
 
     #============================#
     #          Commands          #
@@ -246,14 +226,14 @@ class Shop(commands.Cog):
     @app_commands.command(name="shop", description="View the item shop")
     async def shop(self, interaction: discord.Interaction):
         # Fix 1: Respond instead of silent return
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             await interaction.response.send_message(
                 "This command can only be used in the commands channel!", 
                 ephemeral=True
             )
             return
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        user_data = await asyncio.to_thread(firebase_manager.get_user_data, interaction.user.id)
         user_roles = user_data.get('roles', {})
         user_items = user_data.get('items', {})
         user_coins = user_data['coins']
@@ -264,6 +244,8 @@ class Shop(commands.Cog):
             color=discord.Color.blue()
         )
         
+        guild_config = guild_configs.get(interaction.guild)
+        
         # Color roles section (no changes needed)
         color_roles = []
         for role_name in ['Red', 'Orange', 'Teal', 'Blue', 'Purple', 'Black']:
@@ -272,7 +254,7 @@ class Shop(commands.Cog):
             price = self.get_role_price(role_name)
             status = "🟢 **Owned**" if owned else f"{price:,} Coins"
             
-            discord_role_id = bot_config.COLOUR_ROLES.get(role_name)
+            discord_role_id = guild_config.colour_roles.get(role_name)
             if discord_role_id:
                 discord_role = interaction.guild.get_role(discord_role_id)
                 if discord_role:
@@ -300,7 +282,7 @@ class Shop(commands.Cog):
             else:
                 status = "**🟢 Owned**" if owned else f"{price:,} Coins"
             
-            discord_role_id = bot_config.SPECIAL_ROLES.get(role_name)
+            discord_role_id = guild_config.special_roles.get(role_name)
             if discord_role_id:
                 discord_role = interaction.guild.get_role(discord_role_id)
                 if discord_role:
@@ -334,25 +316,31 @@ class Shop(commands.Cog):
     @app_commands.command(name="buy", description="Buy an item from the shop")
     @app_commands.describe(item="The item to buy")
     async def buy(self, interaction: discord.Interaction, item: Literal["Red", "Orange", "Teal", "Blue", "Purple", "Black", "Custom Role 1", "Custom Role 2", "Tiny Booster", "Small Booster", "Medium Booster",]):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
         
         role = self.normalize_role_name(item)
         item_type, booster = self.normalize_item_name(item)
         
-        if role:
-            await self._buy_role(interaction, role)
-        elif item_type == 'booster':
-            await self._buy_booster(interaction, booster)
-        else:
+        if not role and item_type != 'booster':
             await interaction.response.send_message("Item doesn't exist or isn't purchasable in the shop!", ephemeral=True)
+            return
+        
+        # The lock only covers the purchase itself, the reply goes out once it's released
+        async with lock_manager.acquire(user_key(interaction.user.id)):
+            if role:
+                reply = await asyncio.to_thread(self._buy_role, interaction.user, role)
+            else:
+                reply = await asyncio.to_thread(self._buy_booster, interaction.user, booster)
+        
+        await interaction.response.send_message(**reply)
 
     @app_commands.command(name="inventory", description="View your inventory")
     async def inventory(self, interaction: discord.Interaction):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        user_data = await asyncio.to_thread(firebase_manager.get_user_fields, interaction.user.id, ['items'])
         user_items = user_data.get('items', {})
 
         embed = discord.Embed(
@@ -367,31 +355,22 @@ class Shop(commands.Cog):
             item_data = user_items.get(booster_name, {})
             amount = item_data.get('amount', 0)
             active = item_data.get('active', 0)
-            time_activated = item_data.get('timeActivated')
+            expires_at = item_data.get('expiresAt')
             
-            if active and time_activated:
-                try:
-                    activated_time = datetime.fromisoformat(time_activated)
-                    current_time = datetime.now()
-                    time_diff = current_time - activated_time
-                    hours_passed = time_diff.total_seconds() / 3600
-                    
-                    duration_hours = 3 * 24
-                    hours_remaining = duration_hours - hours_passed
+            if active and expires_at:
+                hours_remaining = (expires_at - now_ms()) / 3600000
+                
+                if hours_remaining > 0:
+                    days_remaining = int(hours_remaining // 24)
+                    hours_only = int(hours_remaining % 24)
                     
-                    if hours_remaining > 0:
-                        days_remaining = int(hours_remaining // 24)
-                        hours_only = int(hours_remaining % 24)
-                        
-                        if days_remaining > 0:
-                            time_left = f"{days_remaining}d {hours_only}h remaining"
-                        else:
-                            time_left = f"{hours_only}h remaining"
-                        
-                        status = f"Active | {time_left}"
+                    if days_remaining > 0:
+                        time_left = f"{days_remaining}d {hours_only}h remaining"
                     else:
-                        status = f"Amount: {amount}"
-                except:
+                        time_left = f"{hours_only}h remaining"
+                    
+                    status = f"Active | {time_left}"
+                else:
                     status = f"Amount: {amount}"
             else:
                 status = f"Amount: {amount}"
@@ -406,33 +385,23 @@ class Shop(commands.Cog):
         
         crp_data = user_items.get('custom_role_pass', {})
         crp_amount = crp_data.get('amount', 0)
-        crp_time = crp_data.get('timeActivated')
+        expires_at = crp_data.get('expiresAt')
         
-        if crp_time:
-            try:
-                activated_time = datetime.fromisoformat(crp_time)
-                current_time = datetime.now()
-                
-                time_diff = current_time - activated_time
-                hours_passed = time_diff.total_seconds() / 3600
-                
-                duration_hours = 30 * 24
-                hours_remaining = duration_hours - hours_passed
+        if crp_data.get('timeActivated') and expires_at:
+            hours_remaining = (expires_at - now_ms()) / 3600000
+            
+            if hours_remaining > 0:
+                days_remaining = int(hours_remaining // 24)
+                hours_only = int(hours_remaining % 24)
                 
-                if hours_remaining > 0:
-                    days_remaining = int(hours_remaining // 24)
-                    hours_only = int(hours_remaining % 24)
-                    
-                    if days_remaining > 0:
-                        time_left = f"{days_remaining}d {hours_only}h remaining"
-                    else:
-                        time_left = f"{hours_only}h remaining"
-                    
-                    crp_status = f"Amount: {crp_amount} | {time_left}"
+                if days_remaining > 0:
+                    time_left = f"{days_remaining}d {hours_only}h remaining"
                 else:
-                    crp_status = f"Amount: {crp_amount} | Not activated / Expired"
-            except:
-                crp_status = f"Amount: {crp_amount}"
+                    time_left = f"{hours_only}h remaining"
+                
+                crp_status = f"Amount: {crp_amount} | {time_left}"
+            else:
+                crp_status = f"Amount: {crp_amount} | Not activated / Expired"
         else:
             crp_status = f"Amount: {crp_amount} | Not activated"
         
@@ -447,7 +416,7 @@ class Shop(commands.Cog):
     @app_commands.command(name="use", description="Use an item (booster or custom role pass)")
     @app_commands.describe(item="The item to use (e.g., tiny, small, medium, large, customrole)")
     async def use_item(self, interaction: discord.Interaction, item: Literal["Tiny Booster", "Small Booster", "Medium Booster", "Large Booster", "Custom Role Pass"]):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
 
         item_type, item_name = self.normalize_item_name(item)
@@ -456,15 +425,18 @@ class Shop(commands.Cog):
             await interaction.response.send_message("Invalid item! Use `/inventory` to see your items.", ephemeral=True)
             return
         
-        if item_type == 'booster':
-            await self._use_booster(interaction, item_name)
-        elif item_type == 'custom_role_pass':
-            await self._use_custom_role_pass(interaction)
+        async with lock_manager.acquire(user_key(interaction.user.id)):
+            if item_type == 'booster':
+                reply = await asyncio.to_thread(self._use_booster, interaction.user, item_name)
+            else:
+                reply = await asyncio.to_thread(self._use_custom_role_pass, interaction.user)
+        
+        await interaction.response.send_message(**reply)
 
     @app_commands.command(name="equip", description="Equip an owned role")
     @app_commands.describe(role="The role to equip")
     async def equip(self, interaction: discord.Interaction, role: Literal["Red", "Orange", "Teal", "Blue", "Purple", "Black", "Custom Role 1", "Custom Role 2", "XP Boost 5%", "XP Boost 10%"]):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
         
         role = self.normalize_role_name(role)
@@ -473,12 +445,13 @@ class Shop(commands.Cog):
             await interaction.response.send_message("Invalid role!", ephemeral=True)
             return
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        user_data = await asyncio.to_thread(firebase_manager.get_user_fields, interaction.user.id, ['roles'])
         user_roles = user_data.get('roles', {})
         
         db_key = self.get_db_role_key(role)
         
-        discord_role_id = bot_config.COLOUR_ROLES.get(role) or bot_config.SPECIAL_ROLES.get(role)
+        guild_config = guild_configs.get(interaction.guild)
+        discord_role_id = guild_config.colour_roles.get(role) or guild_config.special_roles.get(role)
         
         if not discord_role_id:
             await interaction.response.send_message("Role not configured in the bot!", ephemeral=True)
@@ -513,7 +486,7 @@ class Shop(commands.Cog):
     @app_commands.command(name="unequip", description="Unequip an owned role")
     @app_commands.describe(role="The role to unequip (e.g., Red, Blue...)")
     async def unequip(self, interaction: discord.Interaction, role: Literal["Red", "Orange", "Teal", "Blue", "Purple", "Black", "Custom Role 1", "Custom Role 2", "XP Boost 5%", "XP Boost 10%"]):
-        if interaction.channel.id != bot_config.COMMANDS_CHANNEL_ID:
+        if interaction.channel.id != guild_configs.get(interaction.guild).commands_channel_id:
             return
             
         role = self.normalize_role_name(role)
@@ -522,12 +495,13 @@ class Shop(commands.Cog):
             await interaction.response.send_message("Invalid role!", ephemeral=True)
             return
         
-        user_data = firebase_manager.get_user_data(interaction.user.id)
+        user_data = await asyncio.to_thread(firebase_manager.get_user_fields, interaction.user.id, ['roles'])
         user_roles = user_data.get('roles', {})
         
         db_key = self.get_db_role_key(role)
         
-        discord_role_id = bot_config.COLOUR_ROLES.get(role) or bot_config.SPECIAL_ROLES.get(role)
+        guild_config = guild_configs.get(interaction.guild)
+        discord_role_id = guild_config.colour_roles.get(role) or guild_config.special_roles.get(role)
         
         if not discord_role_id:
             await interaction.response.send_message("Role not configured in the bot!", ephemeral=True)
@@ -94,12 +94,17 @@ COLOUR_ROLES = {
 XP_BASE = 2
 XP_COOLDOWN = 20
 
+# XP needed for a level is XP_CURVE_COEFFICIENT * level ** XP_CURVE_EXPONENT, until /migratexpcurve stores a new curve
+XP_CURVE_COEFFICIENT = 12.25
+XP_CURVE_EXPONENT = 2
+
 BOOSTER_DURATIONS = {
     'tiny_booster': 4320,    
     'small_booster': 4320,
     'medium_booster': 4320, 
     'large_booster': 4320, 
 }
+CUSTOM_ROLE_PASS_DURATION = 43200
 
 #============================#
 #       Check Intervals      #
@@ -107,4 +112,151 @@ BOOSTER_DURATIONS = {
 
 BOOSTER_CHECK_INTERVAL = 60
 CUSTOM_ROLE_CHECK_INTERVAL = 60
-GAMBLE_COOLDOWN = 21600
\ No newline at end of file
+GAMBLE_COOLDOWN = 21600
+
+#============================#
+#      Role Resync Job       #
+#============================#
+
+ROLE_SYNC_CHUNK_SIZE = 1000
+ROLE_SYNC_EDITS_PER_SECOND = 4
+
+#============================#
+#      Auction Configs       #
+#============================#
+
+AUCTION_EMBED_EDIT_INTERVAL = 5
+
+#============================#
+#       Startup Configs      #
+#============================#
+
+STARTUP_BUDGET_SECONDS = 10
+
+#============================#
+#    Warm Restart Snapshot   #
+#============================#
+
+SNAPSHOT_PATH = 'state.snapshot'
+SNAPSHOT_MAX_AGE = 86400
+# Materialized coin balances can't be revalidated, so they are only restored from a snapshot this recent
+SNAPSHOT_BALANCE_MAX_AGE = 300
+
+#============================#
+#          Metrics           #
+#============================#
+
+METRICS_ENABLED = False
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+
+#============================#
+#      Database Tracing      #
+#============================#
+
+DB_TRACE_ENABLED = False
+
+# Current round trips per invocation, tracing warns when one goes over
+DB_ROUND_TRIP_BUDGETS = {
+    'on_message': 4,
+    '/rank': 3,
+    '/buy': 6,
+    '/coinflip': 3,
+    '/bid': 9,
+}
+
+#============================#
+#    Event Loop Watchdog     #
+#============================#
+
+LOOP_WATCHDOG_ENABLED = True
+LOOP_WATCHDOG_INTERVAL = 0.1
+LOOP_STALL_THRESHOLD = 0.25
+
+#============================#
+#      Sampling Profiler     #
+#============================#
+
+PROFILE_SAMPLE_INTERVAL = 0.01
+PROFILE_MAX_SECONDS = 60
+
+#============================#
+#      Projection Reads      #
+#============================#
+
+# Threads fetching the child paths of a get_user_fields() call side by side
+PROJECTION_READ_WORKERS = 8
+
+#============================#
+#     Leaderboard Freshness  #
+#============================#
+
+# Seconds leaderboards, rank counts and role sync reuse the last /users poll without asking again.
+# Any message changes /users, so while chat is active its ETag check almost never hits and each
+# check re-downloads the whole tree. This caps that to one download per window.
+LEADERBOARD_MAX_AGE = 30
+
+#============================#
+#        Cold Storage        #
+#============================#
+
+# Users who haven't sent a message in this many days move from /users to /usersCold
+COLD_TIER_INACTIVE_DAYS = 90
+# Hours between tiering passes, and the most users one pass moves
+COLD_TIER_INTERVAL = 24
+COLD_TIER_BATCH = 5000
+
+#============================#
+#     Memory Accounting      #
+#============================#
+
+MEMORY_TRACE_ENABLED = False
+MEMORY_TRACE_FRAMES = 25
+MEMORY_SNAPSHOT_INTERVAL = 30
+
+#============================#
+#     Lean Gateway Mode      #
+#============================#
+
+# Skips member chunking and the member/message caches, members are fetched on demand instead
+LEAN_GATEWAY_MODE = False
+
+#============================#
+#       Cluster Configs      #
+#============================#
+
+# Used by cluster.py, a plain `python bot.py` still runs everything in one process
+CLUSTER_PROCESSES = 2
+CLUSTER_SHARD_COUNT = 2
+STORAGE_SOCKET_PATH = 'storage.sock'
+CLUSTER_RESTART_DELAY = 5
+
+# Aggregator threads answering reads from every shard, writes all go through one writer thread
+STORAGE_READ_WORKERS = 8
+# Seconds the writer waits for more writes before sending them as one multi-path update
+STORAGE_WRITE_TICK = 0.02
+STORAGE_WRITE_BATCH_MAX = 100
+
+# Background loops run only in the process holding this guild's shard, shard 0 if unset.
+# It's also the only guild the settings above apply to until it's configured, unset means every guild.
+HOME_GUILD_ID = None
+
+#============================#
+#     Per-Guild Settings     #
+#============================#
+
+# How often stored guild settings are re-read, edits from /setguildconfig apply instantly on the process that made them
+GUILD_CONFIG_REFRESH_INTERVAL = 30
+
+#============================#
+#     Economy Aggregates     #
+#============================#
+
+# Minutes between full scans that correct any drift in the running totals
+ECONOMY_RECONCILE_INTERVAL = 60
+
+# Minutes between folds of the coin ledger into each user's checkpointed balance
+LEDGER_COMPACTION_INTERVAL = 15
+
+# Materialized balances kept in memory, the least recently used are dropped past this
+BALANCE_CACHE_SIZE = 50000
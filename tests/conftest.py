@@ -0,0 +1,178 @@
+import copy
+import hashlib
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+#============================#
+#    In-Memory Firebase      #
+#============================#
+
+def _prune(value):
+    # Realtime Database never stores nulls or empty objects
+    if isinstance(value, dict):
+        pruned = {key: _prune(child) for key, child in value.items()}
+        pruned = {key: child for key, child in pruned.items() if child is not None}
+        return pruned or None
+    return value
+
+
+def _split(path):
+    return [part for part in path.split('/') if part]
+
+
+class FakeDatabase:
+    """Just enough of a firebase_admin Realtime Database for FirebaseManager to run against"""
+
+    def __init__(self, data=None):
+        self.data = _prune(copy.deepcopy(data or {})) or {}
+
+    def reference(self, path='/'):
+        return FakeReference(self, _split(path))
+
+    def read(self, parts):
+        node = self.data
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def write(self, parts, value):
+        value = _prune(copy.deepcopy(value))
+        if not parts:
+            self.data = value or {}
+            return
+
+        node = self.data
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        self.data = _prune(self.data) or {}
+
+
+def _etag(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class FakeReference:
+    def __init__(self, database, parts):
+        self.database = database
+        self.parts = parts
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self.parts)
+
+    def child(self, path):
+        return FakeReference(self.database, self.parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        value = self.database.read(self.parts)
+        if shallow and isinstance(value, dict):
+            value = {key: True for key in value}
+        return (value, _etag(value)) if etag else value
+
+    def get_if_changed(self, etag):
+        value, current = self.get(etag=True)
+        if current == etag:
+            return False, None, etag
+        return True, value, current
+
+    def set(self, value):
+        self.database.write(self.parts, value)
+
+    def update(self, value):
+        for path, child in value.items():
+            self.database.write(self.parts + _split(path), child)
+
+    def delete(self):
+        self.database.write(self.parts, None)
+
+    def order_by_child(self, path):
+        return FakeQuery(self, _split(path))
+
+
+class FakeQuery:
+    def __init__(self, ref, child_parts, start=None, end=None, limit=None):
+        self.ref = ref
+        self.child_parts = child_parts
+        self.start = start
+        self.end = end
+        self.limit = limit
+
+    def _with(self, **changes):
+        query = FakeQuery(self.ref, self.child_parts, self.start, self.end, self.limit)
+        query.__dict__.update(changes)
+        return query
+
+    def start_at(self, value):
+        return self._with(start=value)
+
+    def end_at(self, value):
+        return self._with(end=value)
+
+    def limit_to_first(self, limit):
+        return self._with(limit=limit)
+
+    def get(self):
+        matches = []
+        for key, value in (self.ref.get() or {}).items():
+            ordered = value
+            for part in self.child_parts:
+                ordered = ordered.get(part) if isinstance(ordered, dict) else None
+            if self.start is not None and (ordered is None or ordered < self.start):
+                continue
+            if self.end is not None and ordered is not None and ordered > self.end:
+                continue
+            matches.append((key, value))
+        return dict(matches[:self.limit] if self.limit else matches)
+
+
+#============================#
+#          Fixtures          #
+#============================#
+
+@pytest.fixture
+def fake_database():
+    return FakeDatabase()
+
+
+@pytest.fixture
+def manager(monkeypatch, fake_database):
+    """A real FirebaseManager talking to fake_database, installed behind utils.firebase_manager"""
+    import firebase_admin
+    from firebase_admin import credentials, db
+    from utils import firebase_manager as lazy_manager
+    from utils.firebase_manager import FirebaseManager
+
+    monkeypatch.setenv('FIREBASE_CREDENTIALS', '{}')
+    monkeypatch.setenv('FIREBASE_DATABASE_URL', 'https://levelbot-test.firebaseio.com')
+    monkeypatch.delenv('LEVELBOT_STORAGE_SOCKET', raising=False)
+    monkeypatch.setattr(credentials, 'Certificate', lambda info: info)
+    monkeypatch.setattr(firebase_admin, 'initialize_app', lambda *args, **kwargs: None)
+    monkeypatch.setattr(db, 'reference', fake_database.reference)
+
+    instance = FirebaseManager()
+    monkeypatch.setattr(lazy_manager, '_instance', instance)
+    return instance
+
+
+@pytest.fixture
+def fake_bot():
+    avatar = types.SimpleNamespace(url='https://cdn.discordapp.com/embed/avatars/0.png')
+    return types.SimpleNamespace(runs_background_tasks=False, user=types.SimpleNamespace(display_avatar=avatar))
+
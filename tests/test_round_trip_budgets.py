@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip('firebase_admin')
+pytest.importorskip('numpy')
+pytest.importorskip('discord')
+
+from config import config as bot_config
+from utils.db_trace import expect_max_round_trips
+
+BUDGETS = bot_config.DB_ROUND_TRIP_BUDGETS
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.mention = f"<@{user_id}>"
+
+    def __str__(self):
+        return self.name
+
+
+ALICE = FakeUser(1, 'alice')
+
+
+@pytest.fixture
+def seeded(manager, fake_database):
+    """Two stored users, one with an uncompacted transaction, and no balance materialized yet"""
+    fake_database.data = {
+        'week': manager._get_current_week(),
+        'users': {
+            '1': {'userId': '1', 'lastUsername': 'alice', 'totalXP': 1500, 'level': 3, 'coins': 50000, 'messageCount': 12},
+            '2': {'userId': '2', 'lastUsername': 'bob', 'totalXP': 300, 'level': 1, 'coins': 20000, 'messageCount': 4},
+        },
+        'ledger': {
+            '1': {'00000000000000000001aaaaaa': {'type': 'flip_win', 'amount': 250, 'at': 1}},
+        },
+    }
+    # Loaded once per process, only the first command after a boot pays for these
+    manager.cold_users
+    manager.xp_curve
+    return manager
+
+
+def test_on_message_stays_within_budget(seeded, fake_bot):
+    from cogs.leveling import Leveling
+    leveling = Leveling(fake_bot)
+
+    with expect_max_round_trips('on_message', BUDGETS['on_message']):
+        result = leveling.award_xp(ALICE, 15)
+
+    assert result['total_xp'] == 1515
+
+
+def test_rank_stays_within_budget(seeded):
+    with expect_max_round_trips('/rank', BUDGETS['/rank']):
+        user_data, rank = seeded.get_rank_card(ALICE.id)
+
+    assert user_data['coins'] == 50250
+    assert rank == 1
+
+
+def test_rank_reuses_recent_columns(seeded):
+    seeded.get_rank_card(ALICE.id)
+
+    # Within LEADERBOARD_MAX_AGE only the user's own fields are read again
+    with expect_max_round_trips('/rank', 1):
+        seeded.get_rank_card(ALICE.id)
+
+
+def test_buy_role_stays_within_budget(seeded, fake_bot):
+    from cogs.shop import Shop
+    shop = Shop(fake_bot)
+
+    with expect_max_round_trips('/buy', BUDGETS['/buy']):
+        reply = shop._buy_role(ALICE, 'Red')
+
+    assert 'embed' in reply
+    user_data = seeded.get_user_fields(ALICE.id, ['coins', 'roles/Red'])
+    assert user_data['coins'] == 49250
+    assert user_data['roles']['Red'] is True
+
+
+def test_buy_booster_stays_within_budget(seeded, fake_bot):
+    from cogs.shop import Shop
+    shop = Shop(fake_bot)
+
+    with expect_max_round_trips('/buy', BUDGETS['/buy']):
+        reply = shop._buy_booster(ALICE, 'tiny_booster')
+
+    assert 'embed' in reply
+    assert seeded.get_user_fields(ALICE.id, ['items/tiny_booster'])['items']['tiny_booster']['amount'] == 1
+
+
+def test_coinflip_stays_within_budget(seeded, fake_bot, monkeypatch):
+    from cogs import gambling
+    monkeypatch.setattr(gambling.random, 'random', lambda: 0.9)
+    cog = gambling.Gambling(fake_bot)
+
+    with expect_max_round_trips('/coinflip', BUDGETS['/coinflip']):
+        reply = cog.flip(ALICE, 100, 'heads')
+
+    assert 'embed' in reply
+    assert seeded.get_balance(ALICE.id) == 50150
+
+
+def test_bid_stays_within_budget(seeded, fake_bot):
+    from cogs.auction import Auctions
+    auctions = Auctions(fake_bot)
+
+    auction_id = seeded.create_auction('large_booster', 1000, 24, started_by=99)
+    seeded.record_transaction(2, 'bid_hold', -1500, reference=auction_id)
+    seeded.update_auction_bid(auction_id, 2, 1500)
+    # Outbidding is the expensive case, neither bidder's balance is materialized yet
+    seeded._invalidate_balances()
+
+    with expect_max_round_trips('/bid', BUDGETS['/bid']):
+        auction = seeded.get_auction(auction_id)
+        reply, outbid, placed = auctions.place_bid(ALICE, auction_id, auction, 2000)
+
+    assert placed, reply
+    assert outbid == ('2', 1500)
+    assert seeded.get_balance(2) == 20000
+    assert seeded.get_balance(ALICE.id) == 48250
@@ -1,3 +1,7 @@
 from .firebase_manager import firebase_manager
+from .locks import lock_manager, user_key, auction_key
+from . import metrics
+from .db_trace import tracer as db_tracer
+from .guild_config import guild_configs
 
-__all__ = ['firebase_manager']
\ No newline at end of file
+__all__ = ['firebase_manager', 'lock_manager', 'user_key', 'auction_key', 'metrics', 'db_tracer', 'guild_configs']
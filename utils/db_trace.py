@@ -0,0 +1,259 @@
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# The command or listener currently running in this task. discord.py runs every event and
+# interaction in its own task, so a value set at the start of one never leaks into another.
+current_trace = contextvars.ContextVar('db_trace', default=None)
+
+# Set while a batch of reads is issued side by side, see parallel_reads()
+current_parallel = contextvars.ContextVar('db_parallel', default=None)
+
+
+class OperationTrace:
+    def __init__(self, name):
+        self.name = name
+        self.round_trips = 0
+        self.bytes = 0
+        self.over_budget = False
+
+
+class ParallelReads:
+    """Reads in flight at the same time cost the caller one round trip of latency, not one each"""
+
+    def __init__(self):
+        self.charged = False
+        self.lock = threading.Lock()
+
+    def charge(self):
+        # True only for the first read of the group
+        with self.lock:
+            first = not self.charged
+            self.charged = True
+            return first
+
+
+class DatabaseTracer:
+    """
+    Attributes every database round trip to the command, listener or task that made it
+    and keeps per-operation totals. Recording is skipped entirely while disabled. Calls
+    are recorded from worker threads, so the totals are only touched under self.lock.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.budgets = {}
+        self.stats = {}
+        self.recent_calls = deque(maxlen=200)
+        self.lock = threading.Lock()
+
+    def start_operation(self, name):
+        trace = OperationTrace(name)
+        current_trace.set(trace)
+
+        if self.enabled:
+            with self.lock:
+                stats = self._get_stats(name)
+                stats['invocations'] += 1
+
+        return trace
+
+    def _get_stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = {'invocations': 0, 'round_trips': 0, 'max_round_trips': 0, 'bytes': 0, 'latency': 0.0, 'paths': {}}
+            self.stats[name] = stats
+        return stats
+
+    def record(self, method, path, size, latency):
+        trace = current_trace.get()
+        name = trace.name if trace else 'unattributed'
+        parallel = current_parallel.get()
+        round_trips = 1 if parallel is None or parallel.charge() else 0
+        over_budget = None
+
+        with self.lock:
+            stats = self._get_stats(name)
+            stats['round_trips'] += round_trips
+            stats['bytes'] += size
+            stats['latency'] += latency
+
+            path_key = f"{method} {path}"
+            stats['paths'][path_key] = stats['paths'].get(path_key, 0) + 1
+
+            self.recent_calls.append((name, method, path, size, latency))
+
+            if trace:
+                # One operation's reads can land on several pool threads at once
+                trace.round_trips += round_trips
+                trace.bytes += size
+                stats['max_round_trips'] = max(stats['max_round_trips'], trace.round_trips)
+
+                budget = self.budgets.get(name)
+                if budget is not None and trace.round_trips > budget and not trace.over_budget:
+                    trace.over_budget = True
+                    over_budget = budget
+
+        if over_budget is not None:
+            print(f"⚠️ {name} exceeded its database budget of {over_budget} round trips ({method} {path})")
+
+    def call(self, method, path, func, *args, payload=None, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        started = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            size = payload_size(payload if payload is not None else result)
+            self.record(method, path, size, time.perf_counter() - started)
+
+    def report(self):
+        lines = []
+        with self.lock:
+            snapshot = {name: {**stats, 'paths': dict(stats['paths'])} for name, stats in self.stats.items()}
+        ordered = sorted(snapshot.items(), key=lambda item: item[1]['round_trips'], reverse=True)
+
+        for name, stats in ordered:
+            invocations = stats['invocations'] or 1
+            lines.append(
+                f"{name}: {stats['invocations']}x, "
+                f"avg {stats['round_trips'] / invocations:.1f} / max {stats['max_round_trips']} round trips, "
+                f"avg {stats['bytes'] / invocations / 1024:.1f}KB, "
+                f"avg {stats['latency'] / invocations * 1000:.0f}ms"
+            )
+
+            top_paths = sorted(stats['paths'].items(), key=lambda item: item[1], reverse=True)[:3]
+            for path_key, count in top_paths:
+                lines.append(f"    {count}x {path_key}")
+
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.recent_calls.clear()
+
+tracer = DatabaseTracer()
+
+
+def payload_size(value):
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+#============================#
+#      Traced References     #
+#============================#
+
+class TracedReference:
+    """Wraps a firebase_admin db.Reference so every network call goes through the tracer"""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    def child(self, path):
+        return TracedReference(self._ref.child(path))
+
+    def get(self, *args, **kwargs):
+        return tracer.call('get', self._ref.path, self._ref.get, *args, **kwargs)
+
+    def get_if_changed(self, etag):
+        return tracer.call('get_if_changed', self._ref.path, self._ref.get_if_changed, etag)
+
+    def set(self, value):
+        return tracer.call('set', self._ref.path, self._ref.set, value, payload=value)
+
+    def update(self, value):
+        return tracer.call('update', self._ref.path, self._ref.update, value, payload=value)
+
+    def push(self, value=''):
+        return tracer.call('push', self._ref.path, self._ref.push, value, payload=value)
+
+    def delete(self):
+        return tracer.call('delete', self._ref.path, self._ref.delete)
+
+    def order_by_child(self, path):
+        return TracedQuery(self._ref.order_by_child(path), self._ref.path)
+
+    def order_by_key(self):
+        return TracedQuery(self._ref.order_by_key(), self._ref.path)
+
+    def order_by_value(self):
+        return TracedQuery(self._ref.order_by_value(), self._ref.path)
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+
+class TracedQuery:
+    def __init__(self, query, path):
+        self._query = query
+        self._path = path
+
+    def get(self):
+        return tracer.call('query', self._path, self._query.get)
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        # start_at, end_at, limit_to_first... all return a new query, keep it traced
+        def chain(*args, **kwargs):
+            return TracedQuery(attr(*args, **kwargs), self._path)
+        return chain
+
+
+@contextmanager
+def parallel_reads():
+    """
+    Count every read issued inside the block as one round trip. Only for reads that really
+    overlap, e.g. submitted to a pool with contextvars.copy_context() and then awaited together.
+    """
+    token = current_parallel.set(ParallelReads())
+    try:
+        yield
+    finally:
+        current_parallel.reset(token)
+
+
+#============================#
+#        Test Helpers        #
+#============================#
+
+@contextmanager
+def expect_max_round_trips(name, limit):
+    """
+    Run a block as operation `name` and raise AssertionError if it made more than
+    `limit` database round trips, e.g.
+
+        with expect_max_round_trips('/buy', 6):
+            await shop_cog.buy.callback(shop_cog, interaction, 'Red')
+    """
+    was_enabled = tracer.enabled
+    tracer.enabled = True
+    token = current_trace.set(None)
+    trace = tracer.start_operation(name)
+
+    try:
+        yield trace
+    finally:
+        tracer.enabled = was_enabled
+        current_trace.reset(token)
+
+    if trace.round_trips > limit:
+        raise AssertionError(f"{name} made {trace.round_trips} database round trips, budget is {limit}")
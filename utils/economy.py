@@ -0,0 +1,146 @@
+import threading
+import time
+import numpy as np
+
+
+class EconomyAggregates:
+    """
+    Running totals over every user, kept current by the FirebaseManager mutation paths so
+    /economy never has to scan /users. reconcile() rebuilds them from a full scan and
+    reports how far the incremental numbers had drifted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.users = 0
+        self.coin_supply = 0.0
+        self.total_xp = 0.0
+        self.level_counts = {}
+        self.active_boosters = {}
+        self.role_owners = {}
+        self.reconciled_at = None
+        self.last_drift = {}
+
+    #============================#
+    #     Incremental Updates    #
+    #============================#
+
+    def _bump(self, counts, key, amount):
+        counts[key] = counts.get(key, 0) + amount
+        if counts[key] == 0:
+            del counts[key]
+
+    def add_user(self, user_data, sign=1):
+        """Count a whole user in (sign=1) or out (sign=-1), used for new and reset users"""
+        with self._lock:
+            self.users += sign
+            self.coin_supply += sign * (user_data.get('coins') or 0)
+            self.total_xp += sign * (user_data.get('totalXP') or 0)
+            self._bump(self.level_counts, user_data.get('level') or 0, sign)
+
+            for role_key, owned in (user_data.get('roles') or {}).items():
+                if owned:
+                    self._bump(self.role_owners, role_key, sign)
+
+            for item_name, item_data in (user_data.get('items') or {}).items():
+                if 'booster' in item_name and (item_data or {}).get('active', 0) == 1:
+                    self._bump(self.active_boosters, item_name, sign)
+
+    def adjust(self, coins=0, xp=0):
+        with self._lock:
+            self.coin_supply += coins
+            self.total_xp += xp
+
+    def move_level(self, old_level, new_level):
+        if old_level == new_level:
+            return
+        with self._lock:
+            self._bump(self.level_counts, old_level, -1)
+            self._bump(self.level_counts, new_level, 1)
+
+    def set_role(self, role_key, was_owned, owned):
+        if bool(was_owned) != bool(owned):
+            with self._lock:
+                self._bump(self.role_owners, role_key, 1 if owned else -1)
+
+    def set_booster(self, booster_name, was_active, active):
+        if 'booster' in booster_name and bool(was_active) != bool(active):
+            with self._lock:
+                self._bump(self.active_boosters, booster_name, 1 if active else -1)
+
+    #============================#
+    #        Reconciling         #
+    #============================#
+
+    def _scan(self, columns):
+        distinct, counts = np.unique(columns.columns['level'], return_counts=True)
+        booster_counts = {
+            name: int(np.count_nonzero(columns.booster_masks & np.uint64(bit)))
+            for name, bit in columns.booster_bits.items()
+        }
+        role_counts = {role_key: int(np.count_nonzero(columns.has_role(role_key))) for role_key in columns.role_bits}
+
+        return {
+            'users': len(columns),
+            'coin_supply': columns.total('coins'),
+            'total_xp': columns.total('totalXP'),
+            'level_counts': {int(level): int(count) for level, count in zip(distinct, counts)},
+            'active_boosters': {name: count for name, count in booster_counts.items() if count},
+            'role_owners': {role_key: count for role_key, count in role_counts.items() if count},
+        }
+
+    def reconcile(self, columns, pending_coins=0, cold_columns=None):
+        """
+        Replace the running totals with a full scan of the user columns (hot and cold tiers)
+        plus the ledger transactions not compacted into them yet. Mutations that land while
+        the scan is in flight may be counted twice or not at all, the next pass fixes that.
+        """
+        scanned = self._scan(columns)
+        scanned['coin_supply'] += pending_coins
+
+        if cold_columns is not None and len(cold_columns):
+            cold = self._scan(cold_columns)
+            for field in ('users', 'coin_supply', 'total_xp'):
+                scanned[field] += cold[field]
+            for field in ('level_counts', 'active_boosters', 'role_owners'):
+                for key, count in cold[field].items():
+                    scanned[field][key] = scanned[field].get(key, 0) + count
+
+        with self._lock:
+            drift = {}
+            if self.ready:
+                for field in ('users', 'coin_supply', 'total_xp'):
+                    difference = scanned[field] - getattr(self, field)
+                    if abs(difference) > 1e-6:
+                        drift[field] = difference
+
+            for field, value in scanned.items():
+                setattr(self, field, value)
+
+            self.ready = True
+            self.reconciled_at = time.time()
+            self.last_drift = drift
+
+        return drift
+
+    #============================#
+    #          Reading           #
+    #============================#
+
+    def count_at_least(self, level):
+        return sum(count for user_level, count in self.level_counts.items() if user_level >= level)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'users': self.users,
+                'coin_supply': self.coin_supply,
+                'total_xp': self.total_xp,
+                'level_counts': {str(level): count for level, count in sorted(self.level_counts.items())},
+                'active_boosters': dict(self.active_boosters),
+                'role_owners': dict(self.role_owners),
+                'reconciled_at': self.reconciled_at,
+                'last_drift': dict(self.last_drift),
+            }
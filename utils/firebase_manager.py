@@ -1,11 +1,98 @@
 import firebase_admin
 from firebase_admin import credentials, db
 import json
-from datetime import datetime, timedelta, timezone
-import math
+import contextvars
+import statistics
+import copy
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
 import os
+import threading
+import time
+from config import config as bot_config
+from .metrics import instrument_methods, cache_requests, single_flight_reads
+from .db_trace import TracedReference, payload_size, parallel_reads
+from .memory import deep_sizeof
+from .storage_ipc import StorageClient
+from .user_columns import UserColumns
+from .xp_curve import XPCurve
+from .economy import EconomyAggregates
+from .timestamps import MINUTE_MS, now_ms, to_epoch_ms, is_legacy
 
+# Every coin movement is one of these, stored as the 'type' of its ledger entry
+TRANSACTION_TYPES = {'purchase', 'bid_hold', 'refund', 'flip_win', 'flip_loss', 'admin_adjust'}
 
+
+def _merge_defaults(defaults, stored):
+    merged = dict(defaults)
+    for key, value in stored.items():
+        if isinstance(value, dict) and isinstance(defaults.get(key), dict):
+            merged[key] = _merge_defaults(defaults[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _item_duration_ms(item_name):
+    if item_name == 'custom_role_pass':
+        return bot_config.CUSTOM_ROLE_PASS_DURATION * MINUTE_MS
+    return bot_config.BOOSTER_DURATIONS.get(item_name, 30) * MINUTE_MS
+
+
+def _migrate_timestamps(user_data):
+    """
+    Convert ISO timestamps left in a user dict to epoch ms in place, adding expiresAt to
+    running items. Returns the {relative path: value} writes that make it stick.
+    """
+    updates = {}
+    for field in ('lastMessageTime', 'lastGambleTime'):
+        if is_legacy(user_data.get(field)):
+            user_data[field] = updates[field] = to_epoch_ms(user_data[field])
+    
+    for item_name, item_data in (user_data.get('items') or {}).items():
+        if not isinstance(item_data, dict) or not is_legacy(item_data.get('timeActivated')):
+            continue
+        item_data['timeActivated'] = updates[f"items/{item_name}/timeActivated"] = to_epoch_ms(item_data['timeActivated'])
+        if item_data.get('expiresAt') is None and (item_data.get('active') or item_name == 'custom_role_pass'):
+            expires_at = item_data['timeActivated'] + _item_duration_ms(item_name)
+            item_data['expiresAt'] = updates[f"items/{item_name}/expiresAt"] = expires_at
+    
+    return updates
+
+
+def _migrate_auction(auction_data):
+    updates = {}
+    for field in ('startTime', 'endTime'):
+        if is_legacy(auction_data.get(field)):
+            auction_data[field] = updates[field] = to_epoch_ms(auction_data[field])
+    if auction_data.get('expiresAt') is None and auction_data.get('endTime') is not None:
+        auction_data['expiresAt'] = updates['expiresAt'] = auction_data['endTime']
+    return updates
+
+
+def _default_paths(defaults, stored, prefix):
+    """Paths under prefix whose stored value is the same as the default"""
+    for key, value in stored.items():
+        path = f"{prefix}/{key}"
+        if isinstance(value, dict):
+            yield from _default_paths(defaults.get(key) or {}, value, path)
+        elif key in defaults and value == defaults[key]:
+            yield path
+
+
+def _missing_paths(archived, hot, prefix):
+    """(path, value) for every archived field under prefix that the hot document doesn't have"""
+    for key, value in archived.items():
+        path = f"{prefix}/{key}"
+        if isinstance(value, dict) and isinstance(hot.get(key), dict):
+            yield from _missing_paths(value, hot[key], path)
+        elif key not in hot:
+            yield path, value
+
+
+@instrument_methods
 class FirebaseManager:
     def __init__(self):
         cred_json = os.getenv('FIREBASE_CREDENTIALS')
@@ -18,7 +105,154 @@ class FirebaseManager:
         
         cred = credentials.Certificate(json.loads(cred_json))
         firebase_admin.initialize_app(cred, {'databaseURL': database_url})
-        self.db_ref = db.reference()
+        self.db_ref = TracedReference(db.reference())
+        self._polled_reads = {}
+        self._xp_curve = None
+        self.economy = EconomyAggregates()
+        self.balances = OrderedDict()
+        self._balances_lock = threading.Lock()
+        self._cold_users = None
+        self._promotion_lock = threading.Lock()
+        self._projection_pool = ThreadPoolExecutor(max_workers=bot_config.PROJECTION_READ_WORKERS, thread_name_prefix='projection-read')
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.single_flight_stats = {}
+    
+    #=============================#
+    #     Single-Flight Reads     #
+    #=============================#
+
+    def _single_flight(self, key, func, *args, copy_result=True):
+        """
+        Run func(*args) unless a read with the same key is already running on another thread,
+        in which case wait for that one and share its result. key[0] names the read in the stats.
+        When copy_result is set, followers share a snapshot taken before the leader hands its
+        result back and each get their own deep copy of it, since callers mutate what they're handed.
+        """
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                future.followers = 0
+                self._in_flight[key] = future
+            else:
+                future.followers += 1
+            stats = self.single_flight_stats.setdefault(key[0], {'calls': 0, 'collapsed': 0})
+            stats['calls'] += 1
+            if not leader:
+                stats['collapsed'] += 1
+        
+        if not leader:
+            single_flight_reads.inc(key[0], 'collapsed')
+            result = future.result()
+            return copy.deepcopy(result) if copy_result else result
+        
+        single_flight_reads.inc(key[0], 'leader')
+        try:
+            result = func(*args)
+        except BaseException as e:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        
+        # Nobody can join once the key is gone, so the snapshot is only paid for when someone did
+        with self._in_flight_lock:
+            del self._in_flight[key]
+            followers = future.followers
+        future.set_result(copy.deepcopy(result) if copy_result and followers else result)
+        return result
+    
+    def get_single_flight_stats(self):
+        with self._in_flight_lock:
+            return {read: dict(stats) for read, stats in self.single_flight_stats.items()}
+    
+    #=============================#
+    #      Conditional Reads      #
+    #=============================#
+
+    def _get_polled(self, path, parse, keep_value=True, max_age=None):
+        # Callers that accept max_age seconds of staleness skip the request while the last poll is that recent
+        if max_age:
+            cached = self._polled_reads.get(path)
+            if cached and parse in cached['parsed'] and time.monotonic() - cached.get('polled_at', 0) < max_age:
+                cache_requests.inc(path, 'fresh')
+                return cached['parsed'][parse]
+        
+        # The cached parse is shared by every caller anyway, so followers don't need a copy
+        return self._single_flight((f"polled {path}", parse, keep_value), self._read_polled, path, parse, keep_value, copy_result=False)
+    
+    def _read_polled(self, path, parse, keep_value):
+        """
+        Read a polled path with an ETag so unchanged trees cost one small request.
+        parse(value) is only re-run when the server reports a change. With keep_value=False
+        only the parsed result is held, for trees read through a single compact parse.
+        That only pays off for trees that rarely change, like /usersCold and /auctions. /users
+        changes with every message, so while chat is active its checks are nearly all misses
+        that download the whole tree. Readers that can wait use max_age instead.
+        """
+        ref = self.db_ref.child(path)
+        cached = self._polled_reads.get(path)
+        
+        if cached is None or (parse not in cached['parsed'] and 'value' not in cached):
+            value, etag = ref.get(etag=True)
+        else:
+            changed, value, etag = ref.get_if_changed(cached['etag'])
+            if not changed:
+                cache_requests.inc(path, 'hit')
+                cached['polled_at'] = time.monotonic()
+                if parse not in cached['parsed']:
+                    cached['parsed'][parse] = parse(cached['value'])
+                if not keep_value:
+                    cached.pop('value', None)
+                return cached['parsed'][parse]
+        
+        cache_requests.inc(path, 'miss')
+        cached = {'etag': etag, 'parsed': {parse: parse(value)}, 'polled_at': time.monotonic()}
+        if keep_value:
+            cached['value'] = value
+        self._polled_reads[path] = cached
+        return cached['parsed'][parse]
+    
+    def export_cache_state(self):
+        # Trees held only in parsed form are re-downloaded once after a restart
+        polled = {
+            path: {'etag': cached['etag'], 'value': cached['value']}
+            for path, cached in self._polled_reads.items()
+            if 'value' in cached
+        }
+        with self._balances_lock:
+            balances = dict(self.balances)
+        return {'polled': polled, 'balances': balances, 'saved_at': time.time()}
+    
+    def get_cache_sizes(self):
+        with self._balances_lock:
+            balances = dict(self.balances)
+        sizes = {'ledger balances': (len(balances), deep_sizeof(balances))}
+        if self._cold_users is not None:
+            sizes['cold user ids'] = (len(self._cold_users), deep_sizeof(self._cold_users))
+        for path, cached in self._polled_reads.items():
+            if 'value' in cached:
+                sizes[f"polled {path}"] = (len(cached['value'] or {}), deep_sizeof(cached['value']))
+            for parsed in cached['parsed'].values():
+                if isinstance(parsed, UserColumns):
+                    sizes[f"columns {path}"] = (len(parsed), parsed.nbytes)
+        return sizes
+    
+    def import_cache_state(self, state):
+        # Older snapshots held only the polled reads, keyed by path at the top level
+        polled = state['polled'] if 'saved_at' in state else state
+        
+        # Restored entries are validated lazily: the next poll sends their ETag with get_if_changed
+        for path, cached in polled.items():
+            self._polled_reads[path] = {'etag': cached['etag'], 'value': cached['value'], 'parsed': {}}
+        
+        # Balances carry no ETag to check them against, so they only survive a quick restart
+        # where nothing else could have appended to the ledger in between
+        if time.time() - state.get('saved_at', 0) <= bot_config.SNAPSHOT_BALANCE_MAX_AGE:
+            for user_id, balance in state.get('balances', {}).items():
+                self._cache_balance(user_id, balance)
     
     #======================#
     #  Weekly Reset Logic  #
@@ -43,13 +277,9 @@ class FirebaseManager:
             week_ref = self.db_ref.child('week')
             week_ref.set(current_week)
             
-            users_ref = self.db_ref.child('users')
-            all_users = users_ref.get()
-            
-            if all_users:
-                for user_id in all_users:
-                    user_ref = self.db_ref.child('users').child(user_id)
-                    user_ref.update({'messageCount': 0})
+            columns = self.get_user_columns()
+            rows = columns.rows_where(columns.columns['messageCount'] != 0)
+            self._update_users({f"{columns.user_ids[row]}/messageCount": None for row in rows})
             
             return True
         return False
@@ -88,18 +318,48 @@ class FirebaseManager:
             }
         }   
     
+    def _with_defaults(self, user_id, stored):
+        """Documents only hold fields that differ from the defaults, fill the rest back in"""
+        return _merge_defaults(self._create_default_user(user_id), stored or {})
+    
+    def strip_user_defaults(self):
+        """
+        One-off pass that deletes every stored field still holding its default value, for
+        documents written before users were stored sparsely. Returns (users, fields removed).
+        """
+        all_users = self.db_ref.child('users').get() or {}
+        
+        updates = {}
+        users = 0
+        for user_id, stored in all_users.items():
+            paths = list(_default_paths(self._create_default_user(user_id), stored or {}, user_id))
+            if paths:
+                users += 1
+                updates.update({path: None for path in paths})
+        
+        removed = self._update_users(updates)
+        return users, removed
+    
     #=============================#
     #  XP and Level Calculations  #
     #=============================#
 
+    @property
+    def xp_curve(self):
+        # A migrated curve is stored in the database, the config values only apply until then
+        if self._xp_curve is None:
+            stored = self.db_ref.child('xpCurve').get()
+            if stored:
+                self._xp_curve = XPCurve.from_dict(stored)
+            else:
+                self._xp_curve = XPCurve(bot_config.XP_CURVE_COEFFICIENT, bot_config.XP_CURVE_EXPONENT)
+        return self._xp_curve
+    
     def calculate_xp_for_level(self, level):
-        return math.floor(12.25 * (level ** 2))
+        return self.xp_curve.xp_for_level(level)
     
     def calculate_level_from_xp(self, total_xp):
-        if total_xp <= 0:
-            return 0
-        level = math.floor(math.sqrt(total_xp / 12.25))
-        return level
+        return self.xp_curve.level_from_xp(total_xp)
     
     def get_xp_for_next_level(self, current_level):
         return self.calculate_xp_for_level(current_level + 1)
@@ -113,23 +373,125 @@ class FirebaseManager:
     #=============================#
 
     def get_user_data(self, user_id):
+        return self._single_flight(('user_data', str(user_id)), self._read_user_data, user_id)
+    
+    def _read_user_data(self, user_id):
+        return self._load_user_data(user_id)[0]
+    
+    def _load_user_data(self, user_id):
+        """The user with defaults filled in, and whether a document is stored for them at all"""
+        self._promote_if_cold(user_id)
+        with parallel_reads():
+            ledger = self._submit_ledger_read(user_id)
+            # Nothing is written for a lookup, the document appears with the user's first real change
+            stored = self.db_ref.child('users').child(str(user_id)).get()
+            pending = (ledger.result() or {}) if ledger else None
+        
+        user_data = self._with_defaults(user_id, stored)
+        self._save_migrated_timestamps(user_id, user_data)
+        # The stored coins are only the last compacted checkpoint, callers get the live balance
+        user_data['coins'] = self.get_balance(user_id, checkpoint=user_data['coins'] or 0, pending=pending)
+        return user_data, bool(stored)
+    
+    def _submit_ledger_read(self, user_id):
+        """Start reading the user's uncompacted ledger on the projection pool, None when the balance is materialized"""
+        if str(user_id) in self.balances:
+            return None
+        return self._projection_pool.submit(contextvars.copy_context().run, self.db_ref.child('ledger').child(str(user_id)).get)
+    
+    def _fetch_user_paths(self, user_id, fields):
         user_ref = self.db_ref.child('users').child(str(user_id))
-        user_data = user_ref.get()
+        if len(fields) == 1:
+            return {fields[0]: user_ref.child(fields[0]).get()}
         
-        if not user_data:
-            new_user = self._create_default_user(user_id)
-            user_ref.set(new_user)
-            return new_user
+        # Side by side so the wait is the slowest child rather than the sum. copy_context keeps
+        # each read attributed to the calling command in the tracer.
+        futures = {
+            field: self._projection_pool.submit(contextvars.copy_context().run, user_ref.child(field).get)
+            for field in fields
+        }
+        return {field: future.result() for field, future in futures.items()}
+    
+    def get_user_fields(self, user_id, fields):
+        """
+        Read only some child paths of a user, e.g. ['coins', 'lastGambleTime'] or
+        ['items/custom_role_pass'], merged into the same nested shape get_user_data returns.
+        Fields the user doesn't have yet come back as their defaults.
+        """
+        fields = list(dict.fromkeys(fields))
+        return self._single_flight(('user_fields', str(user_id), tuple(fields)), self._read_user_fields, user_id, fields)
+    
+    def _read_user_fields(self, user_id, fields):
+        self._promote_if_cold(user_id)
+        # A materialized balance already answers 'coins', the checkpoint under it isn't needed
+        fetch = [field for field in fields if field != 'coins' or str(user_id) not in self.balances]
+        # Otherwise the ledger the balance is built from is read alongside the child paths
+        with parallel_reads():
+            ledger = self._submit_ledger_read(user_id) if 'coins' in fetch else None
+            values = self._fetch_user_paths(user_id, fetch) if fetch else {}
+            pending = (ledger.result() or {}) if ledger else None
+        defaults = self._create_default_user(user_id)
         
+        user_data = {}
+        for field in fields:
+            parts = field.split('/')
+            value = values.get(field)
+            if value is None:
+                value = defaults
+                for part in parts:
+                    value = (value or {}).get(part)
+            
+            node = user_data
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = value
+        
+        self._save_migrated_timestamps(user_id, user_data)
+        if 'coins' in user_data:
+            user_data['coins'] = self.get_balance(user_id, checkpoint=values.get('coins') or 0, pending=pending)
         return user_data
     
+    def _save_migrated_timestamps(self, user_id, user_data):
+        # Records move to epoch ms lazily, the first time each legacy timestamp is read
+        updates = _migrate_timestamps(user_data)
+        if updates:
+            self._update_users({f"{user_id}/{path}": value for path, value in updates.items()})
+    
+    def benchmark_user_reads(self, user_id, projections, rounds=5):
+        """
+        Time a full user read against get_user_fields style reads for each projection.
+        Returns one dict per projection with payload bytes and median latency of both.
+        """
+        user_ref = self.db_ref.child('users').child(str(user_id))
+        results = []
+        
+        for name, fields in projections.items():
+            full_times, projected_times = [], []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                full = user_ref.get()
+                full_times.append(time.perf_counter() - started)
+                
+                started = time.perf_counter()
+                projected = self._fetch_user_paths(user_id, fields)
+                projected_times.append(time.perf_counter() - started)
+            
+            results.append({
+                'name': name,
+                'fields': fields,
+                'full_bytes': payload_size(full),
+                'projected_bytes': sum(payload_size(value) for value in projected.values()),
+                'full_ms': statistics.median(full_times) * 1000,
+                'projected_ms': statistics.median(projected_times) * 1000,
+            })
+        
+        return results
+    
     def get_user_roles(self, user_id):
-        user_data = self.get_user_data(user_id)
-        return user_data.get('roles', {})
+        return self.get_user_fields(user_id, ['roles'])['roles'] or {}
   
     def get_user_items(self, user_id):
-        user_data = self.get_user_data(user_id)
-        return user_data.get('items', {})
+        return self.get_user_fields(user_id, ['items'])['items'] or {}
     
     def get_active_boosters(self, user_id):
         items = self.get_user_items(user_id)
@@ -145,51 +507,38 @@ class FirebaseManager:
         return active_boosters
     
     def get_all_active_boosters_all_users(self):
-        all_users_ref = self.db_ref.child('users')
-        all_users = all_users_ref.get()
-        
-        if not all_users:
-            return {}
-        
-        active_boosters_map = {}
-        
-        for user_id, user_data in all_users.items():
-            items = user_data.get('items', {})
-            active = [
-                item_name for item_name, item_data in items.items()
-                if 'booster' in item_name and item_data.get('active', 0) == 1
-            ]
-            
-            if active:
-                active_boosters_map[user_id] = active
-        
-        return active_boosters_map
+        return self.get_user_columns().get_active_boosters()
     
     def get_all_users_with_custom_roles(self):
-        users_ref = self.db_ref.child('users')
-        all_users = users_ref.get() or {}
-        
-        users_with_crp = {}
-        
-        for user_id, user_data in all_users.items():
-            items = user_data.get('items', {})
-            crp_data = items.get('custom_role_pass', {})
-            
-            if crp_data.get('timeActivated') and crp_data.get('roleId'):
-                users_with_crp[user_id] = crp_data
-        
-        return users_with_crp
+        return self.get_user_columns().custom_role_passes
+
+    def get_all_user_levels(self):
+        levels = {}
+        max_age = bot_config.LEADERBOARD_MAX_AGE
+        for columns in (self.get_cold_user_columns(max_age), self.get_user_columns(max_age)):
+            levels.update(zip(columns.user_ids, columns.columns['level'].tolist()))
+        return levels
 
     #=============================#
     #    User Data Manipulation   #
     #=============================#
+    def _update_users(self, updates, chunk_size=5000):
+        """Apply {'<user_id>/<field>': value} in multi-path updates, one request per chunk"""
+        users_ref = self.db_ref.child('users')
+        paths = list(updates)
+        
+        for start in range(0, len(paths), chunk_size):
+            users_ref.update({path: updates[path] for path in paths[start:start + chunk_size]})
+        
+        return len(paths)
+    
     def add_xp(self, user_id, username, xp_amount):
         self._check_and_reset_weekly()
         
-        user_data = self.get_user_data(user_id)
+        # Read directly rather than shared, whether the document exists decides if the user is new
+        user_data, existed = self._load_user_data(user_id)
         
         old_level = user_data['level']
-        new_current_coins = user_data['coins'] + xp_amount
         
         if xp_amount > 0:
             new_total_xp = user_data['totalXP'] + xp_amount
@@ -203,9 +552,15 @@ class FirebaseManager:
             'totalXP': new_total_xp,
             'level': new_level,
             'lastUsername': username,
-            'lastMessageTime': datetime.now().isoformat()
+            'lastMessageTime': now_ms()
         })
         
+        if not existed:
+            # A sparse document comes into existence on its first write, that's when the user starts counting
+            self.economy.add_user({})
+        self.economy.adjust(xp=new_total_xp - user_data['totalXP'])
+        self.economy.move_level(old_level, new_level)
+        
         leveled_up = new_level > old_level
         
         return {
@@ -216,171 +571,536 @@ class FirebaseManager:
             'total_xp': new_total_xp
         }
     
-    def add_coins(self, user_id, username, amount):
-        user_data = self.get_user_data(user_id)
-        new_coins = round(user_data['coins'] + amount, 2)
-
-        user_ref = self.db_ref.child('users').child(str(user_id))
-        user_ref.update({
-            'coins': new_coins,
+    def add_coins(self, user_id, username, amount, transaction_type):
+        return self.record_transaction(user_id, transaction_type, amount, user_updates={
             'lastUsername': username,
-            'lastGambleTime': datetime.now(timezone.utc).isoformat()
+            'lastGambleTime': now_ms()
         })
-        
-        return new_coins
     
     def reset_user(self, user_id):
-        user_ref = self.db_ref.child('users').child(str(user_id))
-        user_ref.update({
-            'userId': str(user_id),
-            'lastMessageTime': None,
-            'lastGambleTime': None,
-            'level': 0,
-            'messageCount': 0,
-            'coins': 0,
-            'totalXP': 0,
-            'roles': {
-                'Red': False,
-                'Orange': False,
-                'Teal': False,
-                'Blue': False,
-                'Purple': False,
-                'Black': False,
-                'Custom Role 1': False,
-                'Custom Role 2': False,
-                'XP Boost 5%': False,
-                'XP Boost 10%': False,
-            },
-            'items': {
-                'tiny_booster': {'amount': 0, 'active': 0, 'timeActivated': None},
-                'small_booster': {'amount': 0, 'active': 0, 'timeActivated': None},
-                'medium_booster': {'amount': 0, 'active': 0, 'timeActivated': None},
-                'large_booster': {'amount': 0, 'active': 0, 'timeActivated': None},
-                'custom_role_pass': {'amount': 0, 'timeActivated': None, 'roleId': None}
-            }
-        })
+        old_data, existed = self._load_user_data(user_id)
+        
+        # A reset user is just an absent document. Pending transactions go too, otherwise the
+        # next compaction would re-add them.
+        self.db_ref.update({f"users/{user_id}": None, f"ledger/{user_id}": None})
+        self._invalidate_balances([user_id])
+        
+        if existed:
+            self.economy.add_user(old_data, sign=-1)
+        else:
+            # Never counted as a user, but coins held only in the ledger are in the supply
+            self.economy.adjust(coins=-old_data['coins'])
     
     def set_user_role(self, user_id, role_name, value=True):
+        self._promote_if_cold(user_id)
         user_ref = self.db_ref.child('users').child(str(user_id)).child('roles')
-        user_ref.update({role_name: value})
+        # The aggregates need to know whether this is a change, that's one tiny read
+        was_owned = user_ref.child(role_name).get()
+        user_ref.update({role_name: value or None})
+        self.economy.set_role(role_name, was_owned, value)
     
     def set_custom_role_id(self, user_id, role_id):
+        self._promote_if_cold(user_id)
         user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child('custom_role_pass')
         user_ref.update({'roleId': role_id})
         print(f"Stored custom role ID {role_id} for user {user_id}")
 
     def add_item(self, user_id, item_name, amount=1):
-        user_data = self.get_user_data(user_id)
-        current_amount = user_data.get('items', {}).get(item_name, {}).get('amount', 0)
+        user_data = self.get_user_fields(user_id, [f"items/{item_name}"])
+        current_amount = (user_data['items'][item_name] or {}).get('amount', 0)
         
         user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child(item_name)
-        user_ref.update({'amount': current_amount + amount})
+        user_ref.update({'amount': current_amount + amount or None})
     
     def use_item(self, user_id, item_name):
-        user_data = self.get_user_data(user_id)
-        item_data = user_data.get('items', {}).get(item_name, {})
+        user_data = self.get_user_fields(user_id, [f"items/{item_name}"])
+        item_data = user_data['items'][item_name] or {}
         
         if item_data.get('amount', 0) <= 0:
             return False
         
+        activated = now_ms()
         user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child(item_name)
         user_ref.update({
-            'amount': item_data['amount'] - 1,
+            'amount': item_data['amount'] - 1 or None,
             'active': 1,
-            'timeActivated': datetime.now().isoformat()
+            'timeActivated': activated,
+            'expiresAt': activated + _item_duration_ms(item_name)
         })
+        self.economy.set_booster(item_name, item_data.get('active', 0) == 1, True)
         return True
     
     def deactivate_item(self, user_id, item_name):
+        self._promote_if_cold(user_id)
         user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child(item_name)
-        user_ref.update({'active': 0, 'timeActivated': None})
+        was_active = user_ref.child('active').get() == 1
+        user_ref.update({'active': None, 'timeActivated': None, 'expiresAt': None})
+        self.economy.set_booster(item_name, was_active, False)
     
     #=============================#
-    #         Leaderboards        #
+    #       Economy Ledger        #
     #=============================#
 
-    def get_leaderboard(self, limit=10):
-        users_ref = self.db_ref.child('users')
-        all_users = users_ref.get()
+    def _new_ledger_key(self):
+        # Sorts chronologically like a push ID, but generated here so the append needs no round trip
+        return f"{time.time_ns():020d}{os.urandom(3).hex()}"
+    
+    def get_balance(self, user_id, checkpoint=None, pending=None):
+        """
+        Checkpointed coins plus every transaction not compacted yet, cached once materialized.
+        pending is the user's ledger when the caller already read it.
+        """
+        user_id = str(user_id)
+        # Every coin write starts here, so a cold user is always promoted before one lands
+        self._promote_if_cold(user_id)
+        balance = self._get_cached_balance(user_id)
+        if balance is not None:
+            return balance
         
-        if not all_users:
-            return []
+        if checkpoint is None:
+            checkpoint = self.db_ref.child('users').child(user_id).child('coins').get() or 0
+        if pending is None:
+            pending = self.db_ref.child('ledger').child(user_id).get() or {}
         
-        users_list = [user_data for user_id, user_data in all_users.items()]
-        users_list.sort(key=lambda x: x.get('totalXP', 0), reverse=True)
+        balance = round(checkpoint + sum(entry.get('amount', 0) for entry in pending.values()), 2)
+        self._cache_balance(user_id, balance)
+        return balance
+    
+    def _get_cached_balance(self, user_id):
+        with self._balances_lock:
+            balance = self.balances.get(user_id)
+            if balance is not None:
+                self.balances.move_to_end(user_id)
+            return balance
+    
+    def _cache_balance(self, user_id, balance):
+        # Least recently used first, so the users dropped past the limit are the idle ones
+        with self._balances_lock:
+            self.balances[user_id] = balance
+            self.balances.move_to_end(user_id)
+            while len(self.balances) > bot_config.BALANCE_CACHE_SIZE:
+                self.balances.popitem(last=False)
+    
+    def _invalidate_balances(self, user_ids=None):
+        """Drop materialized balances, every one without user_ids. The next read rebuilds them from the database."""
+        with self._balances_lock:
+            if user_ids is None:
+                self.balances.clear()
+            for user_id in user_ids or ():
+                self.balances.pop(str(user_id), None)
+    
+    def record_transaction(self, user_id, transaction_type, amount, reference=None, user_updates=None):
+        """
+        Append a typed coin transaction to /ledger/<user> and return the new balance. The
+        append and any user_updates go out as one multi-path write, with no read beforehand
+        once the balance is materialized.
+        """
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ValueError(f"Unknown transaction type {transaction_type!r}")
         
-        leaderboard = []
-        for idx, user in enumerate(users_list[:limit]):
-            user['rank'] = idx + 1
-            leaderboard.append(user)
+        user_id = str(user_id)
+        balance = self.get_balance(user_id)
         
-        return leaderboard
+        entry = {'type': transaction_type, 'amount': amount, 'at': now_ms()}
+        if reference is not None:
+            entry['ref'] = str(reference)
+        
+        updates = {f"ledger/{user_id}/{self._new_ledger_key()}": entry}
+        for field, value in (user_updates or {}).items():
+            updates[f"users/{user_id}/{field}"] = value
+        # A document first created by these user_updates is counted by the next reconcile_economy
+        self.db_ref.update(updates)
+        
+        balance = round(balance + amount, 2)
+        self._cache_balance(user_id, balance)
+        self.economy.adjust(coins=amount)
+        return balance
     
-    def get_user_rank(self, user_id):
-        user_data = self.get_user_data(user_id)
-        user_xp = user_data['totalXP']
+    def compact_ledger(self, users_per_write=500):
+        """
+        Fold pending transactions into each user's coins checkpoint. Folded entries move to
+        /ledgerHistory in the same atomic write, so the audit trail stays complete and the
+        live ledger stays short. Returns (users compacted, transactions folded).
+        """
+        ledger = self.db_ref.child('ledger').get() or {}
+        if not ledger:
+            return 0, 0
         
-        users_ref = self.db_ref.child('users')
-        all_users = users_ref.get()
+        columns = self.get_user_columns()
+        user_ids = list(ledger)
+        folded = 0
+        
+        for start in range(0, len(user_ids), users_per_write):
+            batch = user_ids[start:start + users_per_write]
+            updates = {}
+            for user_id in batch:
+                entries = ledger[user_id] or {}
+                row = columns.index.get(user_id)
+                if row is not None:
+                    checkpoint = columns.get_value(row, 'coins')
+                else:
+                    # Archived or created after the columns were read. Promoting puts the archived
+                    # checkpoint back in /users, rather than leaving a coins-only stub next to it.
+                    self._promote_if_cold(user_id)
+                    checkpoint = self.db_ref.child('users').child(user_id).child('coins').get() or 0
+                
+                updates[f"users/{user_id}/coins"] = round(checkpoint + sum(entry.get('amount', 0) for entry in entries.values()), 2)
+                for key, entry in entries.items():
+                    updates[f"ledger/{user_id}/{key}"] = None
+                    updates[f"ledgerHistory/{user_id}/{key}"] = entry
+                folded += len(entries)
+            
+            # A balance materialized while the write is in flight may pair the old checkpoint with the
+            # emptied ledger, so the batch's users are dropped on both sides of it
+            self._invalidate_balances(batch)
+            self.db_ref.update(updates)
+            self._invalidate_balances(batch)
+        
+        return len(user_ids), folded
+    
+    def get_pending_ledger_total(self):
+        ledger = self.db_ref.child('ledger').get() or {}
+        return sum(entry.get('amount', 0) for entries in ledger.values() for entry in (entries or {}).values())
+    
+    #=============================#
+    #     Economy Aggregates      #
+    #=============================#
+
+    def get_economy_stats(self):
+        return self.economy.to_dict()
+    
+    def reconcile_economy(self):
+        """Rebuild the running aggregates from a full scan, returns the drift it corrected"""
+        # Coins edited outside the bot (e.g. in the Firebase console) show up after this at the latest
+        self._invalidate_balances()
+        return self.economy.reconcile(
+            self.get_user_columns(),
+            pending_coins=self.get_pending_ledger_total(),
+            cold_columns=self.get_cold_user_columns()
+        )
+    
+    #=============================#
+    #     XP Curve Migration      #
+    #=============================#
+
+    def _compute_level_migration(self, curve):
+        columns = self.get_user_columns()
+        old_levels = columns.columns['level'].astype(np.int64)
+        new_levels = curve.levels_from_xp(columns.columns['totalXP'])
+        return columns, old_levels, new_levels
+    
+    def preview_level_migration(self, coefficient, exponent, role_thresholds=(), bucket_size=10):
+        """
+        Recompute every level under a new curve without writing anything. Returns counts,
+        the level distribution before and after in buckets, and for each level role
+        threshold how many users would gain or lose it.
+        """
+        started = time.perf_counter()
+        columns, old_levels, new_levels = self._compute_level_migration(XPCurve(coefficient, exponent))
         
-        if not all_users:
-            return 1
+        buckets = max(int(old_levels.max(initial=0)), int(new_levels.max(initial=0))) // bucket_size + 1
+        threshold_changes = {}
+        for threshold in role_thresholds:
+            gained = np.count_nonzero((old_levels < threshold) & (new_levels >= threshold))
+            lost = np.count_nonzero((old_levels >= threshold) & (new_levels < threshold))
+            threshold_changes[str(threshold)] = [int(gained), int(lost)]
         
-        higher_users = sum(1 for uid, data in all_users.items() if data.get('totalXP', 0) > user_xp)
+        return {
+            'users': len(columns),
+            'changed': int(np.count_nonzero(old_levels != new_levels)),
+            'raised': int(np.count_nonzero(new_levels > old_levels)),
+            'lowered': int(np.count_nonzero(new_levels < old_levels)),
+            'bucket_size': bucket_size,
+            'old_distribution': np.bincount(old_levels // bucket_size, minlength=buckets).tolist(),
+            'new_distribution': np.bincount(new_levels // bucket_size, minlength=buckets).tolist(),
+            'threshold_changes': threshold_changes,
+            'seconds': time.perf_counter() - started
+        }
+    
+    def migrate_levels(self, coefficient, exponent):
+        """
+        Switch to a new curve and rewrite only the level fields that change, in chunked
+        multi-path updates. The curve is saved first so XP gained mid-migration already
+        uses it.
+        """
+        curve = XPCurve(coefficient, exponent)
+        self.db_ref.child('xpCurve').set(curve.to_dict())
+        self._xp_curve = curve
+        
+        columns, old_levels, new_levels = self._compute_level_migration(curve)
+        rows = np.flatnonzero(old_levels != new_levels)
+        
+        written = self._update_users({f"{columns.user_ids[row]}/level": int(new_levels[row]) for row in rows})
+        for row in rows:
+            self.economy.move_level(int(old_levels[row]), int(new_levels[row]))
+        return written
+    
+    #=============================#
+    #         Leaderboards        #
+    #=============================#
+
+    def get_user_columns(self, max_age=None):
+        return self._get_polled('users', self._parse_user_columns, keep_value=False, max_age=max_age)
+    
+    def _parse_user_columns(self, all_users):
+        return UserColumns.from_users(all_users)
+    
+    def get_leaderboard(self, limit=10):
+        # All-time XP still counts archived users, their top rows are merged in
+        candidates = []
+        max_age = bot_config.LEADERBOARD_MAX_AGE
+        for tier, columns in enumerate((self.get_user_columns(max_age), self.get_cold_user_columns(max_age))):
+            for row in columns.top_k('totalXP', limit):
+                candidates.append((-columns.get_value(row, 'totalXP'), tier, columns, row))
+        candidates.sort(key=lambda candidate: candidate[:2])
+        
+        leaderboard = []
+        for idx, (_, _, columns, row) in enumerate(candidates[:limit]):
+            leaderboard.append({**columns.get_row(row), 'rank': idx + 1})
+        
+        return leaderboard
+    
+    def get_user_rank(self, user_id, total_xp=None):
+        # Callers that already read the user pass their XP in, otherwise it's one child read
+        if total_xp is None:
+            total_xp = self.get_user_fields(user_id, ['totalXP'])['totalXP']
+        
+        # Counted over columns up to LEADERBOARD_MAX_AGE old, a rank that lags by a few messages is fine
+        max_age = bot_config.LEADERBOARD_MAX_AGE
+        higher_users = self.get_user_columns(max_age).count_above('totalXP', total_xp)
+        higher_users += self.get_cold_user_columns(max_age).count_above('totalXP', total_xp)
         return higher_users + 1
     
+    def get_rank_card(self, user_id):
+        """
+        The rank card's fields and the user's rank. The user's own fields are one projected
+        read, with their ledger alongside while the balance isn't materialized, so the card
+        is never behind the user's last message. Only the rank comes from the polled
+        columns, which cost no request while younger than LEADERBOARD_MAX_AGE and otherwise
+        an ETag check per tier that nearly always re-downloads /users during active chat.
+        """
+        user_data = self.get_user_fields(user_id, ['level', 'totalXP', 'coins', 'messageCount'])
+        return user_data, self.get_user_rank(user_id, user_data['totalXP'])
+    
     def get_weekly_leaderboard(self, limit=10):
-        users_ref = self.db_ref.child('users')
-        all_users = users_ref.get()
-        
-        if not all_users:
-            return []
+        columns = self.get_user_columns(bot_config.LEADERBOARD_MAX_AGE)
         
         weekly_data = []
-        
-        for user_id, user_data in all_users.items():
+        for row in columns.top_k('messageCount', limit):
             weekly_data.append({
-                'userId': user_id,
-                'username': user_data.get('lastUsername', 'Unknown'),
-                'messageCount': user_data.get('messageCount', 0)
+                'userId': columns.user_ids[row],
+                'username': columns.usernames[row],
+                'messageCount': columns.get_value(row, 'messageCount')
             })
         
-        weekly_data.sort(key=lambda x: x['messageCount'], reverse=True)
+        return weekly_data
+    
+    #=============================#
+    #      Cold Storage Tier      #
+    #=============================#
+
+    @property
+    def cold_users(self):
+        # Only the ids, a shallow read never downloads the archived documents
+        if self._cold_users is None:
+            self._cold_users = set(self.db_ref.child('usersCold').get(shallow=True) or {})
+        return self._cold_users
+    
+    def get_cold_user_columns(self, max_age=None):
+        # Only changes when users move between tiers, so this is normally one ETag check
+        return self._get_polled('usersCold', self._parse_cold_user_columns, keep_value=False, max_age=max_age)
+    
+    def _parse_cold_user_columns(self, all_archived):
+        return UserColumns.from_users({
+            user_id: json.loads(archived) for user_id, archived in (all_archived or {}).items()
+        })
+    
+    def _promote_if_cold(self, user_id):
+        user_id = str(user_id)
+        if user_id not in self.cold_users:
+            return
+        
+        # Two reads racing to promote would otherwise both write the archived copy back
+        with self._promotion_lock:
+            if user_id not in self.cold_users:
+                return
+            
+            archived = self.db_ref.child('usersCold').child(user_id).get()
+            updates = {f"usersCold/{user_id}": None}
+            if archived:
+                user_data = json.loads(archived)
+                # A write may have reached the hot document after the demotion, those fields are newer
+                hot = self.db_ref.child('users').child(user_id).get() or {}
+                if 'totalXP' not in hot:
+                    # The XP curve may have been migrated while the user was archived
+                    user_data['level'] = self.calculate_level_from_xp(user_data.get('totalXP') or 0) or None
+                updates.update(_missing_paths(user_data, hot, f"users/{user_id}"))
+            self.db_ref.update(updates)
+            self.cold_users.discard(user_id)
+            self._invalidate_balances([user_id])
+    
+    def demote_inactive_users(self, inactive_days, limit=5000):
+        """
+        Move users who haven't sent a message in inactive_days from /users to /usersCold,
+        each stored as one JSON string. Users with pending coins, an active booster or a
+        custom role pass stay hot, the expiry tasks and compaction still need them. Returns
+        how many users were moved.
+        """
+        cutoff = now_ms() - inactive_days * 24 * 60 * MINUTE_MS
+        # Users who never sent a message sort first. Legacy ISO strings sort after every number,
+        # so those users are skipped until a read migrates them.
+        stale = self.db_ref.child('users').order_by_child('lastMessageTime').end_at(cutoff).limit_to_first(limit).get() or {}
+        pending = self.db_ref.child('ledger').get(shallow=True) or {}
+        
+        updates = {}
+        for user_id, user_data in stale.items():
+            items = user_data.get('items') or {}
+            in_use = (
+                user_id in pending
+                or (to_epoch_ms(user_data.get('lastGambleTime')) or 0) > cutoff
+                or any((item_data or {}).get('active') for item_data in items.values())
+                or (items.get('custom_role_pass') or {}).get('timeActivated')
+            )
+            if in_use:
+                continue
+            
+            updates[f"users/{user_id}"] = None
+            updates[f"usersCold/{user_id}"] = json.dumps(user_data, separators=(',', ':'))
+        
+        if updates:
+            self.db_ref.update(updates)
+            demoted = [path.split('/', 1)[1] for path in updates if path.startswith('usersCold/')]
+            self.cold_users.update(demoted)
+            self._invalidate_balances(demoted)
         
-        return weekly_data[:limit]
+        return len(updates) // 2
+    
+    #=============================#
+    #        Cache Warm-up        #
+    #=============================#
+
+    def warm_caches(self):
+        """Prime the polled reads behind the leaderboards, booster effects and auctions"""
+        self.reconcile_economy()
+        self.get_active_auctions()
+        self.migrate_running_timers()
     
     #=============================#
     #    Booster & Role Helpers   #
     #=============================#
-    def check_booster_expiry(self, user_id, booster_name, duration_minutes):
-        items = self.get_user_items(user_id)
-        booster = items.get(booster_name, {})
+    def check_booster_expiry(self, user_id, booster_name):
+        booster = self.get_user_fields(user_id, [f"items/{booster_name}"])['items'][booster_name] or {}
         
         if booster.get('active', 0) == 0:
             return False
         
-        time_activated = booster.get('timeActivated')
-        if not time_activated:
-            return False
+        expires_at = booster.get('expiresAt')
+        return expires_at is not None and expires_at <= now_ms()
+    
+    def _get_due(self, path, expires_child, now=None):
+        # Range query on an indexed expiresAt, only the due records come back
+        query = self.db_ref.child(path).order_by_child(expires_child).start_at(0).end_at(now or now_ms())
+        return query.get() or {}
+    
+    def get_expired_boosters(self):
+        """{user_id: [booster names]} for every active booster whose expiresAt has passed"""
+        now = now_ms()
+        expired = {}
+        for booster_name in bot_config.BOOSTER_DURATIONS:
+            for user_id in self._get_due('users', f"items/{booster_name}/expiresAt", now):
+                expired.setdefault(user_id, []).append(booster_name)
+        return expired
+    
+    def get_expired_custom_role_passes(self):
+        due = self._get_due('users', 'items/custom_role_pass/expiresAt')
+        return {user_id: user_data['items']['custom_role_pass'] for user_id, user_data in due.items()}
+    
+    def migrate_running_timers(self):
+        """
+        Expiry sweeps only see records that have expiresAt, which legacy records get the first
+        time they're read. Read the few with a timer running now once so none of them is missed.
+        """
+        marker_ref = self.db_ref.child('schema').child('epochTimestamps')
+        if marker_ref.get():
+            return 0
         
-        try:
-            activated_time = datetime.fromisoformat(time_activated)
-            current_time = datetime.now()
-            time_diff = (current_time - activated_time).total_seconds() / 60
-            
-            return time_diff >= duration_minutes
-        except Exception as e:
-            print(f"Error checking booster expiry: {e}")
-            return False
+        columns = self.get_user_columns()
+        user_ids = set(columns.get_active_boosters()) | set(columns.custom_role_passes)
+        for user_id in user_ids:
+            self.get_user_data(user_id)
+        
+        auction_ids = [auction_id for auction_id, auction in self.get_active_auctions().items() if auction.get('expiresAt') is None]
+        for auction_id in auction_ids:
+            self.get_auction(auction_id)
+        
+        marker_ref.set(True)
+        return len(user_ids) + len(auction_ids)
+    
+    def activate_custom_role_pass(self, user_id, amount):
+        """Spend one of the user's amount passes and start its timer, returns when it expires"""
+        self._promote_if_cold(user_id)
+        activated = now_ms()
+        expires_at = activated + _item_duration_ms('custom_role_pass')
+        
+        user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child('custom_role_pass')
+        user_ref.update({
+            'amount': amount - 1 or None,
+            'timeActivated': activated,
+            'expiresAt': expires_at
+        })
+        return expires_at
     
     def clear_custom_role_pass(self, user_id):
+        self._promote_if_cold(user_id)
         user_ref = self.db_ref.child('users').child(str(user_id)).child('items').child('custom_role_pass')
         user_ref.update({
             'timeActivated': None,
+            'expiresAt': None,
             'roleId': None
         })
         print(f"Cleared custom role pass data for user {user_id}")
 
+    #=============================#
+    #      Role Sync Checkpoint   #
+    #=============================#
+
+    def get_role_sync_checkpoint(self, guild_id):
+        checkpoint_ref = self.db_ref.child('roleSync').child(str(guild_id))
+        return checkpoint_ref.get()
+
+    def set_role_sync_checkpoint(self, guild_id, last_member_id, processed, changed, failed=0):
+        checkpoint_ref = self.db_ref.child('roleSync').child(str(guild_id))
+        checkpoint_ref.set({
+            'lastMemberId': str(last_member_id),
+            'processed': processed,
+            'changed': changed,
+            'failed': failed,
+            'updatedAt': now_ms()
+        })
+
+    def clear_role_sync_checkpoint(self, guild_id):
+        checkpoint_ref = self.db_ref.child('roleSync').child(str(guild_id))
+        checkpoint_ref.delete()
+
+    #=============================#
+    #     Per-Guild Settings      #
+    #=============================#
+
+    def get_guild_configs(self):
+        # Polled with an ETag, so the refresh loop costs one tiny request while nothing changes
+        return self._get_polled('guildConfig', self._parse_guild_configs)
+
+    def _parse_guild_configs(self, all_configs):
+        return all_configs or {}
+
+    def set_guild_config_field(self, guild_id, field, value):
+        config_ref = self.db_ref.child('guildConfig').child(str(guild_id))
+        config_ref.update({field: value})
+
+    def clear_guild_config_field(self, guild_id, field):
+        config_ref = self.db_ref.child('guildConfig').child(str(guild_id)).child(field)
+        config_ref.delete()
+
     #=============================#
     #       AUCTION STUFF         #
     #=============================#
@@ -390,7 +1110,8 @@ class FirebaseManager:
         auction_id = str(uuid.uuid4())[:4]
         
         auction_ref = self.db_ref.child('auctions').child(auction_id)
-        end_time = datetime.now() + timedelta(hours=duration_hours)
+        start_time = now_ms()
+        end_time = start_time + duration_hours * 60 * MINUTE_MS
         
         auction_ref.set({
             'auctionId': auction_id,
@@ -398,8 +1119,9 @@ class FirebaseManager:
             'startingBid': starting_bid,
             'highestBid': starting_bid,
             'highestBidder': None,
-            'startTime': datetime.now().isoformat(),
-            'endTime': end_time.isoformat(),
+            'startTime': start_time,
+            'endTime': end_time,
+            'expiresAt': end_time,
             'startedBy': str(started_by),
             'active': True
         })
@@ -407,15 +1129,28 @@ class FirebaseManager:
 
     def get_auction(self, auction_id):
         auction_ref = self.db_ref.child('auctions').child(auction_id)
-        return auction_ref.get()
+        auction_data = auction_ref.get()
+        
+        if auction_data:
+            updates = _migrate_auction(auction_data)
+            if updates:
+                auction_ref.update(updates)
+        return auction_data
+    
+    def get_due_auctions(self):
+        return self._get_due('auctions', 'expiresAt')
 
     def get_active_auctions(self):
-        auctions_ref = self.db_ref.child('auctions')
-        all_auctions = auctions_ref.get() or {}
+        return dict(self._get_polled('auctions', self._parse_active_auctions))
+
+    def _parse_active_auctions(self, all_auctions):
+        all_auctions = all_auctions or {}
         
         active = {}
         for auction_id, auction_data in all_auctions.items():
             if auction_data.get('active', False):
+                # Converted in memory only, get_auction() writes the migration back
+                _migrate_auction(auction_data)
                 active[auction_id] = auction_data
         
         return active
@@ -431,10 +1166,60 @@ class FirebaseManager:
         auction_ref = self.db_ref.child('auctions').child(auction_id)
         auction_ref.delete()
 
-    def set_auction_message_id(self, auction_id, message_id):
+    def set_auction_message_id(self, auction_id, message_id, channel_id):
         auction_ref = self.db_ref.child('auctions').child(auction_id)
         auction_ref.update({
-            'messageId': str(message_id)
+            'messageId': str(message_id),
+            'channelId': str(channel_id)
         })
 
-firebase_manager = FirebaseManager()
+class LazyFirebaseManager:
+    """
+    Stand-in that builds the real FirebaseManager on first attribute access, so importing
+    utils doesn't parse credentials or initialize the Firebase app. Shard processes started
+    by cluster.py get a StorageClient instead, which forwards every call to the aggregator.
+    """
+
+    def __init__(self):
+        self._instance = None
+        self._init_lock = threading.Lock()
+        self._pending_cache_state = None
+
+    @property
+    def initialized(self):
+        return self._instance is not None
+
+    def _get_instance(self):
+        if self._instance is None:
+            # Warm-up runs in a worker thread, so guard against initializing the app twice
+            with self._init_lock:
+                if self._instance is None:
+                    socket_path = os.getenv('LEVELBOT_STORAGE_SOCKET')
+                    instance = StorageClient(socket_path, FirebaseManager) if socket_path else FirebaseManager()
+                    if self._pending_cache_state:
+                        instance.import_cache_state(self._pending_cache_state)
+                        self._pending_cache_state = None
+                    self._instance = instance
+        return self._instance
+
+    # Snapshot restore happens before anything touches Firebase, so hold the state until first use
+    def export_cache_state(self):
+        if self._instance is None:
+            return self._pending_cache_state or {}
+        return self._instance.export_cache_state()
+
+    def get_cache_sizes(self):
+        if self._instance is None:
+            return {}
+        return self._instance.get_cache_sizes()
+
+    def import_cache_state(self, state):
+        if self._instance is None:
+            self._pending_cache_state = state
+        else:
+            self._instance.import_cache_state(state)
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+firebase_manager = LazyFirebaseManager()
@@ -0,0 +1,227 @@
+from bisect import bisect_right
+import math
+from config import config as bot_config
+
+# Field name -> how it's stored. Discord IDs are above 2^53, so they're kept as strings in
+# Firebase (whose numbers are doubles) and only turned back into ints when compiled.
+FIELDS = {
+    'admin_role_ids': 'ids',
+    'auctioneer_role_ids': 'ids',
+    'commands_channel_id': 'id',
+    'level_up_channel_id': 'id',
+    'auction_channel_id': 'id',
+    'level_roles': 'level_map',
+    'xp_bonus_roles': 'bonus_map',
+    'colour_roles': 'name_map',
+    'special_roles': 'name_map',
+    'xp_base': 'number',
+    'xp_cooldown': 'number',
+}
+
+FIELD_FORMATS = {
+    'ids': "comma separated IDs, e.g. `123, 456`",
+    'id': "an ID, or `none`",
+    'level_map': "`level:role_id` pairs, e.g. `5:123, 10:456`",
+    'bonus_map': "`role_id:percent` pairs, e.g. `123:5, 456:10`",
+    'name_map': "`name:role_id` pairs, e.g. `Red:123, Blue:456`",
+    'number': "a number",
+}
+
+# Lowest and highest value accepted for each 'number' field, and for a bonus_map percentage
+NUMBER_RANGES = {
+    'xp_base': (0.01, 1000),
+    'xp_cooldown': (0, 86400),
+    'xp_bonus_roles': (0, 1000),
+}
+
+
+def get_default_settings():
+    """The single-guild constants in config.py, used for any field the home guild hasn't overridden"""
+    return {
+        'admin_role_ids': [str(role_id) for role_id in bot_config.ADMIN_ROLE_IDS],
+        'auctioneer_role_ids': [str(role_id) for role_id in bot_config.AUCTIONEER_ROLE_IDS],
+        'commands_channel_id': str(bot_config.COMMANDS_CHANNEL_ID),
+        'level_up_channel_id': str(bot_config.LEVEL_UP_CHANNEL_ID) if bot_config.LEVEL_UP_CHANNEL_ID else None,
+        'auction_channel_id': str(bot_config.AUCTION_CHANNEL_ID) if bot_config.AUCTION_CHANNEL_ID else None,
+        'level_roles': {str(level): str(role_id) for level, role_id in bot_config.LEVEL_ROLES.items()},
+        'xp_bonus_roles': {str(role_id): bonus for role_id, bonus in bot_config.XP_BONUS_ROLE.items()},
+        'colour_roles': {name: str(role_id) for name, role_id in bot_config.COLOUR_ROLES.items()},
+        'special_roles': {name: str(role_id) for name, role_id in bot_config.SPECIAL_ROLES.items()},
+        'xp_base': bot_config.XP_BASE,
+        'xp_cooldown': bot_config.XP_COOLDOWN,
+    }
+
+
+def get_blank_settings():
+    """What any guild other than the home guild starts from: no roles or channels, the XP tuning still applies"""
+    return {
+        'admin_role_ids': [],
+        'auctioneer_role_ids': [],
+        'commands_channel_id': None,
+        'level_up_channel_id': None,
+        'auction_channel_id': None,
+        'level_roles': {},
+        'xp_bonus_roles': {},
+        'colour_roles': {},
+        'special_roles': {},
+        'xp_base': bot_config.XP_BASE,
+        'xp_cooldown': bot_config.XP_COOLDOWN,
+    }
+
+
+def is_home_guild(guild_id):
+    # Without HOME_GUILD_ID every guild is the home guild, which is the single-guild setup
+    return bot_config.HOME_GUILD_ID is None or guild_id is None or guild_id == bot_config.HOME_GUILD_ID
+
+
+def _as_dict(value):
+    # Firebase hands back maps with small integer keys (like level thresholds) as sparse lists
+    if isinstance(value, list):
+        return {str(key): item for key, item in enumerate(value) if item is not None}
+    return value or {}
+
+
+def check_number(field, value):
+    """value as a float, raises ValueError if it's nan, infinite or outside the field's range"""
+    value = float(value)
+    lowest, highest = NUMBER_RANGES[field]
+    if not math.isfinite(value) or not lowest <= value <= highest:
+        raise ValueError(f"`{field}` must be between {lowest:g} and {highest:g}")
+    return value
+
+
+def parse_field_value(field, text):
+    """Turn what an admin typed into the stored form for a field, raises ValueError if it doesn't parse"""
+    kind = FIELDS[field]
+    text = text.strip()
+
+    if kind == 'number':
+        return check_number(field, text)
+
+    if kind == 'id':
+        return None if text.lower() == 'none' else str(int(text))
+
+    parts = [part.strip() for part in text.split(',') if part.strip()]
+
+    if kind == 'ids':
+        return [str(int(part)) for part in parts]
+
+    pairs = {}
+    for part in parts:
+        key, sep, value = part.rpartition(':')
+        if not sep:
+            raise ValueError(f"`{part}` is not a `key:value` pair")
+
+        key = key.strip()
+        if kind == 'level_map':
+            pairs[str(int(key))] = str(int(value))
+        elif kind == 'bonus_map':
+            pairs[str(int(key))] = check_number(field, value)
+        else:
+            pairs[key] = str(int(value))
+    return pairs
+
+
+class GuildConfig:
+    """
+    One guild's settings compiled into the shapes the hot paths want: frozensets for role
+    membership tests, a sorted threshold list for level roles and a role id -> bonus dict.
+    Built once per change, never per message.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+
+        self.admin_role_ids = frozenset(int(role_id) for role_id in settings['admin_role_ids'] or [])
+        self.auctioneer_role_ids = frozenset(int(role_id) for role_id in settings['auctioneer_role_ids'] or [])
+        self.commands_channel_id = int(settings['commands_channel_id']) if settings['commands_channel_id'] else None
+        self.level_up_channel_id = int(settings['level_up_channel_id']) if settings['level_up_channel_id'] else None
+        self.auction_channel_id = int(settings['auction_channel_id']) if settings['auction_channel_id'] else None
+
+        level_roles = sorted((int(level), int(role_id)) for level, role_id in _as_dict(settings['level_roles']).items())
+        self.level_thresholds = [level for level, role_id in level_roles]
+        self.level_role_ids = frozenset(role_id for level, role_id in level_roles)
+
+        # earned_role_sets[i] holds the roles for the first i thresholds, so a lookup is one bisect
+        self.earned_role_sets = [frozenset()]
+        for level, role_id in level_roles:
+            self.earned_role_sets.append(self.earned_role_sets[-1] | {role_id})
+
+        self.xp_bonus_roles = {
+            int(role_id): check_number('xp_bonus_roles', bonus) for role_id, bonus in _as_dict(settings['xp_bonus_roles']).items()
+        }
+        self.colour_roles = {name: int(role_id) for name, role_id in (settings['colour_roles'] or {}).items()}
+        self.special_roles = {name: int(role_id) for name, role_id in (settings['special_roles'] or {}).items()}
+
+        # Checked here as well, the stored tree can be edited from the Firebase console
+        self.xp_base = check_number('xp_base', settings['xp_base'])
+        self.xp_cooldown = check_number('xp_cooldown', settings['xp_cooldown'])
+
+    def has_admin_role(self, member):
+        return any(role.id in self.admin_role_ids for role in member.roles)
+
+    def has_auctioneer_role(self, member):
+        return any(role.id in self.auctioneer_role_ids for role in member.roles)
+
+    def get_earned_level_roles(self, level):
+        return self.earned_role_sets[bisect_right(self.level_thresholds, level)]
+
+    def get_xp_bonus(self, member):
+        """Highest bonus percentage across the member's roles, bonuses don't stack"""
+        return max((self.xp_bonus_roles[role.id] for role in member.roles if role.id in self.xp_bonus_roles), default=0)
+
+
+class GuildConfigStore:
+    """
+    Compiled GuildConfig per guild. The home guild falls back to the config.py defaults,
+    every other guild to blank settings, so one server's roles never apply in another.
+    refresh() is fed the raw /guildConfig tree and only recompiles guilds whose settings changed.
+    """
+
+    def __init__(self):
+        self.defaults = GuildConfig(get_default_settings())
+        self.blank = GuildConfig(get_blank_settings())
+        self.raw = {}
+        self.configs = {}
+
+    def get(self, guild):
+        """Accepts a guild, a guild id or None (DMs get the defaults)"""
+        guild_id = getattr(guild, 'id', guild)
+        config = self.configs.get(guild_id)
+        if config is None:
+            config = self.defaults if is_home_guild(guild_id) else self.blank
+        return config
+
+    def get_longest_xp_cooldown(self):
+        return max(config.xp_cooldown for config in (self.defaults, self.blank, *self.configs.values()))
+
+    def refresh(self, all_overrides):
+        all_overrides = all_overrides or {}
+        changed = []
+
+        configs = {}
+        for guild_id, overrides in all_overrides.items():
+            guild_id = int(guild_id)
+            if self.raw.get(guild_id) == overrides and guild_id in self.configs:
+                configs[guild_id] = self.configs[guild_id]
+                continue
+
+            settings = get_default_settings() if is_home_guild(guild_id) else get_blank_settings()
+            settings.update({field: value for field, value in overrides.items() if field in FIELDS})
+            try:
+                configs[guild_id] = GuildConfig(settings)
+            except (TypeError, ValueError) as e:
+                # Keep serving the last good config rather than breaking the guild
+                print(f"Invalid config for guild {guild_id}, keeping the previous one: {e}")
+                if guild_id in self.configs:
+                    configs[guild_id] = self.configs[guild_id]
+                continue
+            changed.append(guild_id)
+
+        removed = [guild_id for guild_id in self.configs if guild_id not in configs]
+
+        self.raw = {int(guild_id): overrides for guild_id, overrides in all_overrides.items()}
+        self.configs = configs
+        return changed + removed
+
+guild_configs = GuildConfigStore()
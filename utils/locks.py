@@ -0,0 +1,79 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+def auction_key(auction_id):
+    return f"auction:{auction_id}"
+
+
+class KeyedLockManager:
+    """
+    Hands out one asyncio.Lock per key (user id, auction id, ...) so mutations on the
+    same record are serialized while different records run fully in parallel.
+    Locks are held in a WeakValueDictionary and disappear once nobody is using them.
+
+    Lock order: auction keys are always taken before user keys. Keys passed to a
+    single acquire() are sorted, so one call never deadlocks with another.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_stats = {}
+
+    def _get_lock(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def _record_wait(self, key, waited):
+        self.contended += 1
+
+        stats = self.wait_stats.setdefault(key, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += waited
+        stats['max'] = max(stats['max'], waited)
+
+    @asynccontextmanager
+    async def acquire(self, *keys):
+        ordered_keys = sorted(set(keys))
+        # Keep strong references for the duration of the block so the weak dict can't drop them
+        locks = [self._get_lock(key) for key in ordered_keys]
+        acquired = []
+
+        try:
+            for key, lock in zip(ordered_keys, locks):
+                self.acquisitions += 1
+
+                if lock.locked():
+                    start = time.perf_counter()
+                    await lock.acquire()
+                    self._record_wait(key, time.perf_counter() - start)
+                else:
+                    await lock.acquire()
+
+                acquired.append(lock)
+
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def get_hot_keys(self, limit=10):
+        hot_keys = sorted(self.wait_stats.items(), key=lambda item: item[1]['total'], reverse=True)
+        return hot_keys[:limit]
+
+    def reset_stats(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_stats = {}
+
+lock_manager = KeyedLockManager()
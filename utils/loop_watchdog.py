@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from . import metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wrappers that sit between our code and the library doing the blocking, never the real culprit
+INSTRUMENTATION_FILES = {'loop_watchdog.py', 'metrics.py', 'db_trace.py', 'locks.py'}
+
+loop_lag = metrics.registry.register(metrics.Histogram(
+    'levelbot_loop_lag_seconds', 'How late the event loop heartbeat fired', (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+))
+loop_stalls = metrics.registry.register(metrics.Counter(
+    'levelbot_loop_stalls_total', 'Event loop stalls over the threshold by blocking function', ('frame',)
+))
+
+
+class LoopWatchdog:
+    """
+    A heartbeat coroutine measures how late the loop wakes it up. A helper thread watches the
+    heartbeat and, once it is overdue by more than the threshold, samples the loop thread's
+    stack so the stall can be pinned on the synchronous call that caused it.
+    """
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.recent_lags = deque(maxlen=1000)
+        self.last_beat = time.monotonic()
+        self.stall_frame = None
+        self.stall_stack = None
+        self.loop_thread_id = None
+        self.heartbeat_task = None
+        self.stopped = threading.Event()
+
+        metrics.registry.register(metrics.Gauge(
+            'levelbot_loop_lag_quantile_seconds', 'Recent event loop lag percentiles', ('quantile',),
+            callback=self.get_percentiles
+        ))
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        threading.Thread(target=self.watch, name='loop-watchdog', daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+
+    def get_percentiles(self):
+        if not self.recent_lags:
+            return {}
+
+        lags = sorted(self.recent_lags)
+        return {
+            (str(quantile),): lags[min(int(quantile * len(lags)), len(lags) - 1)]
+            for quantile in (0.5, 0.9, 0.99)
+        }
+
+    #============================#
+    #       Loop Heartbeat       #
+    #============================#
+
+    async def heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            self.last_beat = now
+            lag = max(now - expected, 0.0)
+
+            self.recent_lags.append(lag)
+            loop_lag.observe(value=lag)
+
+            if lag >= self.threshold:
+                frame = self.stall_frame or "unknown (stall ended before it was sampled)"
+                loop_stalls.inc(frame)
+                print(f"⚠️ Event loop stalled for {lag * 1000:.0f}ms in {frame}")
+                if self.stall_stack:
+                    print(self.stall_stack)
+
+            self.stall_frame = None
+            self.stall_stack = None
+
+    #============================#
+    #       Watchdog Thread      #
+    #============================#
+
+    def watch(self):
+        check_every = min(self.interval, self.threshold) / 2
+
+        while not self.stopped.wait(check_every):
+            overdue = time.monotonic() - self.last_beat - self.interval
+            if overdue >= self.threshold and self.stall_frame is None:
+                self.sample_loop_stack()
+
+    def sample_loop_stack(self):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+
+        stack = traceback.extract_stack(frame)
+
+        # The innermost frame from our own code is the one to blame, library frames below it are just detail
+        culprit = None
+        for entry in reversed(stack):
+            if entry.filename.startswith(PROJECT_ROOT) and os.path.basename(entry.filename) not in INSTRUMENTATION_FILES:
+                culprit = entry
+                break
+
+        if culprit:
+            module = os.path.relpath(culprit.filename, PROJECT_ROOT).replace(os.sep, '.').removesuffix('.py')
+            self.stall_frame = f"{module}.{culprit.name}"
+        else:
+            self.stall_frame = f"{os.path.basename(stack[-1].filename)}:{stack[-1].name}"
+
+        self.stall_stack = ''.join(traceback.format_list(stack[-8:]))
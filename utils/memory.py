@@ -0,0 +1,104 @@
+import os
+import sys
+import tracemalloc
+
+# Checked in order against each traceback frame's filename, most recent frame first.
+# Our own modules come first so a dict built by json inside firebase_admin on behalf of
+# firebase_manager is charged to firebase_manager, not to json.
+SUBSYSTEMS = [
+    ('cogs/leveling.py', 'cogs.leveling'),
+    ('cogs/commands.py', 'cogs.commands'),
+    ('cogs/auction.py', 'cogs.auction'),
+    ('cogs/shop.py', 'cogs.shop'),
+    ('cogs/', 'cogs (other)'),
+    ('utils/firebase_manager.py', 'utils.firebase_manager'),
+    ('utils/', 'utils (other)'),
+    ('bot.py', 'bot'),
+]
+LIBRARY_SUBSYSTEMS = [
+    ('/discord/', 'discord internals'),
+    ('/PIL/', 'Pillow'),
+    ('/firebase_admin/', 'firebase sdk'),
+    ('/google/', 'firebase sdk'),
+    ('/aiohttp/', 'aiohttp'),
+]
+
+
+def start_tracing(frames):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def get_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def classify(traceback):
+    filenames = [frame.filename.replace(os.sep, '/') for frame in reversed(traceback)]
+
+    for rules in (SUBSYSTEMS, LIBRARY_SUBSYSTEMS):
+        for filename in filenames:
+            for pattern, subsystem in rules:
+                if pattern in filename:
+                    return subsystem
+
+    return 'other'
+
+
+def group_by_subsystem(snapshot):
+    totals = {}
+    for stat in snapshot.statistics('traceback'):
+        subsystem = classify(stat.traceback)
+        totals[subsystem] = totals.get(subsystem, 0) + stat.size
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def top_allocators(snapshot, limit=15):
+    lines = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{format_bytes(stat.size):>10} {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+    return lines
+
+
+def top_growth(old_snapshot, new_snapshot, limit=10):
+    lines = []
+    for stat in new_snapshot.compare_to(old_snapshot, 'lineno')[:limit]:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        lines.append(f"{'+' + format_bytes(stat.size_diff):>10} {frame.filename}:{frame.lineno}")
+    return lines
+
+
+def deep_sizeof(obj, max_objects=500000):
+    """Approximate size of a container and everything inside it, stops after max_objects to stay cheap"""
+    seen = set()
+    stack = [obj]
+    size = 0
+
+    while stack and len(seen) < max_objects:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+
+    return size
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{size}B"
+        size /= 1024
@@ -0,0 +1,218 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Metrics are plain dict updates with no allocation beyond the first sample per label set,
+# so they are cheap enough for on_message. FirebaseManager calls record from to_thread
+# workers too, so each metric guards its values with an uncontended lock.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), callback=None):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        # callback() -> {label_values: value}, read at scrape time for values that are cheaper to pull than push
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self.values[label_values] = value
+
+    def render(self):
+        if self.callback:
+            values = self.callback()
+        else:
+            with self._lock:
+                values = dict(self.values)
+        for label_values, value in values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(label_values)
+            if series is None:
+                # [per-bucket counts (last slot is +Inf), sum, count]
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.values[label_values] = series
+
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*label_values, value=time.perf_counter() - started)
+
+    def render(self):
+        # Copied so the _bucket, _sum and _count lines of a series agree with each other
+        with self._lock:
+            values = [(label_values, list(bucket_counts), total, count) for label_values, (bucket_counts, total, count) in self.values.items()]
+        for label_values, bucket_counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, ('le', bound))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labels, label_values, ('le', '+Inf'))} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+#============================#
+#          Metrics           #
+#============================#
+
+messages_total = registry.register(Counter(
+    'levelbot_messages_total', 'Messages seen by the XP listener by outcome', ('result',)
+))
+command_latency = registry.register(Histogram(
+    'levelbot_command_latency_seconds', 'Time from interaction creation to command completion', ('command',)
+))
+firebase_calls = registry.register(Histogram(
+    'levelbot_firebase_call_seconds', 'FirebaseManager call latency', ('method',)
+))
+discord_rate_limits = registry.register(Counter(
+    'levelbot_discord_rate_limits_total', 'Discord HTTP 429 responses', ()
+))
+render_time = registry.register(Histogram(
+    'levelbot_render_seconds', 'Image card render time', ('card',)
+))
+cache_requests = registry.register(Counter(
+    'levelbot_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result')
+))
+single_flight_reads = registry.register(Counter(
+    'levelbot_single_flight_reads_total', 'Database reads that ran or joined an identical read already in flight', ('read', 'result')
+))
+task_duration = registry.register(Histogram(
+    'levelbot_task_duration_seconds', 'Background task loop iteration time', ('task',)
+))
+
+#============================#
+#       Instrumentation      #
+#============================#
+
+def instrument_methods(cls):
+    """Class decorator that times every public method into firebase_calls"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not callable(method):
+            continue
+
+        def make_wrapper(name, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    firebase_calls.observe(name, value=time.perf_counter() - started)
+            return wrapper
+
+        setattr(cls, name, make_wrapper(name, method))
+    return cls
+
+
+class RateLimitCounter(logging.Handler):
+    """discord.py only reports 429s through its logger, so count them from there"""
+
+    def emit(self, record):
+        if 'rate limited' in record.getMessage():
+            discord_rate_limits.inc()
+
+def install_rate_limit_counter():
+    logging.getLogger('discord.http').addHandler(RateLimitCounter(level=logging.WARNING))
+
+#============================#
+#        HTTP Endpoint       #
+#============================#
+
+async def start_metrics_server(host, port):
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(
+            body=registry.render().encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Metrics available on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+
+MAX_STACK_DEPTH = 64
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that periodically grabs the stack of every thread with
+    sys._current_frames(). The profiled code is never traced or patched, so the only
+    cost is one stack walk per thread per sample on the sampler's own thread.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.running = threading.Lock()
+
+    def run(self, duration):
+        """Sample for `duration` seconds and return ({collapsed stack: count}, total samples)"""
+        if not self.running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+
+        try:
+            stacks = {}
+            samples = 0
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + duration
+
+            while time.monotonic() < deadline:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+
+                    collapsed = self.collapse(thread_names.get(thread_id, str(thread_id)), frame)
+                    stacks[collapsed] = stacks.get(collapsed, 0) + 1
+
+                samples += 1
+                time.sleep(self.interval)
+
+            return stacks, samples
+        finally:
+            self.running.release()
+
+    def collapse(self, thread_name, frame):
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+
+        names.append(thread_name)
+        return ';'.join(reversed(names))
+
+
+def format_collapsed(stacks):
+    """One 'frame;frame;frame count' line per stack, the input flamegraph.pl and speedscope expect"""
+    return '\n'.join(f"{stack} {count}" for stack, count in sorted(stacks.items()))
+
+
+def format_top_functions(stacks, limit=25):
+    self_counts = {}
+    total_counts = {}
+    total_samples = sum(stacks.values()) or 1
+
+    for stack, count in stacks.items():
+        frames = stack.split(';')[1:]
+        if not frames:
+            continue
+
+        self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + count
+        # Count recursive functions once per stack for the inclusive total
+        for frame in set(frames):
+            total_counts[frame] = total_counts.get(frame, 0) + count
+
+    lines = [f"{'self %':>7} {'total %':>8}  function"]
+    for frame, count in sorted(self_counts.items(), key=lambda item: item[1], reverse=True)[:limit]:
+        lines.append(f"{count / total_samples:>7.1%} {total_counts[frame] / total_samples:>8.1%}  {frame}")
+
+    return '\n'.join(lines)
@@ -0,0 +1,60 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# magic, format version, created at (unix seconds), payload length, crc32 of payload
+SNAPSHOT_MAGIC = b'LVLSNAP\x00'
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<8sHdII')
+
+
+def write_snapshot(path, state):
+    """Write state as a zlib-compressed JSON payload behind a versioned, checksummed header"""
+    payload = zlib.compress(json.dumps(state, separators=(',', ':')).encode(), 6)
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, time.time(), len(payload), zlib.crc32(payload))
+
+    # Write to a temp file first so a crash mid-write never leaves a torn snapshot behind
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(temp_path, path)
+
+    return HEADER.size + len(payload)
+
+
+def read_snapshot(path, max_age=None):
+    """
+    Map the snapshot file and return its state, or None if it is missing, too old,
+    from another format version or fails the checksum.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                return None
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, version, created_at, length, checksum = HEADER.unpack_from(mapped, 0)
+
+                if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                    print(f"Ignoring snapshot {path}: unknown format")
+                    return None
+
+                if max_age is not None and time.time() - created_at > max_age:
+                    print(f"Ignoring snapshot {path}: older than {max_age}s")
+                    return None
+
+                payload = mapped[HEADER.size:HEADER.size + length]
+                if len(payload) != length or zlib.crc32(payload) != checksum:
+                    print(f"Ignoring snapshot {path}: checksum mismatch")
+                    return None
+
+                return json.loads(zlib.decompress(payload))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading snapshot {path}: {e}")
+        return None
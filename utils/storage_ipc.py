@@ -0,0 +1,398 @@
+import asyncio
+import contextvars
+import json
+import os
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import config as bot_config
+from .db_trace import tracer
+
+# Every message is a little-endian length prefix followed by a JSON body
+FRAME = struct.Struct('<I')
+
+# Methods that don't change anything, identical in-flight calls to these share one result
+READ_PREFIXES = ('get_', 'calculate_')
+
+# The write batch of the call running on the aggregator's writer thread. Projection reads
+# fanned out by that call copy their context, so they flush the same batch.
+current_batch = contextvars.ContextVar('write_batch', default=None)
+
+
+class StorageError(RuntimeError):
+    """Raised in a shard when the aggregator's FirebaseManager call failed"""
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Storage aggregator closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+
+#============================#
+#        Shard Client        #
+#============================#
+
+class StorageClient:
+    """
+    Drop-in for FirebaseManager inside a shard process. Every method call is forwarded to
+    the aggregator over a Unix socket and blocks until it answers, exactly like the
+    synchronous Firebase call it replaces. Each thread gets its own connection, so calls
+    made from asyncio.to_thread workers never interleave on one socket.
+    """
+
+    def __init__(self, path, interface):
+        # interface is the class being stood in for, only its public methods are forwarded
+        self.path = path
+        self.interface = interface
+        self._local = threading.local()
+        self._warned_on_loop = set()
+
+    @property
+    def initialized(self):
+        return True
+
+    # The aggregator owns the caches, a shard has nothing to snapshot or report
+    def export_cache_state(self):
+        return {}
+
+    def get_cache_sizes(self):
+        return {}
+
+    def import_cache_state(self, state):
+        pass
+
+    def _get_connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, method, args, kwargs):
+        body = json.dumps({'method': method, 'args': args, 'kwargs': kwargs}, separators=(',', ':')).encode()
+
+        sock = self._get_connection()
+        try:
+            sock.sendall(FRAME.pack(len(body)) + body)
+            (size,) = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+            response = json.loads(_recv_exactly(sock, size))
+        except (OSError, ConnectionError):
+            # Drop the broken connection so the next call reconnects
+            sock.close()
+            self._local.sock = None
+            raise
+
+        if 'error' in response:
+            raise StorageError(f"{method} failed in the storage aggregator: {response['error']}")
+        return response['result']
+
+    def call(self, method, *args, **kwargs):
+        self._warn_if_on_loop(method)
+        return tracer.call('ipc', method, self._request, method, list(args), kwargs)
+
+    def _warn_if_on_loop(self, method):
+        # Every call blocks on the socket, made from the loop it stalls every shard in this process
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if method not in self._warned_on_loop:
+            self._warned_on_loop.add(method)
+            print(f"⚠️ {method} was called over IPC on the event loop, run it through asyncio.to_thread")
+
+    def __getattr__(self, name):
+        # Attributes like db_ref or a cached property have no remote equivalent, fail here
+        # rather than with an unknown method error at call time
+        if name.startswith('_') or not callable(getattr(self.interface, name, None)):
+            raise AttributeError(f"{name!r} is not a {self.interface.__name__} method that can be called over IPC")
+
+        def forward(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        return forward
+
+
+#============================#
+#       Write Batching       #
+#============================#
+
+def _ancestors(path):
+    parts = path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts))]
+
+
+class WriteBatch:
+    """
+    Writes buffered during one writer tick, sent as a single multi-path update at the root.
+    Firebase rejects an update where one path sits inside another, so a write that overlaps
+    a pending path flushes the batch first. Every call that contributed to a failed flush
+    is failed with it.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.updates = {}
+        self.prefixes = set()
+        self.contributors = set()
+        self.failed = {}
+        self.flushes = 0
+        self.call = None
+        self.lock = threading.RLock()
+
+    def add(self, path, value):
+        with self.lock:
+            if path in self.prefixes or any(parent in self.updates for parent in _ancestors(path)):
+                self.flush()
+
+            self.updates[path] = value
+            self.prefixes.update(_ancestors(path))
+            self.contributors.add(self.call)
+
+    def flush(self):
+        with self.lock:
+            if not self.updates:
+                return
+
+            updates, contributors = self.updates, self.contributors
+            self.updates, self.prefixes, self.contributors = {}, set(), set()
+            self.flushes += 1
+            try:
+                self.root.update(updates)
+            except Exception as e:
+                for call in contributors:
+                    self.failed.setdefault(call, e)
+                raise
+
+
+class BatchingReference:
+    """
+    Stands in for the manager's db_ref inside the aggregator. With no batch in the context
+    it passes straight through. Inside a writer call, update/set/delete land in the batch
+    and anything else flushes it first, so a call always reads its own writes.
+    """
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    def child(self, path):
+        return BatchingReference(self._ref.child(path))
+
+    def _settled(self):
+        batch = current_batch.get()
+        if batch is not None:
+            batch.flush()
+        return self._ref
+
+    def _join(self, path):
+        return '/'.join(part for part in (self._ref.path.strip('/'), path.strip('/')) if part)
+
+    def update(self, value):
+        batch = current_batch.get()
+        if batch is None:
+            return self._ref.update(value)
+
+        for path, path_value in value.items():
+            batch.add(self._join(path), path_value)
+
+    def set(self, value):
+        batch = current_batch.get()
+        if batch is None or not self._join(''):
+            # Replacing the whole database can't be expressed as a multi-path update
+            return self._settled().set(value)
+        batch.add(self._join(''), value)
+
+    def delete(self):
+        batch = current_batch.get()
+        if batch is None or not self._join(''):
+            return self._settled().delete()
+        batch.add(self._join(''), None)
+
+    def get(self, *args, **kwargs):
+        return self._settled().get(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # get_if_changed, push, order_by_child... all talk to Firebase, pending writes go first
+        return getattr(self._settled(), name)
+
+
+#============================#
+#     Storage Aggregator     #
+#============================#
+
+class StorageAggregator:
+    """
+    Owns the single FirebaseManager for the whole cluster, so the polled caches behind the
+    leaderboards are shared by every shard. Reads run side by side on a pool and identical
+    ones in flight are answered by one call. Writes queue for a single writer thread, which
+    runs everything that arrived within a tick and sends their database writes as one
+    multi-path update. A write is acknowledged only once that update has landed.
+    """
+
+    def __init__(self, manager, path):
+        self.manager = manager
+        self.path = path
+        self.root = manager.db_ref
+        manager.db_ref = BatchingReference(manager.db_ref)
+        self.read_executor = ThreadPoolExecutor(max_workers=bot_config.STORAGE_READ_WORKERS, thread_name_prefix='storage-read')
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+        self.write_queue = None
+        self.writer_task = None
+        self.write_generation = 0
+        self.in_flight = {}
+        self.server = None
+        self.stats = {'requests': 0, 'coalesced': 0, 'errors': 0, 'write_batches': 0, 'write_flushes': 0}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.write_queue = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.write_loop())
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=self.path)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+        # Let queued writes reach Firebase before the process exits
+        if self.writer_task:
+            self.write_queue.put_nowait(None)
+            await self.writer_task
+        await asyncio.to_thread(self.write_executor.shutdown, wait=True)
+        await asyncio.to_thread(self.read_executor.shutdown, wait=True)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME.size)
+                except asyncio.IncompleteReadError:
+                    return
+
+                (size,) = FRAME.unpack(header)
+                request = json.loads(await reader.readexactly(size))
+                response = await self.dispatch(request)
+
+                try:
+                    body = json.dumps(response, separators=(',', ':')).encode()
+                except (TypeError, ValueError) as e:
+                    # A stringified object would only look like the result, the shard gets an error instead
+                    self.stats['errors'] += 1
+                    body = json.dumps({'error': f"{request.get('method')} returned a result that isn't JSON: {e}"}).encode()
+                writer.write(FRAME.pack(len(body)) + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        method = request.get('method', '')
+        args = request.get('args', [])
+        kwargs = request.get('kwargs', {})
+        self.stats['requests'] += 1
+
+        if method.startswith('_') or not callable(getattr(self.manager, method, None)):
+            self.stats['errors'] += 1
+            return {'error': f"Unknown storage method {method!r}"}
+
+        if method.startswith(READ_PREFIXES):
+            response = await self.read(method, args, kwargs)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.write_queue.put_nowait((method, args, kwargs, future))
+            response = await asyncio.shield(future)
+
+        if 'error' in response:
+            self.stats['errors'] += 1
+        return response
+
+    async def read(self, method, args, kwargs):
+        # A read only joins one started before the last write batch was acknowledged if none
+        # has been since, otherwise the caller could miss a write it has already seen succeed
+        key = json.dumps([method, args, kwargs, self.write_generation], sort_keys=True)
+        pending = self.in_flight.get(key)
+        if pending:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = asyncio.ensure_future(loop.run_in_executor(self.read_executor, self.invoke, method, args, kwargs))
+        self.in_flight[key] = future
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        return await asyncio.shield(future)
+
+    async def write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            calls = [await self.write_queue.get()]
+
+            # Give writes from the other shards a moment to join this batch
+            await asyncio.sleep(bot_config.STORAGE_WRITE_TICK)
+            while not self.write_queue.empty() and len(calls) < bot_config.STORAGE_WRITE_BATCH_MAX:
+                calls.append(self.write_queue.get_nowait())
+
+            # None is queued by close(), everything ahead of it still gets written
+            stopping = None in calls
+            calls = [call for call in calls if call is not None]
+            if not calls:
+                continue
+
+            responses, flushes = await loop.run_in_executor(self.write_executor, self.run_batch, [call[:3] for call in calls])
+            self.stats['write_batches'] += 1
+            self.stats['write_flushes'] += flushes
+            self.write_generation += 1
+
+            for (*_, future), response in zip(calls, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def run_batch(self, calls):
+        """Run queued writes on the writer thread against one WriteBatch, then flush it"""
+        batch = WriteBatch(self.root)
+        token = current_batch.set(batch)
+        responses = []
+        try:
+            for index, (method, args, kwargs) in enumerate(calls):
+                batch.call = index
+                responses.append(self.invoke(method, args, kwargs))
+
+            try:
+                batch.flush()
+            except Exception:
+                pass  # batch.failed has it against every call that wrote
+        finally:
+            current_batch.reset(token)
+
+        for index, error in batch.failed.items():
+            if index is not None and 'error' not in responses[index]:
+                responses[index] = self.error_response(calls[index][0], error)
+
+        return responses, batch.flushes
+
+    def invoke(self, method, args, kwargs):
+        try:
+            return {'result': getattr(self.manager, method)(*args, **kwargs)}
+        except Exception as e:
+            return self.error_response(method, e)
+
+    def error_response(self, method, e):
+        print(f"Storage aggregator error in {method}: {e}")
+        return {'error': f"{type(e).__name__}: {e}"}
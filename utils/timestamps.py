@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+import time
+
+# Stored timestamps are integer epoch milliseconds. Numbers sort after null in Firebase
+# ordering, so start_at(0) skips records that don't have the field at all.
+MINUTE_MS = 60 * 1000
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def to_epoch_ms(value):
+    """
+    Any stored timestamp as epoch milliseconds. Older records hold ISO strings, naive ones
+    written with datetime.now() (server local time) and aware ones in UTC.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    # A naive datetime's timestamp() assumes local time, which is what wrote it
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+
+def is_legacy(value):
+    return isinstance(value, str)
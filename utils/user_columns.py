@@ -0,0 +1,147 @@
+import numpy as np
+
+# Numeric user fields kept as flat arrays, one slot per user
+COLUMNS = {
+    'totalXP': np.float64,
+    'coins': np.float64,
+    'level': np.int32,
+    'messageCount': np.int32,
+}
+
+# Bits in a uint64 mask, so at most this many distinct role keys / boosters are tracked
+MAX_FLAGS = 64
+
+
+class UserColumns:
+    """
+    Columnar mirror of /users. Numeric fields are NumPy arrays indexed by row, the roles map
+    and active boosters are bitmasks, and the few users holding a Custom Role Pass keep
+    their pass data as a plain dict. Built once per change of the tree, then every bulk
+    query (top-k, ranks, sums, histograms, filters) is a vectorized pass over the arrays.
+    """
+
+    def __init__(self, user_ids, usernames, columns, role_bits, role_masks, booster_bits, booster_masks, custom_role_passes):
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.columns = columns
+        self.role_bits = role_bits
+        self.role_masks = role_masks
+        self.booster_bits = booster_bits
+        self.booster_masks = booster_masks
+        self.custom_role_passes = custom_role_passes
+        self.index = {user_id: row for row, user_id in enumerate(user_ids)}
+
+    @classmethod
+    def from_users(cls, all_users):
+        all_users = all_users or {}
+        count = len(all_users)
+
+        user_ids = list(all_users)
+        usernames = [None] * count
+        columns = {name: np.zeros(count, dtype=dtype) for name, dtype in COLUMNS.items()}
+        role_bits = {}
+        role_masks = np.zeros(count, dtype=np.uint64)
+        booster_bits = {}
+        booster_masks = np.zeros(count, dtype=np.uint64)
+        custom_role_passes = {}
+
+        for row, user_id in enumerate(user_ids):
+            user_data = all_users[user_id] or {}
+            usernames[row] = user_data.get('lastUsername', 'Unknown')
+
+            for name, column in columns.items():
+                column[row] = user_data.get(name) or 0
+
+            role_mask = 0
+            for role_key, owned in (user_data.get('roles') or {}).items():
+                if owned:
+                    role_mask |= _get_bit(role_bits, role_key)
+            role_masks[row] = role_mask
+
+            items = user_data.get('items') or {}
+            booster_mask = 0
+            for item_name, item_data in items.items():
+                if 'booster' in item_name and item_data.get('active', 0) == 1:
+                    booster_mask |= _get_bit(booster_bits, item_name)
+            booster_masks[row] = booster_mask
+
+            crp_data = items.get('custom_role_pass') or {}
+            if crp_data.get('timeActivated') and crp_data.get('roleId'):
+                custom_role_passes[user_id] = crp_data
+
+        return cls(user_ids, usernames, columns, role_bits, role_masks, booster_bits, booster_masks, custom_role_passes)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def nbytes(self):
+        arrays = sum(column.nbytes for column in self.columns.values()) + self.role_masks.nbytes + self.booster_masks.nbytes
+        return arrays + sum(len(user_id) + len(username or '') for user_id, username in zip(self.user_ids, self.usernames))
+
+    #============================#
+    #       Bulk Queries         #
+    #============================#
+
+    def top_k(self, column, k):
+        """Row indices of the k largest values, highest first, ties broken by row order"""
+        values = self.columns[column]
+        k = min(k, len(values))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        candidates = np.argpartition(-values, k - 1)[:k] if k < len(values) else np.arange(len(values))
+        return candidates[np.lexsort((candidates, -values[candidates]))]
+
+    def count_above(self, column, value):
+        return int(np.count_nonzero(self.columns[column] > value))
+
+    def total(self, column, mask=None):
+        values = self.columns[column] if mask is None else self.columns[column][mask]
+        return values.sum().item()
+
+    def histogram(self, column, bins=10):
+        counts, edges = np.histogram(self.columns[column], bins=bins)
+        return counts.tolist(), edges.tolist()
+
+    def has_role(self, role_key):
+        """Boolean mask of users who own a role key from the roles map"""
+        bit = self.role_bits.get(role_key)
+        if bit is None:
+            return np.zeros(len(self), dtype=bool)
+        return (self.role_masks & np.uint64(bit)) != 0
+
+    def rows_where(self, mask):
+        return np.flatnonzero(mask)
+
+    #============================#
+    #      Row Materializing     #
+    #============================#
+
+    def get_value(self, row, column):
+        return self.columns[column][row].item()
+
+    def get_row(self, row):
+        """Plain Python dict for one user, safe to JSON encode"""
+        entry = {'userId': self.user_ids[row], 'lastUsername': self.usernames[row]}
+        for name, column in self.columns.items():
+            entry[name] = column[row].item()
+        return entry
+
+    def get_active_boosters(self):
+        names = sorted(self.booster_bits.items(), key=lambda item: item[1])
+        active = {}
+        for row in np.flatnonzero(self.booster_masks):
+            mask = int(self.booster_masks[row])
+            active[self.user_ids[row]] = [name for name, bit in names if mask & bit]
+        return active
+
+
+def _get_bit(bits, key):
+    bit = bits.get(key)
+    if bit is None:
+        if len(bits) >= MAX_FLAGS:
+            return 0
+        bit = 1 << len(bits)
+        bits[key] = bit
+    return bit
@@ -0,0 +1,50 @@
+import math
+import numpy as np
+
+
+class XPCurve:
+    """
+    Total XP needed for a level is coefficient * level ** exponent. Level lookups correct
+    for float rounding right at a threshold, so the scalar and vectorized forms always agree.
+    """
+
+    def __init__(self, coefficient, exponent):
+        if coefficient <= 0 or exponent <= 0:
+            raise ValueError("XP curve coefficient and exponent must be positive")
+        self.coefficient = float(coefficient)
+        self.exponent = float(exponent)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['coefficient'], data['exponent'])
+
+    def to_dict(self):
+        return {'coefficient': self.coefficient, 'exponent': self.exponent}
+
+    def __eq__(self, other):
+        return isinstance(other, XPCurve) and self.to_dict() == other.to_dict()
+
+    def xp_for_level(self, level):
+        return math.floor(self.coefficient * (level ** self.exponent))
+
+    def level_from_xp(self, total_xp):
+        if total_xp <= 0:
+            return 0
+
+        level = math.floor((total_xp / self.coefficient) ** (1 / self.exponent))
+        if self.coefficient * (level + 1) ** self.exponent <= total_xp:
+            level += 1
+        elif level > 0 and self.coefficient * level ** self.exponent > total_xp:
+            level -= 1
+        return level
+
+    def levels_from_xp(self, total_xp):
+        """level_from_xp over a whole array of totalXP values in one pass"""
+        total_xp = np.asarray(total_xp, dtype=np.float64)
+        positive = np.maximum(total_xp, 0)
+
+        levels = np.floor(np.power(positive / self.coefficient, 1 / self.exponent)).astype(np.int64)
+        levels += self.coefficient * np.power(levels + 1.0, self.exponent) <= positive
+        levels -= (levels > 0) & (self.coefficient * np.power(levels.astype(np.float64), self.exponent) > positive)
+        levels[total_xp <= 0] = 0
+        return levels